@@ -3,6 +3,8 @@ import logging
 import os
 import threading
 import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
 from datetime import datetime
 
 from selenium.common.exceptions import TimeoutException, WebDriverException
@@ -20,8 +22,13 @@ from openwpm.storage.storage_providers import TableName
 
 import bannerclick.bannerdetection as bc
 import bannerclick.cmpdetection as cd
+import bannerclick.timings as tm
+from bannerclick.profiler import profiler
 
-from bannerclick.config import log_file, MOBILE_AGENT
+from bannerclick.config import log_file, profile_file, snapshot_dir, MOBILE_AGENT, WEBDRIVER_PROFILE, SNAPSHOT
+from bannerclick.htmlstore import html_digest
+from bannerclick.snapshot import save_snapshot
+from bannerclick.utility.utilityMethods import get_current_domain
 
 
 def init(headless, input_file, num_browsers, num_repetitions):
@@ -29,6 +36,15 @@ def init(headless, input_file, num_browsers, num_repetitions):
     cd.init(web_driver=1)
 
 
+def record_unreachable(manager_params, indices, url):   # visits rows with status 2 for a site that failed the pre-flight
+    Data.sql_addr = manager_params.storage_controller_address
+    domain = get_current_domain(None, url)
+    for index in indices:
+        Data.save_record_in_sql("visits", {'visit_id': index, 'domain': domain, 'url': url, 'run_url': None,
+                                           'status': 2, 'banners': 0})
+        Data.finalize_visit(index)
+
+
 def _start_extension(browser_profile_path, browser_params) -> ClientSocket:
     """Start up the extension
     Blocks until the extension has fully started up
@@ -83,10 +99,37 @@ class Data:
     CMP = {}
     openwpm = True
 
+    sock = None
+    sock_addr = None
+    stored_hashes = OrderedDict()   # LRU of the hashes sent from this browser process, the provider dedups the rest
+    stored_hashes_max = 10000
+
+    @staticmethod
+    def get_socket():   # one connection per browser process instead of one per record
+        if Data.sock is None or Data.sock_addr != Data.sql_addr:
+            Data.sock = DataSocket(Data.sql_addr)
+            Data.sock_addr = Data.sql_addr
+        return Data.sock
+
     @staticmethod
     def save_record_in_sql(table_name, row):
-        sock = DataSocket(Data.sql_addr)
-        sock.store_record(TableName(table_name), row['visit_id'], row)
+        Data.get_socket().store_record(TableName(table_name), row['visit_id'], row)
+
+    @staticmethod
+    def finalize_visit(visit_id):   # Arrow providers only write out the rows of a visit once it is finalized
+        Data.get_socket().finalize_visit_id(visit_id, success=True)
+
+    @staticmethod
+    def save_html_blob(html):   # sends the html to the unstructured storage once and returns its (hash, size)
+        content_hash, content = html_digest(html)
+        if content_hash in Data.stored_hashes:
+            Data.stored_hashes.move_to_end(content_hash)
+        else:
+            Data.get_socket().store_blob(content, content_hash)
+            Data.stored_hashes[content_hash] = None
+            if len(Data.stored_hashes) > Data.stored_hashes_max:
+                Data.stored_hashes.popitem(last=False)
+        return content_hash, len(content)
 
 
 class SubGetCommand(BaseCommand):
@@ -146,9 +189,10 @@ class CMPBCommand(BaseCommand):
     run all the Get, Bannerdetection, CMPDetection and SetEntry Command in one single command.
     """
 
-    def __init__(self, url, sleep, index, timeout, choice):
+    def __init__(self, url, sleep, index, timeout, choice, load_url=None):
         self.logger = logging.getLogger("openwpm")
         self.url = url
+        self.load_url = load_url   # variant of url to load, e.g. the one that answered the pre-flight, url by default
         self.sleep = sleep
         self.index = index
         self.timeout = timeout
@@ -171,6 +215,18 @@ class CMPBCommand(BaseCommand):
         Data.start_time = datetime.now()
         Data.finish_time = 0
 
+    def save_timings(self, manager_params):   # per-phase durations of this visit into visit_timings
+        try:
+            Data.sql_addr = manager_params.storage_controller_address
+            for row in tm.records(self.index):
+                Data.save_record_in_sql("visit_timings", row)
+            Data.finalize_visit(self.index)
+        except Exception as ex:
+            with open(log_file, 'a+') as f:
+                print("failed to save visit timings for url: " + self.url + " " + ex.__str__(), file=f)
+        if WEBDRIVER_PROFILE:
+            profiler.dump(profile_file, self.index, self.url)
+
     def execute(
         self,
         webdriver: Firefox,
@@ -180,58 +236,79 @@ class CMPBCommand(BaseCommand):
     ) -> None:
         # if "https://www.tribunnews.com" == self.url:
         #     i = 0
-        tab_restart_browser(webdriver)
-
-        # webdriver = bd.create_driver_session(webdriver.session_id, webdriver.command_executor._url)
-        # webdriver = bd.set_webdriver()
-        webdriver.set_page_load_timeout(self.timeout)
-        error_flag = False
-        exception = None
-        # webdriver.uninstall_addon('openwpm@mozilla.org')
-
-        bc.set_webdriver(webdriver)
-        time.sleep(5)
+        self.reset_timings(webdriver)
+        with tm.phase("startup"):
+            tab_restart_browser(webdriver)
+        self.visit(webdriver, browser_params, manager_params)
+
+    def reset_timings(self, webdriver):
+        tm.reset()
+        if WEBDRIVER_PROFILE:
+            profiler.install(webdriver)
+            profiler.reset()
+
+    def visit(self, webdriver, browser_params, manager_params):   # load self.url in the current tab and run detection/interaction with self.choice
+        with tm.phase("startup"):
+            # webdriver = bd.create_driver_session(webdriver.session_id, webdriver.command_executor._url)
+            # webdriver = bd.set_webdriver()
+            webdriver.set_page_load_timeout(self.timeout)
+            error_flag = False
+            exception = None
+            # webdriver.uninstall_addon('openwpm@mozilla.org')
+
+            bc.set_webdriver(webdriver)
+            time.sleep(5)
         # agent = webdriver.execute_script("return navigator.userAgent")
         # print('\n\nagent:  ', agent)
         # print('\n\nsize:  ', webdriver.get_window_size())
-        try:
-            webdriver.get(self.url)
-            Data.status = 0
-        except Exception as E:
+        with tm.phase("page_load"):
+            load_url = self.load_url or self.url
             try:
-                if bc.URL_MODE == 3:
-                    raise E
-                # self.url = self.url.replace('https', 'http')
-                self.url = self.url.replace('://', '://www.')
-                webdriver.get(self.url)
+                webdriver.get(load_url)
                 Data.status = 0
-            except TimeoutException:  # timeout
-                Data.status = 1
-            except Exception as E:  # unreachable
-                Data.status = 2
-                error_flag = True
-                exception = E
+            except Exception as E:
+                try:
+                    if bc.URL_MODE == 3 or (urlsplit(load_url).hostname or "").startswith("www."):
+                        raise E
+                    # load_url = load_url.replace('https', 'http')
+                    webdriver.get(load_url.replace('://', '://www.', 1))
+                    Data.status = 0
+                except TimeoutException:  # timeout
+                    Data.status = 1
+                except Exception as E:  # unreachable
+                    Data.status = 2
+                    error_flag = True
+                    exception = E
 
 #        time.sleep(self.sleep)
 
         # Close modal dialog if exists
-        try:
-            WebDriverWait(webdriver, 0.5).until(EC.alert_is_present())
-            alert = webdriver.switch_to.alert
-            alert.dismiss()
-            time.sleep(1)
-        except (TimeoutException, WebDriverException):
-            pass
+        with tm.phase("readiness"):
+            try:
+                WebDriverWait(webdriver, 0.5).until(EC.alert_is_present())
+                alert = webdriver.switch_to.alert
+                alert.dismiss()
+                time.sleep(1)
+            except (TimeoutException, WebDriverException):
+                pass
 
         try:
-            close_other_windows(webdriver)
+            with tm.phase("readiness"):
+                close_other_windows(webdriver)
 
-            if browser_params.bot_mitigation:
-                bot_mitigation(webdriver)
+                if browser_params.bot_mitigation:
+                    bot_mitigation(webdriver)
             current_url = webdriver.current_url
 
             # Don't run banner detection if choice is 0
             self.init_data()
+            if SNAPSHOT:
+                try:
+                    with tm.phase("snapshot"):
+                        save_snapshot(webdriver, snapshot_dir, str(self.index), visit_id=self.index, url=self.url)
+                except Exception as ex:
+                    with open(log_file, 'a+') as f:
+                        print("failed to save snapshot for url: " + self.url + " " + ex.__str__(), file=f)
             if not bc.BANNERCLICK:
                 time.sleep(self.sleep)
 
@@ -244,7 +321,8 @@ class CMPBCommand(BaseCommand):
                 if bc.SLEEP_AFTER_INTERACTION:
                     Data.start_time = datetime.now()
                 cd.set_webdriver(webdriver)
-                Data.CMP = cd.run_cmp_detection()
+                with tm.phase("cmp_detection"):
+                    Data.CMP = cd.run_cmp_detection()
                 Data.sql_addr = manager_params.storage_controller_address
                 bc.set_data_in_db_error(Data)
                 if bc.WAITANYWAY or self.choice and banners:
@@ -252,6 +330,7 @@ class CMPBCommand(BaseCommand):
         except Exception as ex:
             with open(log_file, 'a+') as f:
                 print("failed in CMPBCommand for url: " + self.url + " " + ex.__str__(), file=f)
+        self.save_timings(manager_params)
 
         if error_flag:
                 raise exception
@@ -261,6 +340,87 @@ class CMPBCommand(BaseCommand):
         else:
             self.logger.info("CMPB command is successfully executed and result for {} is: number of banners {} and CMP existance {}.".format(current_url, len(banners), Data.CMP['__tcfapi']))
 
+
+OPEN_CONTAINER_TAB = """
+const { ContextualIdentityService } = ChromeUtils.import("resource://gre/modules/ContextualIdentityService.jsm");
+const identity = ContextualIdentityService.create("bannerclick-" + arguments[0], "fingerprint", "blue");
+const win = Services.wm.getMostRecentWindow("navigator:browser");
+win.gBrowser.selectedTab = win.gBrowser.addTab("about:blank", {
+  userContextId: identity.userContextId,
+  triggeringPrincipal: Services.scriptSecurityManager.getSystemPrincipal(),
+});
+return identity.userContextId;
+"""
+
+REMOVE_CONTAINER = """
+const { ContextualIdentityService } = ChromeUtils.import("resource://gre/modules/ContextualIdentityService.jsm");
+ContextualIdentityService.remove(arguments[0]);
+Services.clearData.deleteDataFromOriginAttributesPattern({userContextId: arguments[0]});
+"""
+
+
+class MultiChoiceCommand(CMPBCommand):
+    """
+    run CMPBCommand for several (index, choice) pairs of one site in the same browser. Every choice gets a fresh
+    Firefox container tab, i.e. its own cookie jar and storage, which is removed afterwards, so the sequence does not
+    need a browser restart (reset) between the choices.
+    """
+
+    def __init__(self, url, sleep, choices, timeout, load_url=None):
+        super().__init__(url, sleep, choices[0][0], timeout, choices[0][1], load_url)
+        self.choices = choices
+
+    def __repr__(self):
+        return "MultiChoiceCommand({},{},{},{})".format(self.url, self.sleep, self.choices, self.timeout)
+
+    def open_container_tab(self, webdriver):   # returns the userContextId of the new container
+        handles = set(webdriver.window_handles)
+        with webdriver.context(webdriver.CONTEXT_CHROME):
+            container = webdriver.execute_script(OPEN_CONTAINER_TAB, self.index)
+        new_handle = (set(webdriver.window_handles) - handles).pop()
+        webdriver.switch_to.window(new_handle)
+        close_other_windows(webdriver)
+        return container
+
+    def remove_container(self, webdriver, container):
+        try:
+            with webdriver.context(webdriver.CONTEXT_CHROME):
+                webdriver.execute_script(REMOVE_CONTAINER, container)
+        except WebDriverException as ex:
+            with open(log_file, 'a+') as f:
+                print("failed to remove container for url: " + self.url + " " + ex.__str__(), file=f)
+
+    def execute(
+        self,
+        webdriver: Firefox,
+        browser_params: BrowserParams,
+        manager_params: ManagerParams,
+        extension_socket: ClientSocket,
+    ) -> None:
+        url = self.url
+        for i, (index, choice) in enumerate(self.choices):
+            self.url, self.index, self.choice = url, index, choice
+            self.reset_timings(webdriver)
+            try:
+                with tm.phase("startup"):
+                    container = self.open_container_tab(webdriver)
+            except WebDriverException as ex:
+                # without a container the choices would share one cookie jar, so the remaining ones are not visited.
+                # the command fails, which makes OpenWPM restart the browser
+                failed = [str(failed_index) for failed_index, _ in self.choices[i:]]
+                with open(log_file, 'a+') as f:
+                    print("failed to open a container tab for url: " + url + ", not visited: " + ", ".join(failed) +
+                          " " + ex.__str__(), file=f)
+                raise WebDriverException("no container tab for the choices " + ", ".join(failed) + " of " + url) from ex
+            try:
+                self.visit(webdriver, browser_params, manager_params)
+            finally:
+                # a new tab outside the container keeps the window open once the container tabs are closed
+                webdriver.switch_to.new_window("tab")
+                close_other_windows(webdriver)
+                self.remove_container(webdriver, container)
+
+
 class InitCommand(BaseCommand):
 
     def __init__(self) -> None:
@@ -330,6 +490,24 @@ class SetEntryCommand(BaseCommand):
             raise
 
 
+class SnapshotCommand(BaseCommand):
+    """
+    save a DOM snapshot of the current page for offline detection runs (see bannerclick/replay.py).
+    """
+
+    def __init__(self, index) -> None:
+        self.logger = logging.getLogger("openwpm")
+        self.index = index
+
+    def __repr__(self) -> str:
+        return "Snapshot({})".format(self.index)
+
+    def execute(self, webdriver: Firefox, browser_params: BrowserParams, manager_params: ManagerParams, extension_socket: ClientSocket) -> None:
+        current_url = webdriver.current_url
+        path = save_snapshot(webdriver, snapshot_dir, str(self.index), visit_id=self.index, url=current_url)
+        self.logger.info("Snapshot command is successfully executed and saved %s for: %s", path, current_url)
+
+
 class SaveDatabaseCommand(BaseCommand):
 
     def __init__(self) -> None:
@@ -342,9 +520,13 @@ class SaveDatabaseCommand(BaseCommand):
         Data.sql_addr = manager_params.storage_controller_address
         dbs_name = ["visits", "banners", "htmls"]
         dbs = bc.get_database()
+        visit_ids = set()
         for i, db in enumerate(dbs):
             dict_list = db.to_dict('records')
             for row in dict_list:
                 Data.save_record_in_sql(TableName(dbs_name[i]), row)
+                visit_ids.add(row['visit_id'])
+        for visit_id in visit_ids:
+            Data.finalize_visit(visit_id)
         self.logger.info("SaveDatabase command is successfully executed.")
 
@@ -0,0 +1,20 @@
+const { Services } = ChromeUtils.import("resource://gre/modules/Services.jsm");
+
+this.clearData = class extends ExtensionAPI {
+  getAPI(_context) {
+    return {
+      clearData: {
+        async clearSecuritySettings() {
+          // HSTS and other site security state are not covered by browsingData
+          const status = await new Promise((resolve) => {
+            Services.clearData.deleteData(
+              Ci.nsIClearDataService.CLEAR_SECURITY_SETTINGS,
+              resolve,
+            );
+          });
+          return status === 0;
+        },
+      },
+    };
+  }
+};
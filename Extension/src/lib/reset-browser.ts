@@ -0,0 +1,41 @@
+/**
+ * Brings the browser back to a clean state between the visits of a stateless
+ * crawl without restarting it: all tabs are replaced by a single blank tab, so
+ * no page can write new state while clearing, then cookies, site storage,
+ * cache, service workers and HSTS are removed.
+ */
+export const resetBrowser = async function (): Promise<{
+  success: boolean;
+  error: string | null;
+}> {
+  try {
+    const tabs = await browser.tabs.query({});
+    await browser.tabs.create({
+      url: "about:blank",
+      active: true,
+      windowId: tabs.length ? tabs[0].windowId : undefined,
+    });
+    await browser.tabs.remove(tabs.map((tab) => tab.id));
+    await browser.browsingData.remove(
+      {},
+      {
+        cache: true,
+        cookies: true,
+        downloads: true,
+        formData: true,
+        history: true,
+        indexedDB: true,
+        localStorage: true,
+        pluginData: true,
+        serviceWorkers: true,
+      },
+    );
+    const cleared = await (browser as any).clearData.clearSecuritySettings();
+    if (!cleared) {
+      return { success: false, error: "Failed to clear security settings" };
+    }
+    return { success: true, error: null };
+  } catch (error) {
+    return { success: false, error: String(error) };
+  }
+};
@@ -1,3 +1,4 @@
+import { resetBrowser } from "./lib/reset-browser";
 import * as socket from "./socket";
 
 let crawlID = null;
@@ -35,6 +36,15 @@ const listeningSocketCallback = async (data) => {
       storageController.send(JSON.stringify(["meta_information", data]));
       visitID = null;
       break;
+    case "Reset":
+      if (visitID) {
+        logWarn("Received Reset while visit_id was set");
+      }
+      await (browser as any).profileDirIO.writeFile(
+        "OPENWPM_RESET.txt",
+        JSON.stringify(await resetBrowser()),
+      );
+      break;
     default:
       // Just making sure that it's a valid number before logging
       newVisitID = parseInt(data, 10);
@@ -0,0 +1,210 @@
+import argparse
+import re
+import sqlite3
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from .htmlstore import HtmlStore
+except ImportError:
+    from htmlstore import HtmlStore
+
+
+# Groups near-duplicate banners (same CMP template / wording) of the htmls table with MinHash + LSH.
+# The table is streamed in chunks from SQLite or Parquet, so the html and signatures of only one chunk are in memory.
+# The LSH buckets (bands entries per banner) and one (banner_id, cluster_id) pair per banner still grow with the
+# table. The result is written as banner_clusters.
+#
+#   python -m bannerclick.banner_clustering datadir/crawl-data.sqlite --content datadir/content.ldb
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+EMPTY_SHINGLE = 0       # banners without any token share one shingle, so they fall into the same cluster
+CELL_BUDGET = 1 << 22   # max number of (shingle, permutation) cells hashed at once, i.e. 32 MB of uint64
+
+TAG_RE = re.compile(r"<(script|style)\b.*?</\1\s*>|<[^>]+>", re.S | re.I)
+WORD_RE = re.compile(r"\w+", re.U)
+
+
+def tokenize(html, mode="text"):   # text: visible words of the banner, html: tag names and attribute values too
+    if mode == "text":
+        html = TAG_RE.sub(" ", html)
+    return WORD_RE.findall(html.lower())
+
+
+def shingle_hashes(html, k=3, mode="text"):   # unique 32-bit hashes of the k-word shingles of a banner
+    words = tokenize(html or "", mode)
+    if not words:
+        return np.array([EMPTY_SHINGLE], dtype=np.uint64)
+    if len(words) <= k:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 61, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 61, size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, shingle_sets):   # (len(shingle_sets), num_perm) uint64 signatures, hashed in vectorized batches
+        sigs = np.empty((len(shingle_sets), self.num_perm), dtype=np.uint64)
+        max_shingles = max(1, CELL_BUDGET // self.num_perm)
+        start = 0
+        while start < len(shingle_sets):
+            end, total = start, 0
+            while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= max_shingles):
+                total += len(shingle_sets[end])
+                end += 1
+            batch = shingle_sets[start:end]
+            hashes = np.concatenate(batch)
+            offsets = np.cumsum([0] + [len(s) for s in batch[:-1]])
+            with np.errstate(over="ignore"):
+                permuted = (self.a * hashes + self.b) % MERSENNE_PRIME & MAX_HASH
+            sigs[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return sigs
+
+
+class LSHClusterer:   # online LSH: banners sharing any band bucket end up in one cluster (union-find over cluster ids)
+    def __init__(self, num_perm=128, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.mix = np.random.RandomState(7).randint(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self.buckets = [{} for _ in range(bands)]
+        self.parent = []
+
+    def find(self, c):
+        root = c
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[c] != root:
+            self.parent[c], c = root, self.parent[c]
+        return root
+
+    def band_keys(self, sigs):   # one 64-bit key per (banner, band)
+        banded = sigs.reshape(len(sigs), self.bands, self.rows)
+        with np.errstate(over="ignore"):
+            return np.bitwise_xor.reduce(banded * self.mix, axis=2)
+
+    def add(self, sigs):   # returns the provisional cluster id of every signature
+        keys = self.band_keys(sigs).tolist()
+        clusters = np.empty(len(keys), dtype=np.int64)
+        for i, row in enumerate(keys):
+            roots = {self.find(bucket[key]) for bucket, key in zip(self.buckets, row) if key in bucket}
+            if roots:
+                cluster = min(roots)
+                for root in roots:
+                    self.parent[root] = cluster
+            else:
+                cluster = len(self.parent)
+                self.parent.append(cluster)
+            for bucket, key in zip(self.buckets, row):
+                bucket.setdefault(key, cluster)
+            clusters[i] = cluster
+        return clusters
+
+    def resolve(self, clusters):   # final cluster ids after all merges
+        roots = np.array([self.find(c) for c in range(len(self.parent))], dtype=np.int64)
+        return roots[clusters] if len(roots) else clusters
+
+
+def iter_sqlite_chunks(db_path, chunk_size, store=None):
+    with sqlite3.connect(db_path) as con:
+        columns = [row[1] for row in con.execute("PRAGMA table_info(htmls)")]
+        hash_column = "html_hash" if "html_hash" in columns else "NULL"
+        cursor = con.execute(f"SELECT banner_id, html, {hash_column} FROM htmls")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [r[0] for r in rows], [rehydrate(r[1], r[2], store) for r in rows]
+
+
+def iter_parquet_chunks(path, chunk_size, store=None):
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(str(path), format="parquet")
+    columns = [c for c in ("banner_id", "html", "html_hash") if c in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_size):
+        data = batch.to_pydict()
+        hashes = data.get("html_hash", [None] * batch.num_rows)
+        htmls = data.get("html", [None] * batch.num_rows)
+        yield data["banner_id"], [rehydrate(html, h, store) for html, h in zip(htmls, hashes)]
+
+
+def rehydrate(html, content_hash, store):
+    if html is None and content_hash and store is not None:
+        return store.get(content_hash)
+    return html
+
+
+def cluster_banners(chunks, num_perm=128, bands=16, k=3, mode="text"):   # returns (banner_ids, cluster_ids) arrays
+    hasher = MinHasher(num_perm)
+    lsh = LSHClusterer(num_perm, bands)
+    ids, clusters = [], []
+    for banner_ids, htmls in chunks:
+        sigs = hasher.signatures([shingle_hashes(html, k, mode) for html in htmls])
+        ids.append(np.asarray(banner_ids, dtype=np.int64))
+        clusters.append(lsh.add(sigs))
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(ids), lsh.resolve(np.concatenate(clusters))
+
+
+def write_sqlite(db_path, banner_ids, cluster_ids, sizes):
+    with sqlite3.connect(db_path) as con:
+        con.execute("DROP TABLE IF EXISTS banner_clusters")
+        con.execute("CREATE TABLE banner_clusters (banner_id INTEGER PRIMARY KEY, cluster_id INTEGER, cluster_size INTEGER)")
+        con.executemany("INSERT INTO banner_clusters VALUES (?, ?, ?)",
+                        zip(banner_ids.tolist(), cluster_ids.tolist(), sizes.tolist()))
+
+
+def write_parquet(path, banner_ids, cluster_ids, sizes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    table = pa.table({"banner_id": banner_ids, "cluster_id": cluster_ids, "cluster_size": sizes})
+    pq.write_table(table, str(path / "banner_clusters.parquet"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate banners of the htmls table")
+    parser.add_argument("source", help="crawl-data.sqlite or the htmls Parquet dataset directory")
+    parser.add_argument("--content", help="content store of HTML_STORE crawls (LevelDB, gzip directory or s3:// path)")
+    parser.add_argument("--output", help="output sqlite db or Parquet directory (default: the sqlite source, or <source>/../banner_clusters)")
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=16, help="LSH bands; fewer rows per band lowers the similarity threshold")
+    parser.add_argument("--shingle", type=int, default=3, help="words per shingle")
+    parser.add_argument("--mode", choices=["text", "html"], default="text")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    store = HtmlStore(args.content) if args.content else None
+    if source.is_dir():
+        chunks = iter_parquet_chunks(source, args.chunk_size, store)
+    else:
+        chunks = iter_sqlite_chunks(source, args.chunk_size, store)
+    banner_ids, cluster_ids = cluster_banners(chunks, args.num_perm, args.bands, args.shingle, args.mode)
+    if store is not None:
+        store.close()
+    _, inverse, counts = np.unique(cluster_ids, return_inverse=True, return_counts=True)
+    sizes = counts[inverse]
+
+    if source.is_dir():
+        write_parquet(args.output or source.parent / "banner_clusters", banner_ids, cluster_ids, sizes)
+    else:
+        write_sqlite(args.output or source, banner_ids, cluster_ids, sizes)
+    print(f"{len(banner_ids)} banners in {len(counts)} clusters, {int((counts > 1).sum())} with more than one banner")
+
+
+if __name__ == "__main__":
+    main()
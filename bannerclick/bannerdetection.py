@@ -1,5 +1,5 @@
 import argparse
-import random
+import hashlib
 import time
 
 from PIL import Image
@@ -8,13 +8,16 @@ try:
     from .utility.utilityMethods import *
     from .config import *
     from . import cmpdetection as cd
+    from . import timings as tm
 except ImportError as E:
     print("run the module as a script")
     from utility.utilityMethods import *
     from config import *
     import cmpdetection as cd
+    import timings as tm
 
 rej_flag = False
+nc_result = None    # last completion signal of the neverconsent script: {'success', 'cmp', 'elapsed'}
 
 
 
@@ -205,6 +208,8 @@ def set_webdriver(web_driver=None):
             driver.maximize_window()
     if UBLOCK_ADDON:
         install_ublock(driver)
+    if NC_ADDON and MODIFIED_ADDON:
+        load_addon_js()
     return driver
 
 
@@ -396,35 +401,39 @@ def find_cookie_banners(origin_el=None, translate=False, stale_flag=False):
 
         if origin_el is None:
             wait = WebDriverWait(driver, 5)
-            body_el = wait.until(ec.visibility_of_element_located((By.TAG_NAME, "body")))
+            with tm.phase("readiness"):
+                body_el = wait.until(ec.visibility_of_element_located((By.TAG_NAME, "body")))
             # time.sleep(1)
             # body_el = driver.find_element(By.TAG_NAME, "body")
             origin_el = body_el
             shadowdom_flag = False
         else:
             shadowdom_flag = True
-        if translate:
-            detected_lang = this_lang
-            els_with_cookie = find_els_with_cookie(origin_el, detected_lang)
-        else:
-            detected_lang = "en"
-            els_with_cookie = find_els_with_cookie(origin_el)  # find all the element with cookies related words
-        if els_with_cookie:
-            banners_map = find_fixed_ancestors(els_with_cookie)
-            if not banners_map:
-                banners_map = find_by_zindex(els_with_cookie)
-            if not banners_map:
-                banners_map[origin_el] = find_deepest_el(els_with_cookie)
-            for item in banners_map.items():
-                optimal_el = find_optimal(driver, item)
-                if is_inside_viewport(optimal_el) and has_enough_word(optimal_el) and not is_signin_banner(optimal_el):
-                    banners.append(optimal_el)
-        frame_pairs = find_CMP_cookies_iframes(driver, detected_lang)  # check all the iframes to detect cookie banners
-        for frame_pair in frame_pairs:
-            if is_inside_viewport(frame_pair[0]):  # check if the banner is in viewport
-                banners.append(frame_pair)
+        with tm.phase("main_detection"):
+            if translate:
+                detected_lang = this_lang
+                els_with_cookie = find_els_with_cookie(origin_el, detected_lang)
+            else:
+                detected_lang = "en"
+                els_with_cookie = find_els_with_cookie(origin_el)  # find all the element with cookies related words
+            if els_with_cookie:
+                banners_map = find_fixed_ancestors(els_with_cookie)
+                if not banners_map:
+                    banners_map = find_by_zindex(els_with_cookie)
+                if not banners_map:
+                    banners_map[origin_el] = find_deepest_el(els_with_cookie)
+                for item in banners_map.items():
+                    optimal_el = find_optimal(driver, item)
+                    if is_inside_viewport(optimal_el) and has_enough_word(optimal_el) and not is_signin_banner(optimal_el):
+                        banners.append(optimal_el)
+        with tm.phase("iframe_scan"):
+            frame_pairs = find_CMP_cookies_iframes(driver, detected_lang)  # check all the iframes to detect cookie banners
+            for frame_pair in frame_pairs:
+                if is_inside_viewport(frame_pair[0]):  # check if the banner is in viewport
+                    banners.append(frame_pair)
         if not banners and not shadowdom_flag:
-            shadowdom_banners = find_shadowdom_banners(driver)
+            with tm.phase("shadow_dom_scan"):
+                shadowdom_banners = find_shadowdom_banners(driver)
             for dom_pair in shadowdom_banners:
                 banners.append(dom_pair)
                 # if is_inside_viewport(dom_pair[0]):  # check if the banner is in viewport
@@ -465,21 +474,16 @@ def detect_banners(data):  # return banners of the current running url
         this_url = data.url
         this_domain = data.domain
         this_lang = None
-        start_time = datetime.now()
         banners = find_cookie_banners()
-        finish_time = datetime.now()
-        completion_time = finish_time - start_time
-        # with open(banners_log_file, 'a+') as f:
-        #     init_str = this_domain + " banner detection finished within: " + str(
-        #         completion_time.microseconds)
-        #     print(init_str, file=f)
-
-        this_lang = page_lang(driver)
+
+        with tm.phase("language"):
+            this_lang = page_lang(driver)
         if ATTEMPTS:
             for att in range(ATTEMPTS):
                 if banners:
                     break
-                time.sleep(ATTEMPT_STEP)
+                with tm.phase("attempt_wait"):
+                    time.sleep(ATTEMPT_STEP)
                 if not banners:
                     banners = find_cookie_banners()
                 else:
@@ -487,7 +491,8 @@ def detect_banners(data):  # return banners of the current running url
                 data.ttw = (att + 1) * ATTEMPT_STEP
         if not banners and TRANSLATION:
             if "en" not in this_lang and is_in_langlist(this_lang):   # if no banner is found and the language of site is not english then translate the page and check again
-                translate_page(driver)
+                with tm.phase("translation"):
+                    translate_page(driver)
                 banners = find_cookie_banners(translate=True)
                 this_status = 3
                 data.status = this_status
@@ -504,29 +509,35 @@ def open_domain_plus_detect_banner(domain):  # first opens the domain then detec
     return detect_banners()
 
 
+def banner_disappeared(el: WebElement, timeout=0):
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(ec.invisibility_of_element(el))
+        return True
+    except TimeoutException:
+        return False
+    except Exception as E:
+        return True
+
+
+@tm.timed("nc_addon")
 def interact_with_cmp_banner(el: WebElement):
-    global driver, MODIFIED_ADDON
+    global driver, MODIFIED_ADDON, nc_result
     current_dir = os.path.dirname(os.path.abspath(__file__))
     # never_consent_extension_win_path = r'C:\Users\arasaii\AppData\Roaming\Mozilla\Firefox\Profiles\jf3srcbq.cookiesprofile\extensions\{816c90e6-757f-4453-a84f-362ff989f3e2}.xpi'  # Must be the full path to an XPI file!
     never_consent_extension_win_path = r'C:\Drives\Education\MPI\Intern\Codes\Workstation\bannerdetection\neverconsent\neverconsent.xpi'  # Must be the full path to an XPI file!
     never_consent_extension_path = current_dir + "/neverconsent/neverconsent.xpi"
     if MODIFIED_ADDON:
-        run_addon_js(driver)
-    else:
-        try:
-            id = driver.install_addon(never_consent_extension_path, temporary=True)
-        except:
-            id = driver.install_addon(never_consent_extension_win_path, temporary=True)
-    time.sleep(1.5)
-    if not MODIFIED_ADDON:
-        driver.uninstall_addon(id)
+        nc_result = run_addon_js(driver, NC_TIMEOUT, NC_SETTLE)
+        if nc_result and nc_result['success']:
+            return banner_disappeared(el, NC_SETTLE)
+        return banner_disappeared(el)
     try:
-        if el.is_displayed():
-            return False
-        else:
-            return True
-    except Exception as E:
-        return True
+        id = driver.install_addon(never_consent_extension_path, temporary=True)
+    except:
+        id = driver.install_addon(never_consent_extension_win_path, temporary=True)
+    disappeared = banner_disappeared(el, NC_TIMEOUT)
+    driver.uninstall_addon(id)
+    return disappeared
 
 
 def interact_with_banner(banner_item, choice, status, i, total_search=False):
@@ -672,6 +683,7 @@ def get_sc_file_name(index=None, url=None):
         return str(index+1) + " " + get_current_domain(driver, url)
 
 
+@tm.timed("screenshots")
 def take_current_page_sc(data=None, directory=None, suffix=""):
     global driver, SCREENSHOT
     if SCREENSHOT:
@@ -763,11 +775,16 @@ def extract_banner_data(banner_item):
     return banner_data
 
 
-def get_data_dicts(banner_data):
+def get_banner_id(visit_id, position):  # 53 bit id that is the same when a visit is retried, so the rows get replaced
+    digest = hashlib.blake2b(("%s:%d" % (visit_id, position)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 11
+
+
+def get_data_dicts(banner_data, position):
     global this_domain, visit_db, banner_db, html_db, this_index
     try:
         visit_id = this_index
-        banner_id = random.getrandbits(53)
+        banner_id = get_banner_id(visit_id, position)
         b_row_dict = {'banner_id': banner_id, 'visit_id': visit_id, 'domain': this_domain}
         h_row_dict = {'banner_id': banner_id, 'visit_id': visit_id, 'domain': this_domain}
         b_row_dict.update(banner_data)
@@ -783,6 +800,7 @@ def get_data_dicts(banner_data):
         return b_row_dict, h_row_dict
 
 
+@tm.timed("screenshots")
 def take_banners_sc(banners, data):
     if banners:
         for j, banner_item in enumerate(banners):
@@ -796,6 +814,7 @@ def take_banners_sc(banners, data):
         take_current_page_sc(data, nobanner_sc_dir)
 
 
+@tm.timed("extraction")
 def extract_banners_data(banners):
     banners_data = []
     for banner_item in banners:
@@ -805,6 +824,7 @@ def extract_banners_data(banners):
     return banners_data
 
 
+@tm.timed("db_write")
 def set_data_in_db_error(data):
     global this_domain
     try:
@@ -830,20 +850,27 @@ def set_data_in_db(data):
     except:
         body_html= None
     v_dict['dnsmpi'] = dnsmpi_detection(body_html)
+    v_dict['body_html'] = None
     if SAVE_BODY:
-        v_dict['body_html'] = body_html
-    else:
-        v_dict['body_html'] = None
+        if HTML_STORE and data.openwpm and body_html is not None:
+            v_dict['body_html_hash'], v_dict['body_html_size'] = data.save_html_blob(body_html)
+        else:
+            v_dict['body_html'] = body_html
     b_dict = {}
     h_dict = {}
     visit_db.loc[visit_db.shape[0], v_dict.keys()] = v_dict.values()  # not equal with: visit_db = visit_db.append(row_dict, ignore_index=True), using second one, new dataframe with new address will be created.
 
-    for banner_data in data.banners_data:
-        b_dict, h_dict = get_data_dicts(banner_data)
+    for j, banner_data in enumerate(data.banners_data):
+        b_dict, h_dict = get_data_dicts(banner_data, j)
         if data.openwpm:
             data.save_record_in_sql("banners", b_dict)
             if SAVE_HTML:
-                data.save_record_in_sql("htmls", h_dict)
+                if HTML_STORE and h_dict.get('html') is not None:
+                    h_row = dict(h_dict)
+                    h_row['html_hash'], h_row['html_size'] = data.save_html_blob(h_row.pop('html'))
+                    data.save_record_in_sql("htmls", h_row)
+                else:
+                    data.save_record_in_sql("htmls", h_dict)
 
     CMP_dict = cd.extract_CMP_data(data.CMP)
     v_dict.update(CMP_dict)
@@ -853,6 +880,7 @@ def set_data_in_db(data):
     return v_dict, b_dict, h_dict
 
 
+@tm.timed("post_sleep")
 def halt_for_sleep(data):
     if data.start_time:
         while True:
@@ -908,17 +936,22 @@ def click_continue_btn(driver, i):
 
 
 def interact_with_banners(data, choice):  # choices: 1.accept 2.reject
-    global rej_flag, this_banner_lang, this_interact_time
+    global rej_flag, this_banner_lang, this_interact_time, nc_result
     for i, banner in enumerate(data.banners):
         btn_status = {"btn_status": None, "btn_set_status": None}   #btn_status: 1. accept 2. reject; btn_set_status: 3. setting 1. add-on; for all if neg then it is non-explicit;
         this_banner_lang = data.banners_data[i]['lang']
         if choice:
-            interact_with_banner(banner, choice, btn_status, i)
-            data.nc_cmp_name = get_cmp_name_nc(driver)
+            nc_result = None
+            with tm.phase("interaction_" + suffix(choice).lstrip("_X")):
+                interact_with_banner(banner, choice, btn_status, i)
+            if nc_result and nc_result['cmp']:
+                data.nc_cmp_name = nc_result['cmp']
+            else:
+                data.nc_cmp_name = get_cmp_name_nc(driver)
 
         data.btn_status = btn_status
         rej_flag = False
-        data.interact_time = time.time() * 1000
+        data.interact_time = int(time.time() * 1000)
 
 
 def run_banner_detection(data, sc=SCREENSHOT):
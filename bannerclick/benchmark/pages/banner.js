@@ -0,0 +1,11 @@
+// Shared by the benchmark pages: records the choice on the top document and hides the banner that was clicked.
+function bcChoose(choice, btn) {
+  top.document.documentElement.dataset.bcChoice = choice;
+  var banner = btn.closest(".bc-banner");
+  if (banner) {
+    banner.style.display = "none";
+  }
+  if (window.frameElement) {
+    window.frameElement.style.display = "none";
+  }
+}
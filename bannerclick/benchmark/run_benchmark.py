@@ -0,0 +1,167 @@
+import argparse
+import functools
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+import bannerclick.bannerdetection as bc
+import bannerclick.timings as tm
+from bannerclick.headless import VisitData, banner_type, start_browser
+from bannerclick.profiler import profiler
+
+
+# End-to-end benchmark of banner detection and interaction on the local page corpus in pages/.
+# Every page is served from a local HTTP server, visited in a headless Firefox and checked against
+# ground_truth.json. Latency per phase, WebDriver round trips and correctness are written as JSON,
+# so results of different commits can be compared:
+#
+#   python -m bannerclick.benchmark.run_benchmark --repetitions 5 --output before.json
+#   python -m bannerclick.benchmark.run_benchmark --repetitions 5 --output after.json --compare before.json
+
+BENCHMARK_DIR = Path(__file__).parent
+CHOICES = {1: "accept", 2: "reject"}
+
+
+def serve(directory):
+    handler = functools.partial(QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def visit(driver, url, index, choice):
+    tm.reset()
+    profiler.reset()
+    start = time.perf_counter()
+    data = VisitData(url, index)
+    with tm.phase("page_load"):
+        driver.get(url)
+    banners = bc.run_banner_detection(data, sc=False)
+    data.banners = banners
+    data.banners_data = bc.extract_banners_data(banners)
+    bc.interact_with_banners(data, choice)
+    elapsed = (time.perf_counter() - start) * 1000
+    round_trips = profiler.summary()["round_trips"]
+    driver.switch_to.default_content()
+    marker = driver.execute_script("return document.documentElement.dataset.bcChoice || null;")
+    return {
+        "ms": elapsed,
+        "round_trips": round_trips,
+        "phases": {name: duration for name, (duration, _) in tm.spans.items()},
+        "banners": len(banners),
+        "type": banner_type(data.banners_data),
+        "choice": marker,
+    }
+
+
+def evaluate(result, truth, choice):
+    detected = result["banners"] == truth["banners"] and result["type"] == truth["type"]
+    expected_choice = CHOICES[choice] if truth["interactive"] else None
+    return detected, result["choice"] == expected_choice
+
+
+def percentiles(values):
+    return {p: float(np.percentile(values, q)) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+
+def summarize(runs):
+    phases = {}
+    for run in runs:
+        for name, duration in run["phases"].items():
+            phases.setdefault(name, []).append(duration)
+    return {
+        "runs": len(runs),
+        "latency_ms": percentiles([r["ms"] for r in runs]),
+        "round_trips": float(np.mean([r["round_trips"] for r in runs])),
+        "phases_ms": {name: float(np.mean(values)) for name, values in sorted(phases.items())},
+        "detection_correct": float(np.mean([r["detection_correct"] for r in runs])),
+        "interaction_correct": float(np.mean([r["interaction_correct"] for r in runs])),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    print(f"{'page':<22}{'p50 ms':>16}{'round trips':>18}{'detection':>14}{'interaction':>14}")
+    for page, new in results["pages"].items():
+        old = baseline["pages"].get(page)
+        if old is None:
+            continue
+        print(f"{page:<22}"
+              f"{old['latency_ms']['p50']:>8.0f} ->{new['latency_ms']['p50']:>5.0f}"
+              f"{old['round_trips']:>10.0f} ->{new['round_trips']:>5.0f}"
+              f"{old['detection_correct']:>8.2f} ->{new['detection_correct']:>4.2f}"
+              f"{old['interaction_correct']:>8.2f} ->{new['interaction_correct']:>4.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banner detection benchmark on the local page corpus")
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--choice", type=int, choices=sorted(CHOICES), default=1)
+    parser.add_argument("--attempts", type=int, default=0, help="ATTEMPTS used for pages without a detected banner")
+    parser.add_argument("--pages", default=str(BENCHMARK_DIR / "pages"))
+    parser.add_argument("--ground-truth", default=str(BENCHMARK_DIR / "ground_truth.json"))
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="results of a previous run to compare against")
+    args = parser.parse_args()
+
+    with open(args.ground_truth) as f:
+        ground_truth = json.load(f)
+    work_dir = Path(tempfile.mkdtemp(prefix="bannerclick-benchmark-"))
+    bc.log_file = str(work_dir / "logs.txt")
+    bc.SCREENSHOT = False
+    bc.ATTEMPTS = args.attempts
+
+    server = serve(args.pages)
+    driver = start_browser(1366, 768)
+    bc.set_webdriver(driver)
+    profiler.install(driver)
+    runs = {page: [] for page in ground_truth}
+    try:
+        for repetition in range(args.repetitions):
+            for index, (page, truth) in enumerate(ground_truth.items()):
+                url = f"http://127.0.0.1:{server.server_port}/{page}"
+                result = visit(driver, url, index, args.choice)
+                result["detection_correct"], result["interaction_correct"] = evaluate(result, truth, args.choice)
+                runs[page].append(result)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    pages = {page: summarize(page_runs) for page, page_runs in runs.items()}
+    all_runs = [run for page_runs in runs.values() for run in page_runs]
+    results = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "choice": CHOICES[args.choice],
+        "repetitions": args.repetitions,
+        "pages": pages,
+        "total": summarize(all_runs),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["total"], indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import functools
+import html
+import json
+import random
+import shutil
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from bannerclick.benchmark.run_benchmark import BENCHMARK_DIR, QuietHandler
+from bannerclick.utility.dictWords import words
+
+
+# Generator of synthetic consent-banner pages for load and scale tests without the network.
+# Every page draws its banner placement (fixed, z-index, iframe, nested iframes, open shadow root or none), the language
+# of the banner from dictWords.words, the size of the page and the number of cookie/privacy false positives in the
+# footer, and optionally injects the banner after a delay. manifest.json has the expected result of every page in the
+# format of ground_truth.json, and urls.txt lists the pages for demo.py:
+#
+#   python -m bannerclick.benchmark.synthetic synthetic/ --count 5000 --seed 1 --port 8000
+#   python -m bannerclick.benchmark.synthetic synthetic/ --serve --port 8000
+#   python demo.py --bannerclick --headless --num-browsers 16 synthetic/urls.txt
+#   python -m bannerclick.benchmark.run_benchmark --pages synthetic/ --ground-truth synthetic/manifest.json
+
+PLACEMENTS = {      # placement -> (banners, type) expected from run_banner_detection
+    "fixed": (1, "main"),
+    "zindex": (1, "main"),
+    "iframe": (1, "iframe"),
+    "nested_iframe": (1, "iframe"),
+    "shadow_dom": (1, "shadow_dom"),
+    "none": (0, None),
+}
+BANNER_STYLE = {
+    "fixed": "position: fixed; bottom: 0; left: 0; right: 0; z-index: 1000;",
+    "zindex": "position: absolute; top: 40px; left: 10%; width: 80%; z-index: 9999;",
+}
+FILLER = [
+    "The city council voted on Tuesday to extend the network of protected cycling lanes.",
+    "Construction is expected to start in spring and to be finished before the end of next year.",
+    "Forecasters expect clear skies and temperatures of up to twenty-four degrees on Saturday.",
+    "Shop owners along the main road asked for additional loading zones in the final draft.",
+    "The museum reopens its east wing after two years of renovation work.",
+    "Tickets for the summer festival went on sale this morning and sold out within an hour.",
+]
+NOISE = ["Cookie policy", "Privacy", "Privacy policy", "Cookie settings", "Manage preferences", "Data protection",
+         "We care about your privacy.", "Read how we use cookies on this site."]
+
+PAGE = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+  <style>
+    body {{ font-family: sans-serif; margin: 0; }}
+    header, main, footer {{ padding: 10px 40px; }}
+    .bc-banner {{ background: #fff; border: 1px solid #888; padding: 20px; box-sizing: border-box; }}
+  </style>
+  <script src="banner.js"></script>
+</head>
+<body>
+  <header><h1>{title}</h1><nav><a href="#">Home</a> <a href="#">World</a> <a href="#">Sports</a></nav></header>
+  <main>
+{articles}
+  </main>
+  <footer>
+{footer}
+  </footer>
+{banner}
+</body>
+</html>
+"""
+
+FRAME = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+  <meta charset="utf-8">
+  <style>body {{ font-family: sans-serif; margin: 0; }} .bc-banner {{ background: #fff; padding: 20px; }}</style>
+  <script src="banner.js"></script>
+</head>
+<body>
+{content}
+</body>
+</html>
+"""
+
+
+def translate(lang, word):
+    return words[lang].get(word) or words["en"][word]
+
+
+def banner_html(lang):
+    text = (f"{translate(lang, 'cookies').capitalize()} - {translate(lang, 'consent')} - "
+            f"{translate(lang, 'partner')} - {translate(lang, 'privacy policy')}")
+    return f"""<div class="bc-banner">
+      <p>{html.escape(text)}</p>
+      <button onclick="bcChoose('accept', this)">{html.escape(translate(lang, 'accept').capitalize())}</button>
+      <button onclick="bcChoose('reject', this)">{html.escape(translate(lang, 'reject').capitalize())}</button>
+      <button>{html.escape(translate(lang, 'setting').capitalize())}</button>
+    </div>"""
+
+
+def delayed(markup, delay):   # injects the markup into the body after delay ms
+    if not delay:
+        return markup
+    return f"""<template id="bc-delayed">{markup}</template>
+  <script>
+    setTimeout(function () {{
+      document.body.appendChild(document.getElementById("bc-delayed").content.cloneNode(true));
+    }}, {delay});
+  </script>"""
+
+
+def frame_tag(src, style):
+    return f'<iframe src="{src}" style="{style} border: 0; height: 220px;"></iframe>'
+
+
+def make_banner(name, placement, lang, delay, out_dir):   # returns the banner markup of the page, writes frame files
+    if placement == "none":
+        return ""
+    if placement in BANNER_STYLE:
+        return delayed(f'<div style="{BANNER_STYLE[placement]}">{banner_html(lang)}</div>', delay)
+    if placement == "shadow_dom":
+        return delayed(f"""<div class="bc-host" style="{BANNER_STYLE['fixed']}"></div>
+  <template class="bc-shadow">{banner_html(lang)}</template>
+  <script>
+    for (const host of document.querySelectorAll(".bc-host:not([data-attached])")) {{
+      host.dataset.attached = "1";
+      host.attachShadow({{mode: "open"}}).appendChild(document.querySelector(".bc-shadow").content.cloneNode(true));
+    }}
+  </script>""", delay)
+    content = banner_html(lang)
+    if placement == "nested_iframe":
+        (out_dir / f"{name}_inner.html").write_text(FRAME.format(lang=lang, content=content), encoding="utf-8")
+        content = frame_tag(f"{name}_inner.html", "width: 100%;")
+    (out_dir / f"{name}_frame.html").write_text(FRAME.format(lang=lang, content=content), encoding="utf-8")
+    return delayed(frame_tag(f"{name}_frame.html", BANNER_STYLE["fixed"]), delay)
+
+
+def make_page(rng, index, out_dir, max_articles, max_noise, delay_share):
+    name = f"page{index:05d}"
+    placement = rng.choice(list(PLACEMENTS))
+    lang = rng.choice(list(words))
+    articles = rng.randint(2, max_articles)
+    noise = rng.randint(0, max_noise)
+    delay = rng.choice([500, 1000, 2000, 3000]) if rng.random() < delay_share else 0
+    body = "\n".join(f"    <article><h2>Story {i}</h2><p>{' '.join(rng.sample(FILLER, 3))}</p></article>"
+                     for i in range(articles))
+    footer = "\n".join(f'    <a href="#">{rng.choice(NOISE)}</a>' for _ in range(noise))
+    banner = make_banner(name, placement, lang, delay, out_dir)
+    page = PAGE.format(lang=lang, title=f"Synthetic page {index}", articles=body, footer=footer, banner=banner)
+    (out_dir / f"{name}.html").write_text(page, encoding="utf-8")
+    banners, banner_type = PLACEMENTS[placement]
+    return f"{name}.html", {
+        "banners": banners, "type": banner_type, "interactive": bool(banners),
+        "placement": placement, "lang": lang, "delay_ms": delay, "articles": articles, "footer_noise": noise,
+    }
+
+
+def generate(out_dir, count, seed, host, port, max_articles=200, max_noise=100, delay_share=0.2):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    shutil.copy(BENCHMARK_DIR / "pages" / "banner.js", out_dir / "banner.js")
+    rng = random.Random(seed)
+    manifest = dict(make_page(rng, i, out_dir, max_articles, max_noise, delay_share) for i in range(count))
+    with open(out_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=1)
+    with open(out_dir / "urls.txt", "w") as f:
+        for page in manifest:
+            print(f"http://{host}:{port}/{page}", file=f)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate (or serve) synthetic consent-banner pages")
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-articles", type=int, default=200, help="upper bound of filler articles per page")
+    parser.add_argument("--max-noise", type=int, default=100, help="upper bound of cookie/privacy links in the footer")
+    parser.add_argument("--delay-share", type=float, default=0.2, help="share of pages injecting the banner late")
+    parser.add_argument("--serve", action="store_true", help="serve out_dir instead of generating pages")
+    args = parser.parse_args()
+
+    if args.serve:
+        handler = functools.partial(QuietHandler, directory=str(args.out_dir))
+        print(f"serving {args.out_dir} on http://{args.host}:{args.port}/")
+        ThreadingHTTPServer((args.host, args.port), handler).serve_forever()
+        return
+    manifest = generate(args.out_dir, args.count, args.seed, args.host, args.port,
+                        args.max_articles, args.max_noise, args.delay_share)
+    print(f"generated {len(manifest)} pages in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
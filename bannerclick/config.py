@@ -3,6 +3,7 @@ from datetime import datetime
 
 
 COMPLETE_RUN = False     # perform the run for all three mode of interaction
+MULTI_CHOICE = False     # with COMPLETE_RUN, run the three choices of a site in Firefox containers of one browser instead of three restarted browsers
 
 HEADLESS = True
 STATELESS = True
@@ -17,6 +18,7 @@ SCREENSHOT = True      # take screenshot
 NOBANNER_SC = True      # store screenshot of websites with no banner in another folder
 SAVE_HTML = True       # save HTML of the banner in "htmls" table
 SAVE_BODY = False       # save HTML of the body in "visits" table
+HTML_STORE = False      # store banner/body HTML once per sha256 in the unstructured storage, keeping only hash and size in the tables
 CHROME = False         # using chrome as the browser, available just for Banner Detection module (Not for OpenWPM)
 XPI = True           # enabling using extension in OpenWPM
 WATCHDOG = True
@@ -29,17 +31,27 @@ MODIFIED_ADDON = True       # using modified neverconsent addon
 UBLOCK_ADDON = False
 MOBILE_AGENT = False        # change the useragent to mobile
 TIERED300 = False       # use Tranco tiered 300 list
+WEBDRIVER_PROFILE = False      # count WebDriver round trips per visit into webdriver_profile.jsonl
+SNAPSHOT = False       # save a DOM snapshot of every page before detection, for offline runs with replay.py
 
 
 START_POINT = 0
 STEP_SIZE = 25000
 URL_MODE = 1     # prepending: 1. https, 2. http
 NUM_BROWSERS = 8
+FAST_RESET = False      # clear the browser state through the OpenWPM extension between visits instead of restarting the browser
+NUM_SPARE_BROWSERS = 0      # pre-launched browsers swapped in after every reset so the relaunch is off the critical path
+PREFLIGHT = False      # check DNS/TCP/TLS of all sites before the crawl, unreachable sites are stored with status 2 without a visit
+PREFLIGHT_CONCURRENCY = 500      # sites checked at the same time by the pre-flight
+SCHEDULE_HISTORY = []      # crawl-data.sqlite files of previous crawls, sites are submitted longest-expected-first
+ADAPTIVE_TIMEOUTS = False      # shorten the TIME_OUT*11 command timeout to 3x the p99 of successful visits, timed out sites are retried at the end
 TIME_OUT = 60     # OpenWPM timeout = TIME_OUT*11, Selenium timeout = TIME_OUT
 SLEEP_TIME = 1  # the amount of time waits after loading the website
 TEST_MODE_SLEEP = 0      # used for debugging
 ATTEMPTS = 2       # number of new try for finding banner
 ATTEMPT_STEP = 5      # time to wait before trying again
+NC_TIMEOUT = 1.5      # max time to wait for the neverconsent script to handle a CMP
+NC_SETTLE = 0.3       # time given to the CMP to hide its banner after neverconsent handled it
 CHOICE = 1        # 1.accept 2.reject
 
 verbose = "--SP"+str(START_POINT)
@@ -63,6 +75,8 @@ nobanner_sc_dir = sc_dir + "nobanner/"
 sc_file_name = ""
 log_file = data_dir + '/logs.txt'
 banners_log_file = data_dir + '/banners_log.txt'
+profile_file = data_dir + '/webdriver_profile.jsonl'
+snapshot_dir = data_dir + '/snapshots/'
 status_codes = ["failed", "timeout", "unreachable", "translated"]
 input_files_dir = "./bannerclick/input-files/"
 
@@ -105,6 +119,8 @@ visit_db = pd.DataFrame({
     'nc_cmp_name': pd.Series([], dtype='str'),
     'dnsmpi': pd.Series([], dtype='str'),
     'body_html': pd.Series([], dtype='str'),
+    'body_html_hash': pd.Series([], dtype='str'),
+    'body_html_size': pd.Series([], dtype='int'),
 })
 banner_db = pd.DataFrame({
     'banner_id': pd.Series([], dtype='int'),
@@ -124,6 +140,8 @@ html_db = pd.DataFrame({
     'visit_id': pd.Series([], dtype='int'),
     'domain': pd.Series([], dtype='str'),
     'html': pd.Series([], dtype='str'),
+    'html_hash': pd.Series([], dtype='str'),
+    'html_size': pd.Series([], dtype='int'),
 })
 
 
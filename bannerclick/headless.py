@@ -0,0 +1,41 @@
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options
+
+
+# Helpers shared by the runners that call the detection heuristics outside of an OpenWPM crawl
+# (benchmark/run_benchmark.py on the local page corpus, replay.py on saved DOM snapshots).
+
+
+class VisitData:   # the subset of CMPB_commands.Data used by run_banner_detection and interact_with_banners
+    def __init__(self, url, index):
+        self.url = url
+        self.index = index
+        self.domain = None
+        self.ttw = 0
+        self.status = 0
+        self.banners = []
+        self.banners_data = []
+        self.btn_status = {"btn_status": None, "btn_set_status": None}
+        self.nc_cmp_name = None
+        self.interact_time = 0
+        self.start_time = None
+        self.sleep = 0
+        self.openwpm = False
+
+
+def start_browser(width, height):
+    options = Options()
+    options.add_argument("-headless")
+    driver = webdriver.Firefox(options=options)
+    driver.set_window_size(width, height)
+    return driver
+
+
+def banner_type(banners_data):
+    if not banners_data:
+        return None
+    if banners_data[0].get("shadow_dom"):
+        return "shadow_dom"
+    if banners_data[0].get("iFrame"):
+        return "iframe"
+    return "main"
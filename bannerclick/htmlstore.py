@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import sqlite3
+from pathlib import Path
+
+
+# With HTML_STORE enabled the banner/body HTML is saved once per sha256 through the unstructured storage provider
+# (LevelDbProvider, LocalGzipProvider or S3UnstructuredProvider) and the htmls/visits rows keep only hash and size.
+
+
+def html_digest(html: str):   # returns (sha256 hex digest, utf-8 bytes) of the html
+    content = html.encode("utf-8")
+    return hashlib.sha256(content).hexdigest(), content
+
+
+class HtmlStore:   # rehydrates stored html from a LevelDB database, a gzip directory or an s3://bucket/base_path
+    def __init__(self, content_path):
+        self.content_path = str(content_path)
+        self.ldb = None
+        self.fs = None
+        if self.content_path.startswith("s3://"):
+            import s3fs
+            self.fs = s3fs.S3FileSystem()
+        elif (Path(self.content_path) / "CURRENT").exists():   # LevelDB marker file
+            import plyvel
+            self.ldb = plyvel.DB(self.content_path, create_if_missing=False, compression="snappy")
+
+    def get(self, content_hash):
+        if not content_hash:
+            return None
+        if self.ldb is not None:
+            content = self.ldb.get(content_hash.encode("ascii"))
+        elif self.fs is not None:
+            try:
+                with self.fs.open(self.content_path.rstrip("/") + "/" + content_hash, "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = None
+        else:
+            try:
+                with gzip.open(Path(self.content_path) / (content_hash + ".zip"), "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = None
+        return content.decode("utf-8") if content is not None else None
+
+    def close(self):
+        if self.ldb is not None:
+            self.ldb.close()
+            self.ldb = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_htmls(db_path, content_path, query="SELECT * FROM htmls", chunk_size=1000):   # yields htmls rows as dicts with 'html' filled in
+    with HtmlStore(content_path) as store, sqlite3.connect(db_path) as con:
+        con.row_factory = sqlite3.Row
+        cursor = con.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                row = dict(row)
+                if row.get("html") is None:
+                    row["html"] = store.get(row.get("html_hash"))
+                yield row
+
+
+def get_body_html(db_path, content_path, visit_id):   # body html of a visit, stored inline or by hash
+    with sqlite3.connect(db_path) as con:
+        row = con.execute("SELECT body_html, body_html_hash FROM visits WHERE visit_id = ?", (visit_id,)).fetchone()
+    if row is None:
+        return None
+    if row[0] is not None:
+        return row[0]
+    with HtmlStore(content_path) as store:
+        return store.get(row[1])
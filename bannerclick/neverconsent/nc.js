@@ -7,6 +7,7 @@ var nc_cmp;
 	  if (!nc_cmp){
 	      nc_cmp = arguments[0]
 	      localStorage['nc_cmp'] = arguments[0];
+	      window.dispatchEvent(new CustomEvent('nc-cmp', {detail: nc_cmp}));
 	  }
     }
   }
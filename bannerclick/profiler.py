@@ -0,0 +1,80 @@
+import json
+import sys
+import time
+from collections import defaultdict
+
+try:
+    from . import timings as tm
+except ImportError:
+    import timings as tm
+
+
+# Opt-in profiler of the WebDriver round trips (WEBDRIVER_PROFILE in config.py). It wraps execute() of the driver
+# instance shared by bannerdetection and cmpdetection, so element methods (which go through driver.execute as well)
+# are counted too. Every command is tagged with the innermost bannerclick function on the stack and the current
+# timing phase, which makes helpers that issue one call per element inside a loop easy to spot.
+
+STACK_DEPTH = 25    # frames inspected to find the issuing bannerclick function
+
+
+def caller_tag(frame):
+    for _ in range(STACK_DEPTH):
+        if frame is None:
+            break
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("bannerclick") or module == "CMPB_commands":
+            return module.rsplit(".", 1)[-1] + "." + frame.f_code.co_name
+        frame = frame.f_back
+    return "other"
+
+
+class WebDriverProfiler:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.commands = defaultdict(lambda: [0, 0.0])     # command -> [count, seconds]
+        self.callers = defaultdict(lambda: [0, 0.0])
+        self.phases = defaultdict(lambda: [0, 0.0])
+
+    def install(self, driver):
+        if getattr(driver, "bc_profiler", None) is self:
+            return
+        original_execute = driver.execute
+
+        def execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                self.record(driver_command, time.perf_counter() - start, caller_tag(sys._getframe(1)))
+
+        driver.execute = execute
+        driver.bc_profiler = self
+
+    def record(self, command, elapsed, caller):
+        for key, table in ((command, self.commands), (caller, self.callers), (tm.current_phase() or "other", self.phases)):
+            entry = table[key]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def summary(self):
+        def as_dict(table):
+            return {k: {"count": c, "ms": round(s * 1000, 2)}
+                    for k, (c, s) in sorted(table.items(), key=lambda item: -item[1][0])}
+        return {
+            "round_trips": sum(c for c, _ in self.commands.values()),
+            "ms": round(sum(s for _, s in self.commands.values()) * 1000, 2),
+            "commands": as_dict(self.commands),
+            "callers": as_dict(self.callers),
+            "phases": as_dict(self.phases),
+        }
+
+    def dump(self, path, visit_id, url):   # appends one JSON line per visit
+        record = {"visit_id": visit_id, "url": url}
+        record.update(self.summary())
+        with open(path, "a+") as f:
+            print(json.dumps(record), file=f)
+
+
+profiler = WebDriverProfiler()
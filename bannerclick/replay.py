@@ -0,0 +1,119 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import bannerclick.bannerdetection as bc
+from bannerclick.headless import VisitData, banner_type, start_browser
+from bannerclick.snapshot import load_snapshot, materialize
+
+
+# Offline detection runs on DOM snapshots saved with SNAPSHOT (config.py) or SnapshotCommand.
+# Detection is written against Selenium, so snapshots are not evaluated without a browser: every worker process
+# starts its own headless Firefox, rebuilds each snapshot as local html files and runs run_banner_detection on
+# the file:// page. No network, no waiting for the live site and no interaction, so a corpus is processed in
+# parallel on all cores and the output (one JSON line per snapshot) can be diffed between heuristic versions:
+#
+#   python -m bannerclick.replay datadir/.../snapshots --output before.jsonl
+#   python -m bannerclick.replay datadir/.../snapshots --output after.jsonl --compare before.jsonl
+
+driver = None
+work_dir = None
+
+
+def init_worker(attempts):
+    global driver, work_dir
+    work_dir = tempfile.mkdtemp(prefix="bannerclick-replay-")
+    bc.log_file = os.path.join(work_dir, "logs.txt")
+    bc.SCREENSHOT = False
+    bc.ATTEMPTS = attempts
+    bc.ATTEMPT_STEP = 0
+    driver = start_browser(1366, 768)
+    bc.set_webdriver(driver)
+    multiprocessing.util.Finalize(None, driver.quit, exitpriority=10)
+
+
+def fit_viewport(viewport):   # resizes the window so the inner size matches the captured viewport
+    inner = driver.execute_script("return [window.innerWidth, window.innerHeight];")
+    size = driver.get_window_size()
+    width = size["width"] + viewport["width"] - inner[0]
+    height = size["height"] + viewport["height"] - inner[1]
+    if (width, height) != (size["width"], size["height"]):
+        driver.set_window_size(width, height)
+
+
+def replay(path):
+    start = time.perf_counter()
+    snapshot = load_snapshot(path)
+    page_dir = os.path.join(work_dir, Path(path).name.split(".")[0])
+    result = {"snapshot": str(path), "visit_id": snapshot.get("visit_id"), "url": snapshot.get("url")}
+    try:
+        page = materialize(snapshot, page_dir)
+        if "viewport" in snapshot:
+            fit_viewport(snapshot["viewport"])
+        driver.get(Path(page).as_uri())
+        data = VisitData(snapshot.get("url"), snapshot.get("visit_id"))
+        banners = bc.run_banner_detection(data, sc=False)
+        banners_data = bc.extract_banners_data(banners)
+        result.update({
+            "banners": len(banners),
+            "type": banner_type(banners_data),
+            "rects": [[b["x"], b["y"], b["w"], b["h"]] for b in banners_data],
+            "langs": [b["lang"] for b in banners_data],
+        })
+    except Exception as ex:
+        result["error"] = ex.__str__()
+    finally:
+        shutil.rmtree(page_dir, ignore_errors=True)
+    result["ms"] = round((time.perf_counter() - start) * 1000)
+    return result
+
+
+def snapshot_files(source):
+    source = Path(source)
+    if source.is_file():
+        return [source]
+    return sorted(source.glob("*.json.gz"))
+
+
+def compare(results, baseline):
+    old = {r["snapshot"]: r for r in baseline}
+    changed = [r for r in results if r["snapshot"] in old and
+               (r.get("banners"), r.get("type")) != (old[r["snapshot"]].get("banners"), old[r["snapshot"]].get("type"))]
+    for r in changed:
+        before = old[r["snapshot"]]
+        print(f"{r['url']}: {before.get('banners')} {before.get('type')} -> {r.get('banners')} {r.get('type')}")
+    print(f"{len(changed)} of {len(results)} snapshots changed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banner detection on saved DOM snapshots")
+    parser.add_argument("source", help="a snapshot file or a directory of *.json.gz snapshots")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--attempts", type=int, default=0, help="ATTEMPTS used for pages without a detected banner")
+    parser.add_argument("--output", default="replay-results.jsonl")
+    parser.add_argument("--compare", help="results of a previous replay to compare against")
+    args = parser.parse_args()
+
+    files = snapshot_files(args.source)
+    results = []
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.attempts,)) as pool, \
+            open(args.output, "w") as out:
+        for result in pool.imap_unordered(replay, files, chunksize=4):
+            results.append(result)
+            print(json.dumps(result), file=out)
+        pool.close()
+        pool.join()
+    print(f"replayed {len(results)} snapshots, {sum('error' in r for r in results)} errors")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, [json.loads(line) for line in f])
+
+
+if __name__ == "__main__":
+    main()
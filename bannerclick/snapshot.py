@@ -0,0 +1,148 @@
+import gzip
+import html
+import json
+import os
+from datetime import datetime
+
+from selenium.webdriver.common.by import By
+
+from openwpm.commands.utils.webdriver_utils import execute_in_all_frames
+
+
+# Self-contained DOM snapshots for offline regression runs of the detection heuristics.
+# A snapshot holds the frame tree of a page; every frame is serialized with scripts and stylesheets removed and the
+# computed styles the heuristics look at (position, z-index, size, visibility, ...) inlined as style attributes.
+# Open shadow roots are kept as <template data-bc-shadow> and iframes are replaced by data-bc-frame placeholders,
+# so replay.py can rebuild the page from files without network access. Frames are numbered like
+# find_elements(By.TAG_NAME, "iframe") lists them, which is how both the capture and the detection on the replayed
+# page walk frames; iframes inside shadow roots are not in that list and are kept without content.
+
+SERIALIZE_JS = """
+const PROPS = ["display", "position", "top", "right", "bottom", "left", "width", "height", "z-index", "opacity",
+    "visibility", "overflow", "background-color", "color", "font-size", "font-weight", "line-height", "margin",
+    "padding", "border", "box-sizing", "float", "flex-direction", "justify-content", "align-items", "text-align"];
+const SKIP = new Set(["SCRIPT", "NOSCRIPT", "STYLE", "LINK", "TEMPLATE"]);
+const VOID = new Set(["AREA", "BASE", "BR", "COL", "EMBED", "HR", "IMG", "INPUT", "META", "PARAM", "SOURCE", "TRACK", "WBR"]);
+const escapeText = (t) => t.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+const escapeAttr = (t) => escapeText(t).replace(/"/g, "&quot;");
+// the iframes find_elements(By.TAG_NAME, "iframe") returns, in the same order
+const FRAMES = new Map(Array.from(document.querySelectorAll("iframe"), (frame, index) => [frame, index]));
+
+function serializeChildren(parent) {
+  let out = "";
+  for (const child of parent.childNodes) {
+    out += serialize(child);
+  }
+  return out;
+}
+
+function serialize(node) {
+  if (node.nodeType === Node.TEXT_NODE) {
+    return escapeText(node.nodeValue);
+  }
+  if (node.nodeType !== Node.ELEMENT_NODE || SKIP.has(node.tagName)) {
+    return "";
+  }
+  const tag = node.tagName.toLowerCase();
+  const style = getComputedStyle(node);
+  let attrs = "";
+  for (const attr of node.attributes) {
+    if (attr.name !== "style" && attr.name !== "src" && attr.name !== "srcdoc" && !attr.name.startsWith("on")) {
+      attrs += ` ${attr.name}="${escapeAttr(attr.value)}"`;
+    }
+  }
+  if (node.tagName === "IMG" && node.src) {
+    attrs += ` data-bc-src="${escapeAttr(node.src)}"`;
+  }
+  const inline = PROPS.map((p) => `${p}: ${style.getPropertyValue(p)}`).join("; ");
+  attrs += ` style="${escapeAttr(inline)}"`;
+  if (FRAMES.has(node)) {
+    attrs += ` data-bc-frame="${FRAMES.get(node)}"`;
+  }
+  if (VOID.has(node.tagName)) {
+    return `<${tag}${attrs}>`;
+  }
+  let inner = "";
+  if (node.shadowRoot) {
+    inner += `<template data-bc-shadow>${serializeChildren(node.shadowRoot)}</template>`;
+  }
+  inner += serializeChildren(node);
+  return `<${tag}${attrs}>${inner}</${tag}>`;
+}
+
+const root = document.documentElement;
+return {
+  url: document.URL,
+  lang: root ? root.getAttribute("lang") : null,
+  html: root ? serialize(root) : "",
+  viewport: {width: window.innerWidth, height: window.innerHeight},
+};
+"""
+
+
+def capture_snapshot(driver, max_depth=2):   # max_depth 2 matches the iframe-in-iframe depth of find_CMP_cookies_iframes
+    snapshot = {"captured_at": datetime.now().isoformat(timespec="seconds")}
+    frame_lists = {}
+
+    def collect(driver, frame_stack):
+        serialized = driver.execute_script(SERIALIZE_JS)
+        node = {"url": serialized["url"], "lang": serialized["lang"], "html": serialized["html"], "iframes": {}}
+        frame_lists[len(frame_stack)] = driver.find_elements(By.TAG_NAME, "iframe")
+        if len(frame_stack) == 1:
+            snapshot["viewport"] = serialized["viewport"]
+            snapshot["url"] = serialized["url"]
+            snapshot["frame"] = node
+            return
+        parent = snapshot["frame"]
+        for depth in range(1, len(frame_stack) - 1):
+            parent = parent["iframes"][str(frame_lists[depth].index(frame_stack[depth]))]
+        siblings = frame_lists[len(frame_stack) - 1]
+        if frame_stack[-1] in siblings:
+            parent["iframes"][str(siblings.index(frame_stack[-1]))] = node
+
+    execute_in_all_frames(driver, collect, frame_stack=["default"], max_depth=max_depth)
+    driver.switch_to.default_content()
+    return snapshot
+
+
+def save_snapshot(driver, directory, name, **meta):   # writes <directory>/<name>.json.gz and returns its path
+    snapshot = capture_snapshot(driver)
+    snapshot.update(meta)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + ".json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    return path
+
+
+def load_snapshot(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+RESTORE_JS = """<script>
+for (const template of document.querySelectorAll("template[data-bc-shadow]")) {
+  const root = template.parentElement.attachShadow({mode: "open"});
+  root.appendChild(template.content.cloneNode(true));
+  template.remove();
+}
+</script>"""
+
+
+def materialize(snapshot, directory):   # writes the frame tree as html files and returns the path of the top document
+    def write(node, name):
+        page = node["html"]
+        for index, child in node["iframes"].items():
+            child_name = f"{name}_{index}"
+            write(child, child_name)
+            marker = f'data-bc-frame="{index}"'
+            page = page.replace(marker, f'{marker} src="{html.escape(child_name)}.html"', 1)
+        close = page.rfind("</body>")
+        if close != -1:
+            page = page[:close] + RESTORE_JS + page[close:]
+        with open(os.path.join(directory, name + ".html"), "w", encoding="utf-8") as f:
+            f.write("<!DOCTYPE html>\n" + page)
+
+    os.makedirs(directory, exist_ok=True)
+    write(snapshot["frame"], "frame")
+    return os.path.join(directory, "frame.html")
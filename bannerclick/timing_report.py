@@ -0,0 +1,56 @@
+import argparse
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+
+# Summary of the visit_timings table: p50/p95/p99 (ms) of every phase over all visits and its share of the total time.
+#
+#   python -m bannerclick.timing_report datadir/crawl-data.sqlite
+#   python -m bannerclick.timing_report datadir/visit_timings   (Parquet dataset)
+
+
+def load_timings(source):
+    source = Path(source)
+    if source.is_dir():
+        return pd.read_parquet(source, columns=["visit_id", "phase", "duration", "calls"])
+    with sqlite3.connect(source) as con:
+        return pd.read_sql_query("SELECT visit_id, phase, duration, calls FROM visit_timings", con)
+
+
+def summarize(timings):
+    per_visit = timings.groupby(["phase", "visit_id"], sort=False)["duration"].sum()
+    grouped = per_visit.groupby(level="phase")
+    report = pd.DataFrame({
+        "visits": grouped.size(),
+        "total_s": grouped.sum() / 1000,
+        "mean": grouped.mean(),
+        "p50": grouped.quantile(0.5),
+        "p95": grouped.quantile(0.95),
+        "p99": grouped.quantile(0.99),
+        "max": grouped.max(),
+    })
+    report["share"] = report["total_s"] / report["total_s"].sum()
+    totals = timings.groupby("visit_id")["duration"].sum()
+    report.loc["(visit)"] = [len(totals), totals.sum() / 1000, totals.mean(), totals.quantile(0.5),
+                             totals.quantile(0.95), totals.quantile(0.99), totals.max(), 1.0]
+    report["visits"] = report["visits"].astype(int)
+    return report.sort_values("total_s", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-phase latency report of the visit_timings table")
+    parser.add_argument("source", help="crawl-data.sqlite or the visit_timings Parquet dataset directory")
+    parser.add_argument("--csv", help="also write the report to this csv file")
+    args = parser.parse_args()
+
+    report = summarize(load_timings(args.source))
+    with pd.option_context("display.float_format", "{:.1f}".format, "display.width", 200):
+        print(report)
+    if args.csv:
+        report.to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
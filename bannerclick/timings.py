@@ -0,0 +1,57 @@
+import functools
+import time
+from contextlib import contextmanager
+
+
+# Span timing for the phases of a visit. Phases nest (e.g. screenshots taken during an interaction) and are
+# accounted exclusively: while a nested phase runs the clock of the enclosing one is paused, so the durations
+# of all phases of a visit add up to the instrumented time instead of counting nested work twice.
+
+spans = {}      # phase -> [duration in ms, number of calls]
+stack = []      # open phases as [name, start of the current running slice]
+
+
+def reset():
+    spans.clear()
+    stack.clear()
+
+
+def current_phase():
+    return stack[-1][0] if stack else None
+
+
+def _charge(name, elapsed):
+    entry = spans.setdefault(name, [0.0, 0])
+    entry[0] += elapsed * 1000
+
+
+@contextmanager
+def phase(name):
+    now = time.perf_counter()
+    if stack:
+        _charge(stack[-1][0], now - stack[-1][1])
+    stack.append([name, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        _, start = stack.pop()
+        _charge(name, now - start)
+        spans[name][1] += 1
+        if stack:
+            stack[-1][1] = now
+
+
+def timed(name):   # decorator version of phase()
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records(visit_id):   # one row per phase for the visit_timings table
+    return [{'visit_id': visit_id, 'phase': name, 'duration': int(round(duration)), 'calls': calls}
+            for name, (duration, calls) in spans.items()]
@@ -158,11 +158,49 @@ def render_html(driver, html_string):
     # print("\n \n \n")
 
 
-def run_addon_js(driver):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    never_consent_js_path = current_dir + "/../neverconsent/nc.js"
-    js = open(never_consent_js_path).read()
-    driver.execute_script(js)
+# nc.js is installed once per page as window.__ncRun, later calls only send NC_BOOTSTRAP. The bootstrap resolves
+# once nc.js reports a handled CMP (plus a settle delay) or after the timeout, so the caller does not have to sleep
+# for a fixed amount of time. It resolves with 'missing' on a page nc.js was not installed in yet.
+NC_BOOTSTRAP = """
+const done = arguments[arguments.length - 1];
+if (typeof window.__ncRun !== 'function') {
+  done('missing');
+  return;
+}
+const timeout = arguments[0] * 1000, settle = arguments[1] * 1000;
+const start = performance.now();
+let finished = false;
+function finish(cmp) {
+  if (finished) return;
+  finished = true;
+  done({success: !!cmp, cmp: cmp || null, elapsed: performance.now() - start});
+}
+window.addEventListener('nc-cmp', (e) => setTimeout(() => finish(e.detail), settle), {once: true});
+setTimeout(() => finish(null), timeout);
+window.__ncRun();
+"""
+nc_js = None
+
+
+def load_addon_js():   # nc.js is read once per browser process, wrapped into the script that installs it in a page
+    global nc_js
+    if nc_js is None:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        never_consent_js_path = current_dir + "/../neverconsent/nc.js"
+        with open(never_consent_js_path) as f:
+            nc_js = "if (typeof window.__ncRun !== 'function') {\nwindow.__ncRun = function () {\n" + f.read() + "\n};\n}"
+    return nc_js
+
+
+def run_addon_js(driver, timeout=1.5, settle=0.3):  # returns {'success', 'cmp', 'elapsed'} or None if the script failed
+    try:
+        result = driver.execute_async_script(NC_BOOTSTRAP, timeout, settle)
+        if result == 'missing':   # first call on this page
+            driver.execute_script(load_addon_js())
+            result = driver.execute_async_script(NC_BOOTSTRAP, timeout, settle)
+        return result if isinstance(result, dict) else None
+    except WebDriverException:
+        return None
 
 
 def open_new_tab(driver: WebDriver):
@@ -7,12 +7,15 @@ import subprocess
 from pathlib import Path
 from bannerclick.config import *
 
-from CMPB_commands import init, CMPBCommand, InitCommand, SubGetCommand, BannerDetectionCommand, CMPDetectionCommand, SetEntryCommand, SaveDatabaseCommand
+from CMPB_commands import init, record_unreachable, CMPBCommand, MultiChoiceCommand, InitCommand, SubGetCommand, BannerDetectionCommand, CMPDetectionCommand, SetEntryCommand, SaveDatabaseCommand
 from openwpm.command_sequence import CommandSequence
 from openwpm.commands.browser_commands import GetCommand
 from openwpm.config import BrowserParams, ManagerParams
+from openwpm.storage.leveldb import LevelDbProvider
 from openwpm.storage.sql_provider import SQLiteStorageProvider
 from openwpm.task_manager import TaskManager
+from openwpm.utilities.preflight import Preflight
+from openwpm.utilities.scheduling import DurationEstimator, makespan_report, order_longest_first
 
 # The list of sites that we wish to crawl
 
@@ -73,9 +76,35 @@ else:    # read from .txt file
     sites = all_sites[START_POINT:START_POINT+STEP_SIZE]
 
 
+# the rank of a site in the input list is its site_rank and the visit_id of its bannerclick rows, every repetition
+# gets its own rank
+ranked_sites = []
+index = 0
+for site in sites:
+    if not site:
+        continue
+    ranked_sites.append((index, site))
+    index += args.num_repetitions
+
+# submit the slow sites first, so they do not keep the crawl busy at the end. the ranks stay those of the input list
+if SCHEDULE_HISTORY:
+    estimator = DurationEstimator.from_databases(SCHEDULE_HISTORY)
+    input_sites = [site for _, site in ranked_sites]
+    ranked_sites = order_longest_first(ranked_sites, estimator, key=lambda ranked: ranked[1])
+
+# resolve and connect to all sites at once, dead sites are not visited
+if PREFLIGHT:
+    preflight_results = Preflight(concurrency=PREFLIGHT_CONCURRENCY, timeout=TIME_OUT).run(site for _, site in ranked_sites)
+    with open(log_file, 'a+') as f:
+        print("pre-flight: " + str(sum(not r.reachable for r in preflight_results.values())) + " of " +
+              str(len(preflight_results)) + " sites unreachable", file=f)
+
 
 print("browsers ", args.num_browsers)
 manager_params = ManagerParams(num_browsers=args.num_browsers)
+manager_params.num_spare_browsers = NUM_SPARE_BROWSERS
+manager_params.fast_reset = FAST_RESET
+manager_params.adaptive_timeouts = ADAPTIVE_TIMEOUTS
 if HEADLESS:
     browser_params = [BrowserParams(display_mode="headless") for _ in range(args.num_browsers)]
 else:
@@ -98,6 +127,8 @@ for browser_param in browser_params:
     if MOBILE_AGENT:
         browser_param.prefs["general.useragent.override"] = "Mozilla/5.0 (Android 12; Mobile; rv:68.0) Gecko/68.0 Firefox/93.0"
     browser_param.extension_enabled = XPI
+    if MULTI_CHOICE:
+        browser_param.prefs["privacy.userContext.enabled"] = True
 
 
 manager_params.data_directory = Path(data_dir)
@@ -134,14 +165,23 @@ with TaskManager(
     manager_params,
     browser_params,
     SQLiteStorageProvider(Path(data_dir + "/crawl-data.sqlite")),
-    None,
+    LevelDbProvider(Path(data_dir + "/content.ldb")) if HTML_STORE else None,
 ) as manager:
 
-    index = 0
-
-    for site in sites:
-        if not site:
-            continue
+    for index, site in ranked_sites:
+
+        load_url = None   # the variant of site that answered the pre-flight, the records keep site
+        if PREFLIGHT:
+            checked = preflight_results[site]
+            if not checked.reachable:
+                if args.bannerclick:
+                    for repetition in range(args.num_repetitions):
+                        indices = [index + repetition]
+                        if COMPLETE_RUN:
+                            indices += [index + repetition + OFFSET_ACCEPT, index + repetition + OFFSET_REJECT]
+                        record_unreachable(manager_params, indices, site)
+                continue
+            load_url = checked.url
 
         def callback(success: bool, val: str = site) -> None:
             print(
@@ -160,24 +200,33 @@ with TaskManager(
                 # command_sequence.append_command(CMPBCommand(url=site, sleep=SLEEP_TIME, index=index, timeout=TIME_OUT, choice=4), timeout=TIME_OUT * 11)
                 # manager.execute_command_sequence(command_sequence)
 
-                # 1. accept
-                command_sequence = CommandSequence(site, site_rank=index , callback=callback, reset=True)
-                command_sequence.append_command(
-                    CMPBCommand(url=site, sleep=SLEEP_TIME, index=index, timeout=TIME_OUT, choice=1),
-                    timeout=TIME_OUT * 11)
-                manager.execute_command_sequence(command_sequence)
-
-                if COMPLETE_RUN:
-                    # 2. accept the banner
-                    command_sequence = CommandSequence(site, site_rank=index + OFFSET_ACCEPT, callback=callback, reset=True)
-                    command_sequence.append_command(CMPBCommand(url=site, sleep=SLEEP_TIME, index=index + OFFSET_ACCEPT, timeout=TIME_OUT, choice=1), timeout=TIME_OUT * 11)
+                # all three choices in containers of the same browser, stored under the same offsets as below
+                if COMPLETE_RUN and MULTI_CHOICE:
+                    choices = [(index, 1), (index + OFFSET_ACCEPT, 1), (index + OFFSET_REJECT, 2)]
+                    command_sequence = CommandSequence(site, site_rank=index, callback=callback, reset=False)
+                    command_sequence.append_command(
+                        MultiChoiceCommand(url=site, sleep=SLEEP_TIME, choices=choices, timeout=TIME_OUT, load_url=load_url),
+                        timeout=TIME_OUT * 11 * len(choices))
                     manager.execute_command_sequence(command_sequence)
-
-                    # 3. reject the banner
-                    command_sequence = CommandSequence(site, site_rank=index + OFFSET_REJECT, callback=callback, reset=True)
-                    command_sequence.append_command(CMPBCommand(url=site, sleep=SLEEP_TIME, index=index + OFFSET_REJECT, timeout=TIME_OUT, choice=2), timeout=TIME_OUT * 11)
+                else:
+                    # 1. accept
+                    command_sequence = CommandSequence(site, site_rank=index , callback=callback, reset=True)
+                    command_sequence.append_command(
+                        CMPBCommand(url=site, sleep=SLEEP_TIME, index=index, timeout=TIME_OUT, choice=1, load_url=load_url),
+                        timeout=TIME_OUT * 11)
                     manager.execute_command_sequence(command_sequence)
 
+                    if COMPLETE_RUN:
+                        # 2. accept the banner
+                        command_sequence = CommandSequence(site, site_rank=index + OFFSET_ACCEPT, callback=callback, reset=True)
+                        command_sequence.append_command(CMPBCommand(url=site, sleep=SLEEP_TIME, index=index + OFFSET_ACCEPT, timeout=TIME_OUT, choice=1, load_url=load_url), timeout=TIME_OUT * 11)
+                        manager.execute_command_sequence(command_sequence)
+
+                        # 3. reject the banner
+                        command_sequence = CommandSequence(site, site_rank=index + OFFSET_REJECT, callback=callback, reset=True)
+                        command_sequence.append_command(CMPBCommand(url=site, sleep=SLEEP_TIME, index=index + OFFSET_REJECT, timeout=TIME_OUT, choice=2, load_url=load_url), timeout=TIME_OUT * 11)
+                        manager.execute_command_sequence(command_sequence)
+
 
             # Run the code without bannerclick, e.g. for consistency measurements
             # "Shivani's algorithm"
@@ -185,7 +234,7 @@ with TaskManager(
 
                 # Parallelize sites over all number of browsers set above.
                 command_sequence = CommandSequence(site, site_rank=index, callback=callback, reset=True)
-                command_sequence.append_command(GetCommand(url=site, sleep=SLEEP_TIME), timeout=TIME_OUT)
+                command_sequence.append_command(GetCommand(url=load_url or site, sleep=SLEEP_TIME), timeout=TIME_OUT)
                 manager.execute_command_sequence(command_sequence)
 
 
@@ -199,4 +248,8 @@ with TaskManager(
         print(init_str, file=f)
     time.sleep(TIME_OUT*2)
 
-
+if SCHEDULE_HISTORY:
+    visits_per_site = args.num_repetitions * (3 if args.bannerclick and COMPLETE_RUN and not MULTI_CHOICE else 1)
+    submissions = [site for site in input_sites for _ in range(visits_per_site)]
+    with open(log_file, 'a+') as f:
+        print(makespan_report(submissions, estimator, args.num_browsers, Path(data_dir + "/crawl-data.sqlite")), file=f)
@@ -20,7 +20,7 @@ from selenium.common.exceptions import WebDriverException
 from tblib import Traceback, pickling_support
 
 from .command_sequence import CommandSequence
-from .commands.browser_commands import FinalizeCommand
+from .commands.browser_commands import FinalizeCommand, ResetCommand
 from .commands.profile_commands import dump_profile
 from .commands.types import BaseCommand, ShutdownSignal
 from .commands.utils.webdriver_utils import parse_neterror
@@ -34,6 +34,7 @@ from .utilities.multiprocess_utils import (
     kill_process_and_children,
     parse_traceback_for_sentry,
 )
+from .utilities.process_monitor import BrowserProcessMonitor
 
 pickling_support.install()
 
@@ -50,12 +51,15 @@ class BrowserManagerHandle:
     :param manager_params: are the TaskManager configuration settings.
     :param browser_params: are per-browser parameter settings (e.g. whether
         this browser is headless, etc.)
+    :param process_monitor: if given, the pids of the display and geckodriver
+        are added to its pid index as soon as they are launched
     """
 
     def __init__(
         self,
         manager_params: ManagerParamsInternal,
         browser_params: BrowserParamsInternal,
+        process_monitor: Optional[BrowserProcessMonitor] = None,
     ) -> None:
         # Constants
         self._SPAWN_TIMEOUT = 120  # seconds
@@ -69,11 +73,15 @@ class BrowserManagerHandle:
         self.curr_visit_id: Optional[VisitId] = None
         self.browser_params = browser_params
         self.manager_params = manager_params
+        self.process_monitor = process_monitor
 
         # Queues and process IDs for BrowserManager
 
         self.command_thread: Optional[threading.Thread] = None
-        """thread to run commands issued from TaskManager"""
+        """thread of the TaskManager running commands on this browser"""
+        self.idle = threading.Event()
+        """set while the browser is not executing a CommandSequence"""
+        self.idle.set()
         self.command_queue: Optional[Queue] = None
         """queue for passing command objects to BrowserManager"""
         self.status_queue: Optional[Queue] = None
@@ -90,6 +98,9 @@ class BrowserManagerHandle:
         self.restart_required: bool = False
         """indicates if the browser should be restarted"""
 
+        self.visits_since_launch = 0
+        """number of CommandSequences since the last (re)start"""
+
         self.current_timeout: Optional[int] = None
         """timeout of the current command"""
         self.browser_manager: Optional[Process] = None
@@ -99,11 +110,15 @@ class BrowserManagerHandle:
 
     def ready(self):
         """return if the browser is ready to accept a command"""
-        return self.command_thread is None or not self.command_thread.is_alive()
+        return self.idle.is_set()
 
     def set_visit_id(self, visit_id):
         self.curr_visit_id = visit_id
 
+    def _register_pid(self, pid: Optional[int]) -> None:
+        if pid is not None and self.process_monitor is not None:
+            self.process_monitor.register(pid)
+
     def launch_browser_manager(self) -> bool:
         """
         sets up the BrowserManager and gets the process id, browser pid and,
@@ -177,10 +192,12 @@ class BrowserManagerHandle:
                 check_queue(launch_status)
                 # 3. Display launched (if necessary)
                 self.display_pid, self.display_port = check_queue(launch_status)
+                self._register_pid(self.display_pid)
                 # 4. Browser launch attempted
                 check_queue(launch_status)
                 # 5. Browser launched
                 self.geckodriver_pid = check_queue(launch_status)
+                self._register_pid(self.geckodriver_pid)
 
                 ready = check_queue(launch_status)
                 if ready != "READY":
@@ -220,6 +237,7 @@ class BrowserManagerHandle:
         # and previous profile path.
         if success:
             self.logger.debug("BROWSER %i: Browser spawn successful!" % self.browser_id)
+            self.visits_since_launch = 0
             previous_profile_path = self.current_profile_path
             self.current_profile_path = browser_profile_path
             if previous_profile_path is not None:
@@ -266,28 +284,28 @@ class BrowserManagerHandle:
             if force:
                 return
 
-            # Join current command thread (if it exists)
+            # Wait for the current CommandSequence (if there is one)
             in_command_thread = threading.current_thread() == self.command_thread
-            if not in_command_thread and self.command_thread is not None:
+            if not in_command_thread and not self.idle.is_set():
                 self.logger.debug(
-                    "BROWSER %i: Joining command thread" % self.browser_id
+                    "BROWSER %i: Waiting for command thread" % self.browser_id
                 )
                 start_time = time.time()
                 if self.current_timeout is not None:
-                    self.command_thread.join(self.current_timeout + 10)
+                    self.idle.wait(self.current_timeout + 10)
                 else:
-                    self.command_thread.join(60)
+                    self.idle.wait(60)
 
-                # If command thread is still alive, process is locked
-                if self.command_thread.is_alive():
+                # If the CommandSequence is still running, process is locked
+                if not self.idle.is_set():
                     self.logger.debug(
-                        "BROWSER %i: command thread failed to join during close. "
+                        "BROWSER %i: command thread failed to finish during close. "
                         "Assuming the browser process is locked..." % self.browser_id
                     )
                     return
 
                 self.logger.debug(
-                    "BROWSER %i: %f seconds to join command thread"
+                    "BROWSER %i: %f seconds to wait for command thread"
                     % (self.browser_id, time.time() - start_time)
                 )
 
@@ -361,6 +379,7 @@ class BrowserManagerHandle:
             },
         )
         self.is_fresh = False
+        self.visits_since_launch += 1
 
         reset = command_sequence.reset
         self.logger.info(
@@ -376,6 +395,12 @@ class BrowserManagerHandle:
             command, timeout = command_and_timeout
             command.set_visit_browser_id(self.curr_visit_id, self.browser_id)
             command.set_start_time(time.time())
+            adapted = False
+            policy = task_manager.timeout_policy
+            if policy is not None and command_sequence.adaptive_timeouts:
+                adaptive_timeout = policy.timeout(type(command).__name__, timeout)
+                adapted = adaptive_timeout < timeout
+                timeout = adaptive_timeout
             self.current_timeout = timeout
 
             # Adding timer to track performance of commands
@@ -434,6 +459,10 @@ class BrowserManagerHandle:
             else:
                 raise ValueError("Unknown browser status message %s" % status)
 
+            duration = (time.time_ns() - t1) / 1000000
+            if command_status == "ok" and policy is not None:
+                policy.observe(type(command).__name__, duration / 1000)
+
             task_manager.sock.store_record(
                 TableName("crawl_history"),
                 self.curr_visit_id,
@@ -448,9 +477,14 @@ class BrowserManagerHandle:
                     "command_status": command_status,
                     "error": error_text,
                     "traceback": tb,
-                    "duration": int((time.time_ns() - t1) / 1000000),
+                    "duration": int(duration),
                 },
             )
+            # the retry with the original timeout is the real result of a
+            # command that only exceeded its adapted timeout
+            requeued = command_status == "timeout" and adapted
+            if requeued:
+                task_manager.requeue_timed_out(command_sequence, self.curr_visit_id)
 
             if command_status == "critical":
                 task_manager.sock.finalize_visit_id(
@@ -460,19 +494,20 @@ class BrowserManagerHandle:
                 return
 
             if command_status != "ok":
-                with task_manager.threadlock:
-                    task_manager.failure_count += 1
-                if task_manager.failure_count > task_manager.failure_limit:
-                    self.logger.critical(
-                        "BROWSER %i: Command execution failure pushes failure "
-                        "count above the allowable limit. Setting "
-                        "failure_status." % self.browser_id
-                    )
-                    task_manager.failure_status = {
-                        "ErrorType": "ExceedCommandFailureLimit",
-                        "CommandSequence": command_sequence,
-                    }
-                    return
+                if not requeued:
+                    with task_manager.threadlock:
+                        task_manager.failure_count += 1
+                    if task_manager.failure_count > task_manager.failure_limit:
+                        self.logger.critical(
+                            "BROWSER %i: Command execution failure pushes failure "
+                            "count above the allowable limit. Setting "
+                            "failure_status." % self.browser_id
+                        )
+                        task_manager.failure_status = {
+                            "ErrorType": "ExceedCommandFailureLimit",
+                            "CommandSequence": command_sequence,
+                        }
+                        return
                 self.restart_required = True
                 self.logger.debug(
                     "BROWSER %i: Browser restart required" % self.browser_id
@@ -501,7 +536,15 @@ class BrowserManagerHandle:
         if task_manager.closing:
             return
 
+        if reset and not self.restart_required and self.can_fast_reset():
+            if self.fast_reset(task_manager, command_sequence):
+                return
+
         if self.restart_required or reset:
+            # A warm spare replaces this browser, which is then closed
+            # in the background
+            if reset and task_manager.swap_in_spare_browser(self):
+                return
             success = self.restart_browser_manager(clear_profile=reset)
             if not success:
                 self.logger.critical(
@@ -515,6 +558,52 @@ class BrowserManagerHandle:
                 return
             self.restart_required = False
 
+    def can_fast_reset(self) -> bool:
+        """return if the browser can be reset in place instead of restarted"""
+        return (
+            self.manager_params.fast_reset
+            and self.browser_params.extension_enabled
+            and self.visits_since_launch < self.manager_params.fast_reset_max_visits
+        )
+
+    def fast_reset(
+        self, task_manager: "TaskManager", command_sequence: CommandSequence
+    ) -> bool:
+        """
+        Clears the browser state through the extension, keeping the browser
+        running. Returns False if the browser has to be restarted instead.
+        """
+        assert self.command_queue is not None
+        assert self.status_queue is not None
+        command = ResetCommand(verify=self.manager_params.verify_reset)
+        command.set_visit_browser_id(self.curr_visit_id, self.browser_id)
+        command.set_start_time(time.time())
+        self.command_queue.put(command)
+        try:
+            status = self.status_queue.get(True, command.timeout + 10)
+        except EmptyQueue:
+            self.logger.info(
+                "BROWSER %i: Timeout during fast reset, restarting browser"
+                % self.browser_id
+            )
+            return False
+        if status == "OK":
+            self.logger.debug("BROWSER %i: Fast reset successful" % self.browser_id)
+            return True
+        error_text, _ = self._unpack_pickled_error(status[1])
+        if status[0] == "CRITICAL":
+            task_manager.failure_status = {
+                "ErrorType": "CriticalChildException",
+                "CommandSequence": command_sequence,
+                "Exception": status[1],
+            }
+            return True
+        self.logger.info(
+            "BROWSER %i: Fast reset failed with %s, restarting browser"
+            % (self.browser_id, error_text.strip())
+        )
+        return False
+
     def _unpack_pickled_error(self, pickled_error: bytes) -> Tuple[str, str]:
         """Unpacks `pickled_error` into an error `message` and `tb` string."""
         exc = pickle.loads(pickled_error)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable, List, Optional, Tuple
 
@@ -16,6 +17,31 @@ from .commands.types import BaseCommand
 from .errors import CommandExecutionError
 
 
+@dataclass
+class CommandSequenceResult:
+    """Outcome of a CommandSequence submitted with `TaskManager.submit`.
+
+    Timestamps are `time.time()` values: when the sequence was submitted,
+    when it was handed to a browser and when the StorageController confirmed
+    that all of its data has been saved (or that the visit was interrupted).
+    """
+
+    visit_id: int
+    url: str
+    success: bool
+    submitted_at: float
+    dispatched_at: float
+    completed_at: float
+
+    @property
+    def queue_time(self) -> float:
+        return self.dispatched_at - self.submitted_at
+
+    @property
+    def total_time(self) -> float:
+        return self.completed_at - self.submitted_at
+
+
 class CommandSequence:
     """A CommandSequence wraps a series of commands to be performed
     on a visit to one top-level site into one logical
@@ -73,6 +99,12 @@ class CommandSequence:
         self.contains_get_or_browse = False
         self.site_rank = site_rank
         self.callback = callback
+        self.visit_id: Optional[int] = None
+        # time the sequence was handed to a browser
+        self.dispatched_at: Optional[float] = None
+        # False for the retry of a sequence that timed out under an
+        # adaptive timeout, see ManagerParams.adaptive_timeouts
+        self.adaptive_timeouts = True
 
     def get(self, sleep=0, timeout=60):
         """goes to a url"""
@@ -3,11 +3,14 @@ import json
 import logging
 import os
 import random
+import sqlite3
 import sys
 import time
 import traceback
 from glob import glob
 from hashlib import md5
+from pathlib import Path
+from typing import List
 
 from PIL import Image
 from selenium.common.exceptions import (
@@ -21,6 +24,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
 from ..config import BrowserParams, ManagerParams
+from ..errors import BrowserCrashError
 from ..socket_interface import ClientSocket
 from .types import BaseCommand
 from .utils.webdriver_utils import (
@@ -498,6 +502,75 @@ class FinalizeCommand(BaseCommand):
         extension_socket.send(msg)
 
 
+def profile_leftovers(browser_profile_path: Path) -> List[str]:
+    """Returns the cookies and site storage that are left in the profile"""
+    leftovers = []
+    cookies_db = browser_profile_path / "cookies.sqlite"
+    if cookies_db.exists():
+        conn = sqlite3.connect(f"file:{cookies_db}?mode=ro", uri=True)
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM moz_cookies").fetchone()
+        finally:
+            conn.close()
+        if count:
+            leftovers.append("%d cookies" % count)
+    site_storage = browser_profile_path / "storage" / "default"
+    if site_storage.exists():
+        leftovers.extend(
+            "storage of %s" % origin.name
+            for origin in site_storage.iterdir()
+            if not origin.name.startswith("moz-extension")
+        )
+    return leftovers
+
+
+class ResetCommand(BaseCommand):
+    """Makes the extension close all tabs and clear cookies, site storage,
+    cache, service workers and HSTS, so a stateless crawl can continue in the
+    same browser instead of restarting it.
+    Raises if the extension does not report a successful reset in time.
+    """
+
+    def __init__(self, timeout: int = 30, verify: bool = False) -> None:
+        self.timeout = timeout
+        self.verify = verify
+
+    def __repr__(self):
+        return f"ResetCommand({self.timeout},{self.verify})"
+
+    def execute(
+        self,
+        webdriver,
+        browser_params,
+        manager_params,
+        extension_socket,
+    ):
+        reset_file = browser_params.profile_path / "OPENWPM_RESET.txt"
+        extension_socket.send({"action": "Reset", "visit_id": self.visit_id})
+        elapsed = 0.0
+        while not reset_file.exists():
+            if elapsed > self.timeout:
+                raise BrowserCrashError("The extension did not reset in time")
+            time.sleep(0.1)
+            elapsed += 0.1
+        result = json.loads(reset_file.read_text())
+        reset_file.unlink()
+        if not result["success"]:
+            raise BrowserCrashError("Reset failed: %s" % result["error"])
+
+        # The extension closed all tabs except for a new blank one
+        webdriver.switch_to.window(webdriver.window_handles[0])
+
+        if self.verify:
+            # Firefox writes the deletions to disk asynchronously
+            leftovers = profile_leftovers(browser_params.profile_path)
+            while leftovers and elapsed < self.timeout:
+                time.sleep(0.5)
+                elapsed += 0.5
+                leftovers = profile_leftovers(browser_params.profile_path)
+            assert not leftovers, "Profile not empty after reset: %s" % leftovers
+
+
 class InitializeCommand(BaseCommand):
     """The command is automatically prepended to the beginning of a
     CommandSequence
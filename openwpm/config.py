@@ -132,10 +132,50 @@ class ManagerParams(DataClassJsonMixin):
     memory_watchdog: bool = False
     """A watchdog that tries to ensure that no Firefox instance takes up too much memory.
     It is mostly useful for long running cloud crawls"""
+    memory_metrics: bool = False
+    """Append the memory sampled by the memory watchdog to
+    `data_directory/browser_memory.jsonl`, one JSON object per browser every
+    10 seconds. The last hour of samples is also available in
+    `TaskManager.memory_samples`."""
     process_watchdog: bool = False
-    """- It is used to create another thread that kills off `GeckoDriver` (or `Xvfb`) instances that haven't been spawned by OpenWPM. (GeckoDriver is used by
+    """- It is used to create another thread that kills off the `GeckoDriver` (or `Xvfb`) instances this TaskManager launched for a browser that no
+         longer uses them, e.g. after a failed restart. Instances started outside this TaskManager are left alone. (GeckoDriver is used by
          Selenium to control Firefox and Xvfb a "virtual display" so we simulate having graphics when running on a server)."""
+    unix_sockets: bool = False
+    """Connect the Python processes to the StorageController and the MPLogger
+    through Unix domain sockets in a private temporary directory instead of
+    TCP over localhost. The extension keeps using TCP."""
     num_browsers: int = 1
+    num_spare_browsers: int = 0
+    """The number of browsers the TaskManager keeps launched in reserve.
+    When a browser has to be restarted with a clean profile (`reset=True`)
+    it is swapped for a spare with the same BrowserParams and the next
+    CommandSequence can start right away, while the old browser is closed
+    and a new spare is launched in the background."""
+    max_in_flight: int = 0
+    """The number of CommandSequences submitted with `TaskManager.submit` that
+    may be in flight (queued, running or waiting for their data to be saved)
+    at the same time. `submit` blocks once the limit is reached. 0 means
+    unbounded."""
+    adaptive_timeouts: bool = False
+    """Shorten the timeout of every command to `adaptive_timeout_factor` times
+    the 99th percentile of its successful durations so far, but not below
+    `adaptive_timeout_floor` seconds nor above the timeout it was submitted
+    with. CommandSequences that time out under a shortened timeout are queued
+    again and run with their original timeouts."""
+    adaptive_timeout_factor: float = 3.0
+    adaptive_timeout_floor: int = 30
+    fast_reset: bool = False
+    """Reset the browser of a `reset=True` CommandSequence in place: the
+    extension closes all tabs and clears cookies, site storage, cache, service
+    workers and HSTS instead of the browser being restarted. Requires
+    `extension_enabled`. Browsers are still restarted after failures, on
+    memory pressure and every `fast_reset_max_visits` visits."""
+    fast_reset_max_visits: int = 50
+    verify_reset: bool = False
+    """Check that the cookies and site storage of the profile are empty after
+    every fast reset. The check fails the command, which restarts the browser
+    (or raises when `testing` is set)."""
     _failure_limit: Optional[int] = None
     """- The number of command failures the platform will tolerate before raising a
         `CommandExecutionError` exception. Otherwise the default is set to 2 x the
@@ -165,8 +205,12 @@ class BrowserParamsInternal(BrowserParams):
 
 @dataclass
 class ManagerParamsInternal(ManagerParams):
-    storage_controller_address: Optional[Tuple[str, int]] = None
-    logger_address: Optional[Tuple[str, ...]] = None
+    # A port of None means the host is the path of a Unix domain socket
+    storage_controller_address: Optional[Tuple[str, Optional[int]]] = None
+    logger_address: Optional[Tuple[str, Optional[int]]] = None
+    # The TCP addresses of the same servers, for the extension
+    extension_storage_controller_address: Optional[Tuple[str, int]] = None
+    extension_logger_address: Optional[Tuple[str, int]] = None
     screenshot_path: Optional[Path] = field(
         default=None, metadata=DCJConfig(encoder=path_to_str, decoder=str_to_path)
     )
@@ -277,6 +321,66 @@ def validate_manager_params(manager_params: ManagerParams) -> None:
             )
         )
 
+    if (
+        not isinstance(manager_params.num_spare_browsers, int)
+        or manager_params.num_spare_browsers < 0
+    ):
+        raise ConfigError(
+            GENERAL_ERROR_STRING.format(
+                value=manager_params.num_spare_browsers,
+                parameter_name="num_spare_browsers",
+                params_type="ManagerParams",
+            )
+        )
+
+    if (
+        not isinstance(manager_params.max_in_flight, int)
+        or manager_params.max_in_flight < 0
+    ):
+        raise ConfigError(
+            GENERAL_ERROR_STRING.format(
+                value=manager_params.max_in_flight,
+                parameter_name="max_in_flight",
+                params_type="ManagerParams",
+            )
+        )
+
+    if (
+        not isinstance(manager_params.adaptive_timeout_factor, (int, float))
+        or manager_params.adaptive_timeout_factor < 1
+    ):
+        raise ConfigError(
+            GENERAL_ERROR_STRING.format(
+                value=manager_params.adaptive_timeout_factor,
+                parameter_name="adaptive_timeout_factor",
+                params_type="ManagerParams",
+            )
+        )
+
+    if (
+        not isinstance(manager_params.adaptive_timeout_floor, int)
+        or manager_params.adaptive_timeout_floor < 0
+    ):
+        raise ConfigError(
+            GENERAL_ERROR_STRING.format(
+                value=manager_params.adaptive_timeout_floor,
+                parameter_name="adaptive_timeout_floor",
+                params_type="ManagerParams",
+            )
+        )
+
+    if (
+        not isinstance(manager_params.fast_reset_max_visits, int)
+        or manager_params.fast_reset_max_visits < 1
+    ):
+        raise ConfigError(
+            GENERAL_ERROR_STRING.format(
+                value=manager_params.fast_reset_max_visits,
+                parameter_name="fast_reset_max_visits",
+                params_type="ManagerParams",
+            )
+        )
+
 
 def validate_crawl_configs(
     manager_params: ManagerParams, browser_params: List[BrowserParams]
@@ -98,10 +98,10 @@ def deploy_firefox(
         # Write config file
         extension_config: Dict[str, Any] = dict()
         extension_config.update(browser_params.to_dict())
-        extension_config["logger_address"] = manager_params.logger_address
+        extension_config["logger_address"] = manager_params.extension_logger_address
         extension_config[
             "storage_controller_address"
-        ] = manager_params.storage_controller_address
+        ] = manager_params.extension_storage_controller_address
         extension_config["testing"] = manager_params.testing
         ext_config_file = browser_profile_path / "browser_params.json"
         with open(ext_config_file, "w") as f:
@@ -10,6 +10,7 @@ import threading
 import time
 from pathlib import Path
 from queue import Empty as EmptyQueue
+from typing import Optional
 
 import dill
 import sentry_sdk
@@ -105,8 +106,12 @@ class MPLogger(object):
         log_level_file=logging.DEBUG,
         log_level_sentry_breadcrumb=logging.DEBUG,
         log_level_sentry_event=logging.ERROR,
+        unix_socket_path: Optional[str] = None,
     ) -> None:
+        """`unix_socket_path` makes the Python processes send their logs through
+        a Unix domain socket at that path. The extension always uses TCP."""
         self._crawl_reference = crawl_reference
+        self._unix_socket_path = unix_socket_path
         self._log_level_console = log_level_console
         self._log_level_file = log_level_file
         self._log_level_sentry_breadcrumb = log_level_sentry_breadcrumb
@@ -147,8 +152,15 @@ class MPLogger(object):
         self._listener = threading.Thread(target=self._start_listener)
         self._listener.daemon = True
         self._listener.start()
-        self.logger_address = self._status_queue.get(timeout=60)
+        tcp_address, unix_path = self._status_queue.get(timeout=60)
         self._status_queue.task_done()
+        # The extension can't connect to Unix domain sockets
+        self.extension_logger_address = tcp_address
+        if unix_path is not None:
+            # SocketHandler and ClientSocket take a port of None as a path
+            self.logger_address = (unix_path, None)
+        else:
+            self.logger_address = tcp_address
 
         # Attach console handler to log to console
         consoleHandler = logging.StreamHandler(sys.stdout)
@@ -215,8 +227,8 @@ class MPLogger(object):
 
     def _start_listener(self):
         """Start listening socket for remote logs from extension"""
-        socket = ServerSocket(name="loggingserver")
-        self._status_queue.put(socket.sock.getsockname())
+        socket = ServerSocket(name="loggingserver", unix_path=self._unix_socket_path)
+        self._status_queue.put((socket.sock.getsockname(), self._unix_socket_path))
         socket.start_accepting()
         self._status_queue.join()  # block to allow parent to retrieve address
 
@@ -1,14 +1,25 @@
 import asyncio
 import json
+import os
 import socket
 import struct
 import threading
 import traceback
 from queue import Queue
-from typing import Any
+from typing import Any, Tuple, Union
 
 import dill
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # TODO - Implement a cleaner shutdown for server socket
 # see: https://stackoverflow.com/a/1148237
 
@@ -17,31 +28,45 @@ class ServerSocket:
     """
     A server socket to receive and process string messages
     from client sockets to a central queue
+
+    The server always listens on a TCP port of localhost. If `unix_path` is
+    given, it also listens on a Unix domain socket at that path.
     """
 
-    def __init__(self, name=None, verbose=False):
+    def __init__(self, name=None, verbose=False, unix_path=None):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.bind(("localhost", 0))
         self.sock.listen(10)  # queue a max of n connect requests
+        self.unix_path = unix_path
+        self.unix_sock = None
+        if unix_path is not None:
+            self.unix_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.unix_sock.bind(unix_path)
+            self.unix_sock.listen(10)
         self.verbose = verbose
         self.name = name
         self.queue = Queue()
         if self.verbose:
             print("Server bound to: " + str(self.sock.getsockname()))
+            if unix_path is not None:
+                print("Server bound to: " + unix_path)
 
     def start_accepting(self):
-        """Start the listener thread"""
-        thread = threading.Thread(target=self._accept, args=())
-        thread.daemon = True  # stops from blocking shutdown
-        if self.name is not None:
-            thread.name = thread.name + "-" + self.name
-        thread.start()
-
-    def _accept(self):
+        """Start the listener thread(s)"""
+        for sock in (self.sock, self.unix_sock):
+            if sock is None:
+                continue
+            thread = threading.Thread(target=self._accept, args=(sock,))
+            thread.daemon = True  # stops from blocking shutdown
+            if self.name is not None:
+                thread.name = thread.name + "-" + self.name
+            thread.start()
+
+    def _accept(self, sock):
         """Listen for connections and pass handling to a new thread"""
         while True:
             try:
-                (client, address) = self.sock.accept()
+                (client, address) = sock.accept()
                 thread = threading.Thread(
                     target=self._handle_conn, args=(client, address)
                 )
@@ -63,6 +88,7 @@ class ServerSocket:
             'u' : Unicode string in UTF-8
             'd' : dill pickle
             'j' : json
+            'm' : msgpack
         """
         if self.verbose:
             print("Thread: %s connected to: %s" % (threading.current_thread(), address))
@@ -94,16 +120,25 @@ class ServerSocket:
         self.queue.put(msg)
 
     def receive_msg(self, client, msglen):
-        msg = b""
-        while len(msg) < msglen:
-            chunk = client.recv(msglen - len(msg))
-            if not chunk:
+        """Receives exactly `msglen` bytes into a preallocated buffer"""
+        msg = bytearray(msglen)
+        view = memoryview(msg)
+        received = 0
+        while received < msglen:
+            n = client.recv_into(view[received:], msglen - received)
+            if not n:
                 raise RuntimeError("socket connection broken")
-            msg = msg + chunk
+            received += n
         return msg
 
     def close(self):
         self.sock.close()
+        if self.unix_sock is not None:
+            self.unix_sock.close()
+            try:
+                os.unlink(self.unix_path)
+            except FileNotFoundError:
+                pass
 
 
 class ClientSocket:
@@ -114,6 +149,9 @@ class ClientSocket:
         non-string messages. Supported formats:
             * 'json' uses the json module. Cross-language support. (default)
             * 'dill' uses the dill pickle module. Python only.
+              Messages made of dicts, lists, tuples and scalars are sent
+              as msgpack instead if it is installed, which is much faster.
+              Tuples arrive as lists.
         """
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         if serialization != "json" and serialization != "dill":
@@ -121,7 +159,16 @@ class ClientSocket:
         self.serialization = serialization
         self.verbose = verbose
 
-    def connect(self, host, port):
+    def connect(self, host, port=None):
+        """Connects to `port` on `host`, or to the Unix domain socket at the
+        path `host` if `port` is None"""
+        if port is None:
+            if self.verbose:
+                print("Connecting to: %s" % host)
+            self.sock.close()
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(host)
+            return
         if self.verbose:
             print("Connecting to: %s:%i" % (host, port))
         self.sock.connect((host, port))
@@ -132,37 +179,48 @@ class ClientSocket:
         using dill if not string, and prepends msg len (4-bytes) and
         serialization type (1-byte).
         """
-        if isinstance(msg, bytes):
-            serialization = b"n"
-        elif isinstance(msg, str):
-            serialization = b"u"
-            msg = msg.encode("utf-8")
-        elif self.serialization == "dill":
-            msg = dill.dumps(msg, dill.HIGHEST_PROTOCOL)
-            serialization = b"d"
-        elif self.serialization == "json":
-            msg = json.dumps(msg).encode("utf-8")
-            serialization = b"j"
-        else:
-            raise ValueError(
-                "Unsupported serialization type set: %s" % self.serialization
-            )
+        serialization, msg = serialize(msg, self.serialization)
         if self.verbose:
             print("Sending message with serialization %s" % serialization)
 
         # prepend with message length
-        msg = struct.pack(">Lc", len(msg), serialization) + msg
-        totalsent = 0
-        while totalsent < len(msg):
-            sent = self.sock.send(msg[totalsent:])
-            if sent == 0:
-                raise RuntimeError("socket connection broken")
-            totalsent = totalsent + sent
+        header = struct.pack(">Lc", len(msg), serialization)
+        if not hasattr(self.sock, "sendmsg"):  # Windows
+            self.sock.sendall(header)
+            self.sock.sendall(msg)
+            return
+        # Sends header and message in one syscall, without joining them
+        sent = self.sock.sendmsg([header, msg])
+        if sent < len(header):
+            self.sock.sendall(header[sent:])
+            self.sock.sendall(msg)
+        elif sent < len(header) + len(msg):
+            self.sock.sendall(memoryview(msg)[sent - len(header) :])
 
     def close(self):
         self.sock.close()
 
 
+def serialize(msg: Any, serialization: str = "json") -> Tuple[bytes, bytes]:
+    """Returns the serialization type and the serialized bytes of `msg`,
+    see ClientSocket for the supported `serialization` formats"""
+    if isinstance(msg, bytes):
+        return b"n", msg
+    if isinstance(msg, str):
+        return b"u", msg.encode("utf-8")
+    if serialization == "dill":
+        if msgpack is not None:
+            try:
+                return b"m", msgpack.packb(msg, use_bin_type=True)
+            except (TypeError, ValueError, OverflowError):
+                # sets, functions, custom classes, ints above 64 bit...
+                pass
+        return b"d", dill.dumps(msg, dill.HIGHEST_PROTOCOL)
+    if serialization == "json":
+        return b"j", json.dumps(msg).encode("utf-8")
+    raise ValueError("Unsupported serialization type set: %s" % serialization)
+
+
 async def get_message_from_reader(reader: asyncio.StreamReader) -> Any:
     """
     Reads a message from the StreamReader
@@ -183,12 +241,23 @@ async def get_message_from_reader(reader: asyncio.StreamReader) -> Any:
     return _parse(serialization, msg)
 
 
-def _parse(serialization: bytes, msg: bytes) -> Any:
+def _parse(serialization: bytes, msg: Union[bytes, bytearray]) -> Any:
     if serialization == b"n":
-        return msg
+        return bytes(msg)
+    if serialization == b"m":  # msgpack serialization
+        if msgpack is None:
+            raise ValueError("Received a msgpack message, but msgpack is missing")
+        return msgpack.unpackb(msg, raw=False, strict_map_key=False)
     if serialization == b"d":  # dill serialization
         return dill.loads(msg)
     if serialization == b"j":  # json serialization
+        if orjson is not None:
+            try:
+                return orjson.loads(msg)
+            except orjson.JSONDecodeError:
+                # NaN, Infinity and integers above 64 bit are only
+                # understood by the json module
+                pass
         return json.loads(msg.decode("utf-8"))
     if serialization == b"u":  # utf-8 serialization
         return msg.decode("utf-8")
@@ -4,30 +4,102 @@ import random
 from abc import abstractmethod
 from asyncio import Task
 from collections import defaultdict
-from typing import Any, DefaultDict, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, DefaultDict, Dict, List, Optional, Union
 
-import pandas as pd
 import pyarrow as pa
 from pyarrow import Table
 
 from openwpm.types import VisitId
 
 from .parquet_schema import PQ_SCHEMAS
-from .storage_providers import INCOMPLETE_VISITS, StructuredStorageProvider, TableName
+from .storage_providers import (
+    INCOMPLETE_VISITS,
+    TABLE_KEYS,
+    StructuredStorageProvider,
+    TableName,
+)
 
-CACHE_SIZE = 500
+CACHE_SIZE = 500  # batches per table
+CACHE_BYTES = 64 * 2**20  # Arrow bytes of all cached batches
+
+
+@dataclass
+class ParquetWriteOptions:
+    """How the ArrowProviders and the compaction write Parquet files"""
+
+    compression: Union[str, Dict[str, str]] = "snappy"
+    """Codec for all columns, or per column name, see pyarrow.parquet.write_table"""
+    use_dictionary: Union[bool, List[str]] = True
+    """Dictionary encode all columns, or only the named ones"""
+    row_group_bytes: int = 64 * 2**20
+    """Target uncompressed size of a row group"""
+    sort_by: List[str] = field(default_factory=lambda: ["visit_id"])
+    """Columns the compaction sorts by, those missing from a table are skipped"""
+
+    def write_kwargs(self, table: pa.Table) -> Dict[str, Any]:
+        """Keyword arguments for pyarrow.parquet.write_table of `table`"""
+        rows_per_group = None
+        if table.num_rows and table.nbytes:
+            rows_per_group = max(
+                1, table.num_rows * self.row_group_bytes // table.nbytes
+            )
+        return dict(
+            compression=self.compression,
+            use_dictionary=self.use_dictionary,
+            row_group_size=rows_per_group,
+        )
+
+
+def _to_array(values: List[Any], field: pa.Field) -> pa.Array:
+    try:
+        return pa.array(values, type=field.type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. booleans, which the extension sends as 0 and 1
+        return pa.array(values).cast(field.type)
+
+
+def records_to_batch(
+    records: List[Dict[str, Any]], schema: pa.Schema
+) -> pa.RecordBatch:
+    """Builds a record batch of `schema` from row dicts, column by column.
+    Columns missing from a record are null."""
+    present = set().union(*records)
+    columns = list()
+    for field in schema:
+        if field.name not in present:
+            columns.append(pa.nulls(len(records), type=field.type))
+        else:
+            name = field.name
+            columns.append(_to_array([record.get(name) for record in records], field))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
 
 
 class ArrowProvider(StructuredStorageProvider):
     """This class implements a StructuredStorage provider that
     serializes records into the arrow format
+
+    The cached batches are written out once a table has more than
+    `CACHE_SIZE` batches or all batches together take `cache_bytes` bytes.
+    With `compaction_interval` set, `compact` is run every that many
+    seconds.
     """
 
     storing_lock: asyncio.Lock
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache_bytes: int = CACHE_BYTES,
+        write_options: Optional[ParquetWriteOptions] = None,
+        compaction_interval: Optional[float] = None,
+    ) -> None:
         super().__init__()
         self.logger = logging.getLogger("openwpm")
+        self.cache_bytes = cache_bytes
+        self.write_options = write_options or ParquetWriteOptions()
+        self.compaction_interval = compaction_interval
+        self._compaction_task: Optional[Task[None]] = None
+        self._cached_bytes = 0
 
         def factory_function() -> DefaultDict[TableName, List[Dict[str, Any]]]:
             return defaultdict(list)
@@ -46,18 +118,19 @@ class ArrowProvider(StructuredStorageProvider):
     async def init(self) -> None:
         # Used to synchronize the finalizing and the flushing
         self.storing_lock = asyncio.Lock()
+        if self.compaction_interval is not None:
+            self._compaction_task = asyncio.create_task(
+                self._compact_periodically(self.compaction_interval),
+                name="ParquetCompaction",
+            )
 
     async def store_record(
         self, table: TableName, visit_id: VisitId, record: Dict[str, Any]
     ) -> None:
-        records = self._records[visit_id]
-        # Add nulls
-        for item in PQ_SCHEMAS[table].names:
-            if item not in record:
-                record[item] = None
-        # Add instance_id (for partitioning)
+        # Add instance_id (for partitioning), missing columns are filled
+        # with nulls when the batch is created
         record["instance_id"] = self._instance_id
-        records[table].append(record)
+        self._records[visit_id][table].append(record)
 
     def _create_batch(self, visit_id: VisitId) -> None:
         """Create record batches for all records from `visit_id`"""
@@ -69,17 +142,26 @@ class ArrowProvider(StructuredStorageProvider):
             )
             return
         for table_name, data in self._records[visit_id].items():
-            try:
-                df = pd.DataFrame(data)
-                batch = pa.RecordBatch.from_pandas(
-                    df, schema=PQ_SCHEMAS[table_name], preserve_index=False
+            if table_name not in PQ_SCHEMAS:
+                self.logger.error(
+                    "No Parquet schema for table %s, dropping %d records",
+                    table_name,
+                    len(data),
                 )
+                continue
+            keys = TABLE_KEYS.get(table_name)
+            if keys is not None:
+                # the last record with a key wins, as in SQLite
+                data = list({tuple(r.get(k) for k in keys): r for r in data}.values())
+            try:
+                batch = records_to_batch(data, PQ_SCHEMAS[table_name])
                 self._batches[table_name].append(batch)
+                self._cached_bytes += batch.nbytes
                 self.logger.debug(
                     "Successfully created batch for table %s and "
                     "visit_id %s" % (table_name, visit_id)
                 )
-            except pa.lib.ArrowInvalid:
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
                 self.logger.error(
                     "Error while creating record batch for table %s\n" % table_name,
                     exc_info=True,
@@ -89,6 +171,8 @@ class ArrowProvider(StructuredStorageProvider):
         del self._records[visit_id]
 
     def _is_cache_full(self) -> bool:
+        if self._cached_bytes >= self.cache_bytes:
+            return True
         for batches in self._batches.values():
             if len(batches) > CACHE_SIZE:
                 return True
@@ -154,6 +238,7 @@ class ArrowProvider(StructuredStorageProvider):
             table = pa.Table.from_batches(batches)
             await self.write_table(table_name, table)
         self._batches.clear()
+        self._cached_bytes = 0
 
         for event in self.flush_events:
             event.set()
@@ -162,7 +247,24 @@ class ArrowProvider(StructuredStorageProvider):
         if not has_lock_arg:
             lock.release()
 
+    @abstractmethod
+    def compact(self) -> None:
+        """Rewrites the written Parquet files into few large ones, see
+        openwpm.utilities.parquet_compaction. Runs in a worker thread."""
+
+    async def _compact_periodically(self, interval: float) -> None:
+        # Flushes go on while the compaction runs, they write new files that
+        # are not part of the listing of the running compaction
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.compact)
+            except Exception:
+                self.logger.error("Compacting Parquet files failed", exc_info=True)
+
     async def shutdown(self) -> None:
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
         for table_name, batches in self._batches.items():
             if len(batches) != 0:
                 self.logger.error(
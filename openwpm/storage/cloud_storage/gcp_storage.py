@@ -1,10 +1,12 @@
 import logging
-from typing import Set
+from typing import Any, Set
 
 import pyarrow.parquet as pq
 from gcsfs import GCSFileSystem
 from pyarrow.lib import Table
 
+from openwpm.utilities.parquet_compaction import compact_dataset
+
 from ..arrow_storage import ArrowProvider
 from ..storage_providers import TableName, UnstructuredStorageProvider
 
@@ -20,6 +22,8 @@ class GcsStructuredProvider(ArrowProvider):
     base_path/visits/table_name in the given bucket.
 
     Pass a different sub_dir to change this.
+
+    **kwargs get passed on to ArrowProvider.__init__
     """
 
     file_system: GCSFileSystem
@@ -31,8 +35,9 @@ class GcsStructuredProvider(ArrowProvider):
         base_path: str,
         token: str = None,
         sub_dir: str = "visits",
+        **kwargs: Any,
     ) -> None:
-        super().__init__()
+        super().__init__(**kwargs)
         self.project = project
         self.token = token
         self.base_path = f"{bucket_name}/{base_path}/{sub_dir}/{{table_name}}"
@@ -51,10 +56,18 @@ class GcsStructuredProvider(ArrowProvider):
             table,
             self.base_path.format(table_name=table_name),
             filesystem=self.file_system,
+            **self.write_options.write_kwargs(table),
+        )
+
+    def compact(self) -> None:
+        compact_dataset(
+            self.base_path.removesuffix("/{table_name}"),
+            filesystem=self.file_system,
+            write_options=self.write_options,
         )
 
     async def shutdown(self) -> None:
-        pass
+        await super().shutdown()
 
 
 class GcsUnstructuredProvider(UnstructuredStorageProvider):
@@ -1,10 +1,12 @@
 import logging
-from typing import Any, Set
+from typing import Any, Dict, Optional, Set
 
 import pyarrow.parquet as pq
 from pyarrow.lib import Table
 from s3fs import S3FileSystem
 
+from openwpm.utilities.parquet_compaction import compact_dataset
+
 from ..arrow_storage import ArrowProvider
 from ..storage_providers import TableName, UnstructuredStorageProvider
 
@@ -19,14 +21,21 @@ class S3StructuredProvider(ArrowProvider):
     **kwargs get passed on to S3FileSystem.__init__
     Please look at https://s3fs.readthedocs.io/en/latest/api.html#s3fs.core.S3FileSystem
     for further information
+
+    arrow_kwargs get passed on to ArrowProvider.__init__
     """
 
     file_system: S3FileSystem
 
     def __init__(
-        self, bucket_name: str, base_path: str, sub_dir: str = "visits", **kwargs: Any
+        self,
+        bucket_name: str,
+        base_path: str,
+        sub_dir: str = "visits",
+        arrow_kwargs: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
     ) -> None:
-        super().__init__()
+        super().__init__(**(arrow_kwargs or {}))
         self.kwargs = kwargs
         self.base_path = f"{bucket_name}/{base_path}/{sub_dir}/{{table_name}}"
 
@@ -43,9 +52,17 @@ class S3StructuredProvider(ArrowProvider):
             table,
             self.base_path.format(table_name=table_name),
             filesystem=self.file_system,
+            **self.write_options.write_kwargs(table),
         )
         self.file_system.end_transaction()
 
+    def compact(self) -> None:
+        compact_dataset(
+            self.base_path.removesuffix("/{table_name}"),
+            filesystem=self.file_system,
+            write_options=self.write_options,
+        )
+
 
 class S3UnstructuredProvider(UnstructuredStorageProvider):
     """This class allows you to upload arbitrary bytes to S3.
@@ -159,5 +159,8 @@ class MemoryArrowProvider(ArrowProvider):
     async def write_table(self, table_name: TableName, table: Table) -> None:
         self.queue.put((table_name, table))
 
+    def compact(self) -> None:
+        """The tables are not written to files, there is nothing to compact"""
+
     async def shutdown(self) -> None:
         pass
@@ -1,22 +1,35 @@
 import logging
 from pathlib import Path
+from typing import Any
 
 import pyarrow.parquet as pq
 from pyarrow.lib import Table
 
+from openwpm.utilities.parquet_compaction import compact_dataset
+
 from .arrow_storage import ArrowProvider
 from .storage_providers import TableName, UnstructuredStorageProvider
 
 
 class LocalArrowProvider(ArrowProvider):
-    """Stores Parquet files under storage_path/table_name/n.parquet"""
+    """Stores Parquet files under storage_path/table_name/n.parquet
 
-    def __init__(self, storage_path: Path) -> None:
-        super().__init__()
+    **kwargs get passed on to ArrowProvider.__init__
+    """
+
+    def __init__(self, storage_path: Path, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
         self.storage_path = storage_path
 
     async def write_table(self, table_name: TableName, table: Table) -> None:
-        pq.write_to_dataset(table, str(self.storage_path / table_name))
+        pq.write_to_dataset(
+            table,
+            str(self.storage_path / table_name),
+            **self.write_options.write_kwargs(table),
+        )
+
+    def compact(self) -> None:
+        compact_dataset(str(self.storage_path), write_options=self.write_options)
 
 
 class LocalGzipProvider(UnstructuredStorageProvider):
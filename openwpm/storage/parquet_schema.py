@@ -244,3 +244,74 @@ fields = [
     pa.field("instance_id", pa.uint32(), nullable=False),
 ]
 PQ_SCHEMAS["dns_responses"] = pa.schema(fields)
+
+# The low-cardinality string columns of the bannerclick tables are
+# dictionary-encoded
+category = pa.dictionary(pa.int32(), pa.string())
+
+# visits
+fields = [
+    pa.field("visit_id", pa.int64(), nullable=False),
+    pa.field("domain", category),
+    pa.field("url", pa.string()),
+    pa.field("run_url", pa.string()),
+    pa.field("status", pa.int64()),
+    pa.field("lang", category),
+    pa.field("banners", pa.int64()),
+    pa.field("btn_status", pa.int64()),
+    pa.field("btn_set_status", pa.int64()),
+    pa.field("interact_time", pa.int64()),
+    pa.field("ttw", pa.int64()),
+    pa.field("__cmp", pa.bool_()),
+    pa.field("__tcfapi", pa.bool_()),
+    pa.field("__tcfapiLocator", pa.bool_()),
+    pa.field("cmp_id", pa.int64()),
+    pa.field("cmp_name", category),
+    pa.field("pv", pa.bool_()),
+    pa.field("nc_cmp_name", category),
+    pa.field("dnsmpi", pa.string()),
+    pa.field("body_html", pa.string()),
+    pa.field("body_html_hash", pa.string()),
+    pa.field("body_html_size", pa.int64()),
+    pa.field("instance_id", pa.uint32(), nullable=False),
+]
+PQ_SCHEMAS["visits"] = pa.schema(fields)
+
+# banners
+fields = [
+    pa.field("banner_id", pa.int64(), nullable=False),
+    pa.field("visit_id", pa.int64(), nullable=False),
+    pa.field("domain", category),
+    pa.field("lang", category),
+    pa.field("iFrame", pa.bool_()),
+    pa.field("shadow_dom", pa.bool_()),
+    pa.field("captured_area", pa.float64()),
+    pa.field("x", pa.int64()),
+    pa.field("y", pa.int64()),
+    pa.field("w", pa.int64()),
+    pa.field("h", pa.int64()),
+    pa.field("instance_id", pa.uint32(), nullable=False),
+]
+PQ_SCHEMAS["banners"] = pa.schema(fields)
+
+# htmls
+fields = [
+    pa.field("banner_id", pa.int64(), nullable=False),
+    pa.field("visit_id", pa.int64(), nullable=False),
+    pa.field("domain", category),
+    pa.field("html", pa.string()),
+    pa.field("html_hash", pa.string()),
+    pa.field("html_size", pa.int64()),
+    pa.field("instance_id", pa.uint32(), nullable=False),
+]
+PQ_SCHEMAS["htmls"] = pa.schema(fields)
+
+# visit_timings
+fields = [
+    pa.field("visit_id", pa.int64(), nullable=False),
+    pa.field("phase", pa.string(), nullable=False),
+    pa.field("duration", pa.int64()),
+    pa.field("calls", pa.int64()),
+    pa.field("instance_id", pa.uint32(), nullable=False),
+]
+PQ_SCHEMAS["visit_timings"] = pa.schema(fields)
@@ -30,7 +30,9 @@ CREATE TABLE IF NOT EXISTS visits (
 	pv BOOLEAN DEFAULT FALSE,
     nc_cmp_name VARCHAR(100),
     dnsmpi VARCHAR(100),
-    body_html TEXT
+    body_html TEXT,
+    body_html_hash VARCHAR(64),
+    body_html_size INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS banners (
@@ -53,8 +55,17 @@ CREATE TABLE IF NOT EXISTS htmls (
     visit_id INTEGER,
     domain VARCHAR(100),
     html TEXT,
+    html_hash VARCHAR(64),
+    html_size INTEGER,
     FOREIGN KEY(visit_id) REFERENCES visits(visit_id)
 );
+
+CREATE TABLE IF NOT EXISTS visit_timings (
+    visit_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    duration INTEGER,
+    calls INTEGER
+);
 /* custom tables end*/
 
 
@@ -1,39 +1,104 @@
+import asyncio
 import json
 import logging
 import os
+import queue
 import sqlite3
+import threading
+import time
+from asyncio import Task
+from collections import deque
+from concurrent.futures import Future
 from pathlib import Path
-from sqlite3 import (
-    Connection,
-    Cursor,
-    IntegrityError,
-    InterfaceError,
-    OperationalError,
-    ProgrammingError,
-)
-from typing import Any, Dict, List, Tuple
+from sqlite3 import Connection, Cursor
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 from openwpm.types import VisitId
 
-from .storage_providers import StructuredStorageProvider, TableName
+from .storage_providers import TABLE_KEYS, StructuredStorageProvider, TableName
 
 SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.sql")
 
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+COMMIT_LATENCY_WINDOW = 100  # commits the reported latency is averaged over
+
+# Operations of the writer thread
+RECORD = "record"
+COMMIT = "commit"
+FINALIZE = "finalize"
+EXECUTE = "execute"
+SHUTDOWN = "shutdown"
+
+_Operation = Tuple[str, Any, "Optional[Future[None]]"]
+
 
 class SQLiteStorageProvider(StructuredStorageProvider):
+    """Stores records in a SQLite database
+
+    All SQLite work happens on a writer thread that owns the connection and
+    is fed through a queue, so a slow commit or WAL checkpoint never stalls
+    the event loop of the StorageController.
+
+    Records are buffered per table and column set and inserted with
+    `executemany` once `batch_size` records are buffered, `flush_interval`
+    seconds have passed since the last insert, or a visit is finalized.
+
+    The database is opened in WAL mode. `synchronous`, `cache_size` and
+    `mmap_size` are passed to the pragmas of the same name, see
+    https://www.sqlite.org/pragma.html
+    """
+
     db: Connection
     cur: Cursor
 
-    def __init__(self, db_path: Path) -> None:
+    def __init__(
+        self,
+        db_path: Path,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        synchronous: str = "NORMAL",
+        cache_size: int = -65536,
+        mmap_size: int = 256 * 2**20,
+    ) -> None:
         super().__init__()
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                "synchronous must be one of %s, got %r"
+                % (", ".join(SYNCHRONOUS_MODES), synchronous)
+            )
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous.upper()
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
         self._sql_counter = 0
         self._sql_commit_time = 0
+        # (table, columns) -> buffered rows and the INSERT statement of the key
+        self._buffers: Dict[Tuple[str, Tuple[str, ...]], List[List[Any]]] = dict()
+        self._statements: Dict[Tuple[str, Tuple[str, ...]], str] = dict()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._queue: "queue.Queue[_Operation]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._commit_latencies: Deque[float] = deque(maxlen=COMMIT_LATENCY_WINDOW)
         self.logger = logging.getLogger("openwpm")
 
     async def init(self) -> None:
+        ready: "Future[None]" = Future()
+        self._writer = threading.Thread(
+            target=self._write, args=(ready,), name="SQLiteWriter", daemon=True
+        )
+        self._writer.start()
+        await asyncio.wrap_future(ready)
+
+    def _connect(self) -> None:
         self.db = sqlite3.connect(str(self.db_path))
         self.cur = self.db.cursor()
+        self.cur.execute("PRAGMA journal_mode=WAL")
+        self.cur.execute("PRAGMA synchronous=%s" % self.synchronous)
+        self.cur.execute("PRAGMA cache_size=%d" % self.cache_size)
+        self.cur.execute("PRAGMA mmap_size=%d" % self.mmap_size)
         self._create_tables()
 
     def _create_tables(self) -> None:
@@ -42,8 +107,59 @@ class SQLiteStorageProvider(StructuredStorageProvider):
             self.db.executescript(f.read())
         self.db.commit()
 
+    def _write(self, ready: "Future[None]") -> None:
+        """Body of the writer thread"""
+        try:
+            self._connect()
+        except BaseException as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        while True:
+            timeout = None
+            if self._buffered:
+                timeout = max(
+                    0, self._last_flush + self.flush_interval - time.monotonic()
+                )
+            try:
+                kind, arg, future = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush()
+                continue
+            try:
+                if kind == RECORD:
+                    self._buffer(*arg)
+                elif kind == COMMIT:
+                    self._flush()
+                    self._commit()
+                elif kind == FINALIZE:
+                    self._finalize(*arg)
+                elif kind == EXECUTE:
+                    self._flush()
+                    self.cur.execute(arg)
+                    self._commit()
+                elif kind == SHUTDOWN:
+                    self._flush()
+                    self._commit()
+                    self.db.close()
+            except Exception as e:
+                if future is None:
+                    self.logger.error("SQLite writer failed on %s", kind, exc_info=e)
+                else:
+                    future.set_exception(e)
+            else:
+                if future is not None:
+                    future.set_result(None)
+            if kind == SHUTDOWN:
+                return
+
+    def _submit(self, kind: str, arg: Any = None) -> "Future[None]":
+        future: "Future[None]" = Future()
+        self._queue.put((kind, arg, future))
+        return future
+
     async def flush_cache(self) -> None:
-        self.db.commit()
+        await asyncio.wrap_future(self._submit(COMMIT))
 
     async def store_record(
         self, table: TableName, visit_id: VisitId, record: Dict[str, Any]
@@ -51,8 +167,16 @@ class SQLiteStorageProvider(StructuredStorageProvider):
         """Submit a record to be stored
         The storing might not happen immediately
         """
-        assert self.cur is not None
-        statement, args = self._generate_insert(table=table, data=record)
+        self._queue.put((RECORD, (table, record), None))
+
+    def _buffer(self, table: TableName, record: Dict[str, Any]) -> None:
+        key = (table, tuple(record))
+        statement = self._statements.get(key)
+        if statement is None:
+            statement, args = self._generate_insert(table=table, data=record)
+            self._statements[key] = statement
+        else:
+            args = list(record.values())
         for i in range(len(args)):
             if isinstance(args[i], bytes):
                 args[i] = str(args[i], errors="ignore")
@@ -60,15 +184,47 @@ class SQLiteStorageProvider(StructuredStorageProvider):
                 args[i] = str(args[i])
             elif type(args[i]) == dict:
                 args[i] = json.dumps(args[i])
+        rows = self._buffers.get(key)
+        if rows is None:
+            rows = self._buffers[key] = list()
+        rows.append(args)
+        self._buffered += 1
+        if (
+            self._buffered >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self._flush()
+
+    def _flush(self) -> None:
+        """Inserts all buffered records into the open transaction"""
+        for key, rows in self._buffers.items():
+            if not rows:
+                continue
+            statement = self._statements[key]
+            if not self.db.in_transaction:
+                # records are committed on finalize_visit_id, as before
+                self.cur.execute("BEGIN")
+            # A failing row must not take the valid rows of its batch with it
+            self.cur.execute("SAVEPOINT batch")
+            try:
+                self.cur.executemany(statement, rows)
+                self._sql_counter += len(rows)
+            except Exception:
+                # also e.g. OverflowError for an int sqlite can't bind
+                self.cur.execute("ROLLBACK TO batch")
+                for args in rows:
+                    self._insert(statement, args)
+            finally:
+                self.cur.execute("RELEASE batch")
+                rows.clear()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    def _insert(self, statement: str, args: List[Any]) -> None:
         try:
             self.cur.execute(statement, args)
             self._sql_counter += 1
-        except (
-            OperationalError,
-            ProgrammingError,
-            IntegrityError,
-            InterfaceError,
-        ) as e:
+        except Exception as e:
             self.logger.error(
                 "Unsupported record:\n%s\n%s\n%s\n%s\n"
                 % (type(e), e, statement, repr(args))
@@ -79,7 +235,10 @@ class SQLiteStorageProvider(StructuredStorageProvider):
         table: TableName, data: Dict[str, Any]
     ) -> Tuple[str, List[Any]]:
         """Generate a SQL query from `record`"""
-        statement = "INSERT INTO %s (" % table
+        if table in TABLE_KEYS:
+            statement = "INSERT OR REPLACE INTO %s (" % table
+        else:
+            statement = "INSERT INTO %s (" % table
         value_str = "VALUES ("
         values = list()
         first = True
@@ -92,18 +251,46 @@ class SQLiteStorageProvider(StructuredStorageProvider):
         statement = statement + ") " + value_str + ")"
         return statement, values
 
-    def execute_statement(self, statement: str) -> None:
-        self.cur.execute(statement)
+    def _commit(self) -> None:
+        start = time.perf_counter()
         self.db.commit()
+        self._commit_latencies.append(time.perf_counter() - start)
+
+    def execute_statement(self, statement: str) -> None:
+        """Runs `statement` on the writer thread and waits for it to commit"""
+        self._submit(EXECUTE, statement).result()
 
     async def finalize_visit_id(
         self, visit_id: VisitId, interrupted: bool = False
-    ) -> None:
+    ) -> Task[None]:
+        """Returns a task that resolves once the records of the visit are
+        committed"""
+        future = self._submit(FINALIZE, (visit_id, interrupted))
+        return asyncio.create_task(self._committed(future))
+
+    @staticmethod
+    async def _committed(future: "Future[None]") -> None:
+        await asyncio.wrap_future(future)
+
+    def _finalize(self, visit_id: VisitId, interrupted: bool) -> None:
+        self._flush()
         if interrupted:
             self.logger.warning("Visit with visit_id %d got interrupted", visit_id)
             self.cur.execute("INSERT INTO incomplete_visits VALUES (?)", (visit_id,))
-        self.db.commit()
+        self._commit()
+
+    def get_status(self) -> Dict[str, Any]:
+        latencies = list(self._commit_latencies)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "records_inserted": self._sql_counter,
+            "commit_latency_ms": (
+                sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+            ),
+            "max_commit_latency_ms": max(latencies) * 1000 if latencies else 0.0,
+        }
 
     async def shutdown(self) -> None:
-        self.db.commit()
-        self.db.close()
+        await asyncio.wrap_future(self._submit(SHUTDOWN))
+        assert self._writer is not None
+        self._writer.join()
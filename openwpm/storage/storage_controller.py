@@ -53,22 +53,28 @@ class StorageController:
         status_queue: Queue,
         completion_queue: Queue,
         shutdown_queue: Queue,
+        unix_path: Optional[str] = None,
     ) -> None:
         """
         Parameters
         ----------
         status_queue
             queue through which the StorageControllerHandler
-            receives updates on the current amount of records to be processed.
+            receives updates on the current amount of records to be processed
+            and the status of the structured storage provider.
             Also used for initialization
         completion_queue
             queue containing the visit_ids of saved records
         shutdown_queue
             queue that the main process can use to shut down the StorageController
+        unix_path
+            path of a Unix domain socket to listen on in addition to the
+            TCP port the extension sends its records to
         """
         self.status_queue = status_queue
         self.completion_queue = completion_queue
         self.shutdown_queue = shutdown_queue
+        self.unix_path = unix_path
         self._shutdown_flag = False
         self._relaxed = False
         self.logger = logging.getLogger("openwpm")
@@ -238,14 +244,16 @@ class StorageController:
                 for task in task_list:
                     if not task.done():
                         task_count += 1
-            self.status_queue.put(task_count)
+            provider_status = self.structured_storage.get_status()
+            self.status_queue.put((task_count, provider_status))
             self.logger.debug(
                 (
                     "StorageController status: There are currently %d scheduled tasks "
-                    "for %d visit_ids"
+                    "for %d visit_ids, structured storage status: %s"
                 ),
                 task_count,
                 visit_id_count,
+                provider_status,
             )
 
     async def shutdown(self, completion_queue_task: Task[None]) -> None:
@@ -332,7 +340,10 @@ class StorageController:
         sockets = server.sockets
         assert sockets is not None
         socketname = sockets[0].getsockname()
-        self.status_queue.put(socketname)
+        unix_server: Optional[Server] = None
+        if self.unix_path is not None:
+            unix_server = await asyncio.start_unix_server(self._handler, self.unix_path)
+        self.status_queue.put((socketname, self.unix_path))
         status_queue_update = asyncio.create_task(
             self.update_status_queue(), name="StatusQueue"
         )
@@ -347,9 +358,13 @@ class StorageController:
         await self.should_shutdown()
 
         server.close()
+        if unix_server is not None:
+            unix_server.close()
         status_queue_update.cancel()
         timeout_check.cancel()
         await server.wait_closed()
+        if unix_server is not None:
+            await unix_server.wait_closed()
         await self.shutdown(update_completion_queue)
 
     def run(self) -> None:
@@ -360,7 +375,7 @@ class StorageController:
 class DataSocket:
     """Wrapper around ClientSocket to make sending records to the StorageController more convenient"""
 
-    def __init__(self, listener_address: Tuple[str, int]) -> None:
+    def __init__(self, listener_address: Tuple[str, Optional[int]]) -> None:
         self.socket = ClientSocket(serialization="dill")
         self.socket.connect(*listener_address)
         self.logger = logging.getLogger("openwpm")
@@ -376,6 +391,15 @@ class DataSocket:
             )
         )
 
+    def store_blob(self, content: bytes, content_hash: str) -> None:
+        """Sends content to the UnstructuredStorageProvider, keyed by its hash"""
+        self.socket.send(
+            (
+                RECORD_TYPE_CONTENT,
+                (base64.b64encode(content).decode("ascii"), content_hash),
+            )
+        )
+
     def finalize_visit_id(self, visit_id: VisitId, success: bool) -> None:
         self.socket.send(
             (
@@ -401,15 +425,24 @@ class StorageControllerHandle:
         self,
         structured_storage: StructuredStorageProvider,
         unstructured_storage: Optional[UnstructuredStorageProvider],
+        unix_path: Optional[str] = None,
     ) -> None:
+        """If `unix_path` is given, the StorageController also listens on a
+        Unix domain socket at that path and `listener_address` points to it"""
 
-        self.listener_address: Optional[Tuple[str, int]] = None
+        self.listener_address: Optional[Tuple[str, Optional[int]]] = None
+        """Address for DataSocket, a port of None means a Unix domain socket"""
+        self.tcp_listener_address: Optional[Tuple[str, int]] = None
+        """Address for the extension, which can't use Unix domain sockets"""
         self.listener_process: Optional[Process] = None
         self.status_queue = Queue()
         self.completion_queue = Queue()
         self.shutdown_queue = Queue()
-        self._last_status = None
+        self._last_status: Optional[int] = None
         self._last_status_received: Optional[float] = None
+        self.provider_status: Dict[str, Any] = dict()
+        """Most recent StructuredStorageProvider.get_status() of the controller"""
+        self.task_id: Optional[int] = None
         self.logger = logging.getLogger("openwpm")
         self.storage_controller = StorageController(
             structured_storage,
@@ -417,6 +450,7 @@ class StorageControllerHandle:
             status_queue=self.status_queue,
             completion_queue=self.completion_queue,
             shutdown_queue=self.shutdown_queue,
+            unix_path=unix_path,
         )
 
     def get_next_visit_id(self) -> VisitId:
@@ -469,6 +503,25 @@ class StorageControllerHandle:
                 },
             )
         sock.finalize_visit_id(INVALID_VISIT_ID, success=True)
+        self.task_id = task_id
+
+    def save_browser_configuration(self, browser_param: BrowserParamsInternal) -> None:
+        """Records a browser launched after `save_configuration`,
+        e.g. a spare browser, for the same task"""
+        assert self.listener_address is not None
+        assert self.task_id is not None
+        sock = DataSocket(self.listener_address)
+        sock.store_record(
+            TableName("crawl"),
+            INVALID_VISIT_ID,
+            {
+                "browser_id": browser_param.browser_id,
+                "task_id": self.task_id,
+                "browser_params": browser_param.to_json(),
+            },
+        )
+        sock.finalize_visit_id(INVALID_VISIT_ID, success=True)
+        sock.close()
 
     def launch(self) -> None:
         """Starts the storage controller"""
@@ -480,7 +533,11 @@ class StorageControllerHandle:
         self.storage_controller.daemon = True
         self.storage_controller.start()
 
-        self.listener_address = self.status_queue.get()
+        self.tcp_listener_address, unix_path = self.status_queue.get()
+        if unix_path is not None:
+            self.listener_address = (unix_path, None)
+        else:
+            self.listener_address = self.tcp_listener_address
 
     def get_new_completed_visits(self) -> List[Tuple[int, bool]]:
         """
@@ -509,7 +566,11 @@ class StorageControllerHandle:
         )
 
     def get_most_recent_status(self) -> int:
-        """Return the most recent queue size sent from the Storage Controller process"""
+        """Return the most recent queue size sent from the Storage Controller process
+
+        This counts the records the controller has not handed to the structured
+        storage provider yet and the records queued inside the provider.
+        """
 
         # Block until we receive the first status update
         if self._last_status is None:
@@ -517,10 +578,10 @@ class StorageControllerHandle:
 
         # Drain status queue until we receive most recent update
         while not self.status_queue.empty():
-            self._last_status = self.status_queue.get()
-            self._last_status_received = time.time()
+            self._receive_status(self.status_queue.get())
 
         # Check last status signal
+        assert self._last_status_received is not None
         if (time.time() - self._last_status_received) > STATUS_TIMEOUT:
             raise RuntimeError(
                 "No status update from the storage controller process "
@@ -529,13 +590,19 @@ class StorageControllerHandle:
 
         return self._last_status
 
+    def _receive_status(self, status: Tuple[int, Dict[str, Any]]) -> None:
+        task_count, self.provider_status = status
+        # Records queued inside the provider are just as unfinished as
+        # records whose store_record task has not run yet
+        self._last_status = task_count + self.provider_status.get("queue_depth", 0)
+        self._last_status_received = time.time()
+
     def get_status(self) -> int:
         """Get listener process status. If the status queue is empty, block."""
         try:
-            self._last_status = self.status_queue.get(
-                block=True, timeout=STATUS_TIMEOUT
+            self._receive_status(
+                self.status_queue.get(block=True, timeout=STATUS_TIMEOUT)
             )
-            self._last_status_received = time.time()
         except queue.Empty:
             assert self._last_status_received is not None
             raise RuntimeError(
@@ -7,13 +7,21 @@ import gzip
 import io
 from abc import ABC, abstractmethod
 from asyncio import Task
-from typing import Any, Dict, NewType, Optional
+from typing import Any, Dict, NewType, Optional, Tuple
 
 from openwpm.types import VisitId
 
 TableName = NewType("TableName", str)
 INCOMPLETE_VISITS = TableName("incomplete_visits")
 
+# Key columns of the tables where a record replaces the stored record with
+# the same key, so the retry of a timed out visit doesn't duplicate its rows
+TABLE_KEYS: Dict[TableName, Tuple[str, ...]] = {
+    TableName("visits"): ("visit_id",),
+    TableName("banners"): ("banner_id",),
+    TableName("htmls"): ("banner_id",),
+}
+
 
 class StorageProvider(ABC):
     """Base class that defines some general helper methods
@@ -81,6 +89,12 @@ class StructuredStorageProvider(StorageProvider):
         """
         pass
 
+    def get_status(self) -> Dict[str, Any]:
+        """Metrics of the provider, e.g. the depth of its write queue or its
+        commit latency, that the StorageController reports alongside its own
+        status. Providers without such metrics return an empty dict."""
+        return dict()
+
 
 class UnstructuredStorageProvider(StorageProvider):
     """Unstructured Storage Providers are responsible for handling the unstructured data
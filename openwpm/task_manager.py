@@ -1,10 +1,18 @@
+import asyncio
+import json
 import logging
 import os
 import pickle
+import shutil
+import tempfile
 import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import asdict
+from queue import Queue
 from types import TracebackType
-from typing import Any, Dict, List, Optional, Set, Type
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Type
 
 import psutil
 import tblib
@@ -18,7 +26,7 @@ from openwpm.config import (
 )
 
 from .browser_manager import BrowserManagerHandle
-from .command_sequence import CommandSequence
+from .command_sequence import CommandSequence, CommandSequenceResult
 from .errors import CommandExecutionError
 from .js_instrumentation import clean_js_instrumentation_settings
 from .mp_logger import MPLogger
@@ -27,16 +35,36 @@ from .storage.storage_providers import (
     StructuredStorageProvider,
     UnstructuredStorageProvider,
 )
+from .utilities.adaptive_timeout import AdaptiveTimeoutPolicy
 from .utilities.multiprocess_utils import kill_process_and_children
 from .utilities.platform_utils import get_configuration_string, get_version
+from .utilities.process_monitor import BrowserProcessMonitor, MemorySample
 
 tblib.pickling_support.install()
 
-SLEEP_CONS = 0.1  # command sleep constant (in seconds)
 BROWSER_MEMORY_LIMIT = 1500  # in MB
 
 STORAGE_CONTROLLER_JOB_LIMIT = 10000  # number of records in the queue
 
+MEMORY_SAMPLES_KEPT = 360  # per browser, one hour of watchdog rounds
+
+# CommandSequence, browser index, Future and submission time of `submit`.
+# Retries of timed out sequences are queued without a Future.
+_Submission = Tuple[
+    CommandSequence,
+    Optional[int],
+    "Optional[Future[CommandSequenceResult]]",
+    float,
+]
+
+
+def _spare_params_key(browser_params: BrowserParamsInternal) -> str:
+    """BrowserParams of a browser without the fields that differ per instance"""
+    params = browser_params.to_dict()
+    for name in ("browser_id", "profile_path", "recovery_tar"):
+        params.pop(name, None)
+    return repr(sorted(params.items(), key=lambda item: item[0]))
+
 
 class TaskManager:
     """User-facing Class for interfacing with OpenWPM
@@ -104,13 +132,23 @@ class TaskManager:
         self.failure_count = 0
 
         self.failure_limit = manager_params.failure_limit
+
+        # Only the user running the crawl can connect to sockets in here
+        self.socket_directory: Optional[str] = None
+        if manager_params.unix_sockets:
+            self.socket_directory = tempfile.mkdtemp(prefix="openwpm-")
+
         # Start logging server thread
         self.logging_server = MPLogger(
             self.manager_params.log_path,
             str(structured_storage_provider),
+            unix_socket_path=self._socket_path("logger"),
             **self._logger_kwargs
         )
         self.manager_params.logger_address = self.logging_server.logger_address
+        self.manager_params.extension_logger_address = (
+            self.logging_server.extension_logger_address
+        )
         self.logger = logging.getLogger("openwpm")
 
         # Initialize the storage controller
@@ -118,10 +156,38 @@ class TaskManager:
             structured_storage_provider, unstructured_storage_provider
         )
 
+        # Memory of the browsers sampled by the watchdog and the pid index of
+        # the processes launched for them
+        self.process_monitor = BrowserProcessMonitor()
+        self.memory_samples: Dict[int, Deque[MemorySample]] = dict()
+
+        # Warm spare browsers, see ManagerParams.num_spare_browsers
+        self.spare_browsers: List[BrowserManagerHandle] = list()
+        self.spare_lock = threading.Lock()
+        self.spare_threads: List[threading.Thread] = list()
+
         # Sets up the BrowserManager(s) + associated queues
         self.browsers = self._initialize_browsers(browser_params)
         self._launch_browsers()
 
+        # One persistent worker thread per browser slot runs the
+        # CommandSequences of that slot. Idle slots wait in FIFO order.
+        self.idle_browsers: "OrderedDict[int, None]" = OrderedDict(
+            (i, None) for i in range(self.num_browsers)
+        )
+        self.idle_condition = threading.Condition()
+        self._index_waiters = 0
+        self.browser_queues: List[
+            "Queue[Optional[Tuple[CommandSequence, threading.Event]]]"
+        ] = [Queue() for _ in range(self.num_browsers)]
+        self.browser_workers: List[threading.Thread] = list()
+        for i in range(self.num_browsers):
+            worker = threading.Thread(target=self._browser_worker, args=(i,))
+            worker.daemon = True
+            worker.name = "OpenWPM-browser_worker-%d" % i
+            worker.start()
+            self.browser_workers.append(worker)
+
         # Start the manager watchdog
         thread = threading.Thread(target=self._manager_watchdog, args=())
         thread.daemon = True
@@ -138,13 +204,36 @@ class TaskManager:
                 self.manager_params, browser_params, (openwpm_v, browser_v)
             )
         )
+        for i in range(manager_params.num_spare_browsers):
+            self._start_spare_thread(
+                self._launch_spare_browser, browser_params[i % self.num_browsers]
+            )
         self.unsaved_command_sequences: Dict[int, CommandSequence] = dict()
+
+        self.timeout_policy: Optional[AdaptiveTimeoutPolicy] = None
+        if manager_params.adaptive_timeouts:
+            self.timeout_policy = AdaptiveTimeoutPolicy(
+                factor=manager_params.adaptive_timeout_factor,
+                floor=manager_params.adaptive_timeout_floor,
+            )
         self.callback_thread = threading.Thread(
             target=self._mark_command_sequences_complete, args=()
         )
         self.callback_thread.name = "OpenWPM-completion_handler"
         self.callback_thread.start()
 
+        # Sequences handed in through `submit` are dispatched from a separate
+        # thread, so submitting never waits for an idle browser
+        self.in_flight: Optional[threading.BoundedSemaphore] = None
+        if manager_params.max_in_flight:
+            self.in_flight = threading.BoundedSemaphore(manager_params.max_in_flight)
+        self.pending_futures: Set["Future[CommandSequenceResult]"] = set()
+        self.submission_queue: "Queue[Optional[_Submission]]" = Queue()
+        self.submission_thread = threading.Thread(target=self._dispatch_submissions)
+        self.submission_thread.daemon = True
+        self.submission_thread.name = "OpenWPM-submission_dispatcher"
+        self.submission_thread.start()
+
     def __enter__(self):
         """
         Execute starting procedure for TaskManager
@@ -171,12 +260,20 @@ class TaskManager:
             browser_params[
                 i
             ].browser_id = self.storage_controller_handle.get_next_browser_id()
-            browsers.append(
-                BrowserManagerHandle(self.manager_params, browser_params[i])
-            )
+            browsers.append(self._browser_handle(browser_params[i]))
 
         return browsers
 
+    def _browser_handle(
+        self, browser_params: BrowserParamsInternal
+    ) -> BrowserManagerHandle:
+        """handle for a browser whose processes the watchdog indexes at launch"""
+        return BrowserManagerHandle(
+            self.manager_params,
+            browser_params,
+            self.process_monitor if self.manager_params.process_watchdog else None,
+        )
+
     def _launch_browsers(self) -> None:
         """launch each browser manager process / browser"""
         for browser in self.browsers:
@@ -194,6 +291,73 @@ class TaskManager:
                 self.close()
                 break
 
+    def _start_spare_thread(self, target: Any, *args: Any) -> None:
+        """starts a background thread that launches or retires a browser"""
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.name = "OpenWPM-spare_browsers"
+        with self.spare_lock:
+            self.spare_threads = [t for t in self.spare_threads if t.is_alive()]
+            self.spare_threads.append(thread)
+        thread.start()
+
+    def _launch_spare_browser(self, template: BrowserParamsInternal) -> None:
+        """launch a spare browser with a copy of the template's params"""
+        browser_params = BrowserParamsInternal.from_dict(template.to_dict())
+        browser_params.browser_id = self.storage_controller_handle.get_next_browser_id()
+        browser_params.recovery_tar = None
+        spare = self._browser_handle(browser_params)
+        if not spare.launch_browser_manager():
+            self.logger.error(
+                "BROWSER %i: Failed to launch spare browser" % spare.browser_id
+            )
+            return
+        self.storage_controller_handle.save_browser_configuration(browser_params)
+        with self.spare_lock:
+            if not self.closing:
+                self.spare_browsers.append(spare)
+                return
+        spare.shutdown_browser(during_init=True)
+
+    def _retire_browser(self, browser: BrowserManagerHandle) -> None:
+        """close a browser that was swapped for a spare and launch a new spare"""
+        browser.close_browser_manager()
+        if browser.current_profile_path is not None:
+            shutil.rmtree(browser.current_profile_path, ignore_errors=True)
+        if not self.closing:
+            self._launch_spare_browser(browser.browser_params)
+
+    def swap_in_spare_browser(self, browser: BrowserManagerHandle) -> bool:
+        """Replaces `browser` in `self.browsers` with a spare that has the same
+        params. Returns False if no spare is available."""
+        key = _spare_params_key(browser.browser_params)
+        with self.spare_lock:
+            if self.closing:
+                return False
+            spare = next(
+                (
+                    s
+                    for s in self.spare_browsers
+                    if _spare_params_key(s.browser_params) == key
+                ),
+                None,
+            )
+            if spare is None:
+                return False
+            self.spare_browsers.remove(spare)
+            self.browsers[self.browsers.index(browser)] = spare
+        self.logger.info(
+            "BROWSER %i: Swapped for spare browser %i"
+            % (browser.browser_id, spare.browser_id)
+        )
+        self._start_spare_thread(self._retire_browser, browser)
+        return True
+
+    def _all_browsers(self) -> List[BrowserManagerHandle]:
+        """the browsers running commands and the spare browsers"""
+        with self.spare_lock:
+            return self.browsers + self.spare_browsers
+
     def _manager_watchdog(self) -> None:
         """
         Periodically checks the following:
@@ -202,64 +366,62 @@ class TaskManager:
         """
         while not self.closing:
             time.sleep(10)
+            self.process_monitor.start_round()
 
             # Check browser memory usage
             if self.manager_params.memory_watchdog:
-                for browser in self.browsers:
-                    try:
-                        # Sum the memory used by the geckodriver process, the
-                        # main Firefox process and all its child processes.
-                        # Use the USS metric for child processes, to avoid
-                        # double-counting memory shared with their parent.
-                        geckodriver = psutil.Process(browser.geckodriver_pid)
-                        mem_bytes = geckodriver.memory_info().rss
-                        children = geckodriver.children()
-                        if children:
-                            firefox = children[0]
-                            mem_bytes += firefox.memory_info().rss
-                            for child in firefox.children():
-                                mem_bytes += child.memory_full_info().uss
-                        mem = mem_bytes / 2**20
-                        if mem > BROWSER_MEMORY_LIMIT:
-                            self.logger.info(
-                                "BROWSER %i: Memory usage: %iMB"
-                                ", exceeding limit of %iMB"
-                                % (browser.browser_id, int(mem), BROWSER_MEMORY_LIMIT)
-                            )
-                            browser.restart_required = True
-                    except psutil.NoSuchProcess:
-                        pass
+                for browser in self._all_browsers():
+                    if browser.geckodriver_pid is None:
+                        continue
+                    sample = self.process_monitor.sample(
+                        browser.browser_id, browser.geckodriver_pid
+                    )
+                    if sample is None:
+                        continue
+                    self._record_memory_sample(sample)
+                    mem = sample.memory_bytes / 2**20
+                    if mem > BROWSER_MEMORY_LIMIT:
+                        self.logger.info(
+                            "BROWSER %i: Memory usage: %iMB"
+                            ", exceeding limit of %iMB"
+                            % (browser.browser_id, int(mem), BROWSER_MEMORY_LIMIT)
+                        )
+                        browser.restart_required = True
 
             # Check for browsers or displays that were not closed correctly
             # 300 second buffer to avoid killing freshly launched browsers
             # TODO This buffer should correspond to the maximum spawn timeout
             if self.manager_params.process_watchdog:
-                geckodriver_pids: Set[int] = set()
-                display_pids: Set[int] = set()
-                check_time = time.time()
-                for browser in self.browsers:
-                    if browser.geckodriver_pid is not None:
-                        geckodriver_pids.add(browser.geckodriver_pid)
-                    if browser.display_pid is not None:
-                        display_pids.add(browser.display_pid)
-                for process in psutil.process_iter():
-                    if process.create_time() + 300 < check_time and (
-                        (
-                            process.name() == "geckodriver"
-                            and (process.pid not in geckodriver_pids)
-                        )
-                        or (
-                            process.name() == "Xvfb"
-                            and (process.pid not in display_pids)
-                        )
-                    ):
+                active_pids: Set[int] = set()
+                for browser in self._all_browsers():
+                    for pid in (browser.geckodriver_pid, browser.display_pid):
+                        if pid is not None:
+                            active_pids.add(pid)
+                for process in self.process_monitor.orphans(active_pids, 300):
+                    try:
                         self.logger.debug(
                             "Process %s (pid: %i) with start "
                             "time %s isn't controlled by any BrowserManager."
                             "Killing it now."
                             % (process.name(), process.pid, process.create_time())
                         )
-                        kill_process_and_children(process, self.logger)
+                    except psutil.NoSuchProcess:
+                        continue
+                    kill_process_and_children(process, self.logger)
+
+    def _record_memory_sample(self, sample: MemorySample) -> None:
+        series = self.memory_samples.get(sample.browser_id)
+        if series is None:
+            series = self.memory_samples[sample.browser_id] = deque(
+                maxlen=MEMORY_SAMPLES_KEPT
+            )
+        series.append(sample)
+        if self.manager_params.memory_metrics:
+            assert self.manager_params.data_directory is not None
+            with open(
+                self.manager_params.data_directory / "browser_memory.jsonl", "a"
+            ) as f:
+                f.write(json.dumps(asdict(sample)) + "\n")
 
     def _launch_storage_controller(
         self,
@@ -267,16 +429,26 @@ class TaskManager:
         unstructured_storage_provider: Optional[UnstructuredStorageProvider],
     ) -> None:
         self.storage_controller_handle = StorageControllerHandle(
-            structured_storage_provider, unstructured_storage_provider
+            structured_storage_provider,
+            unstructured_storage_provider,
+            unix_path=self._socket_path("storage"),
         )
         self.storage_controller_handle.launch()
         self.manager_params.storage_controller_address = (
             self.storage_controller_handle.listener_address
         )
+        self.manager_params.extension_storage_controller_address = (
+            self.storage_controller_handle.tcp_listener_address
+        )
         assert self.manager_params.storage_controller_address is not None
         # open connection to storage controller for saving crawl details
         self.sock = DataSocket(self.manager_params.storage_controller_address)
 
+    def _socket_path(self, name: str) -> Optional[str]:
+        if self.socket_directory is None:
+            return None
+        return os.path.join(self.socket_directory, name + ".sock")
+
     def _shutdown_manager(
         self, during_init: bool = False, relaxed: bool = True
     ) -> None:
@@ -295,23 +467,48 @@ class TaskManager:
         """
         if self.closing:
             return
+        if (
+            hasattr(self, "submission_thread")
+            and threading.current_thread() != self.submission_thread
+        ):
+            # Sequences still in the submission queue are dispatched before
+            # shutting down when relaxed, otherwise they fail as closed
+            self.submission_queue.put(None)
+            if relaxed is True:
+                self.submission_thread.join()
         self.closing = True
 
+        if hasattr(self, "browser_workers"):
+            for browser_queue in self.browser_queues:
+                browser_queue.put(None)
+            if relaxed is True:
+                # Waiting for the submitted command sequences to be finished
+                for worker in self.browser_workers:
+                    worker.join()
+
         for browser in self.browsers:
-            if (
-                relaxed is True
-                and browser.command_thread
-                and browser.command_thread.is_alive()
-            ):
-                # Waiting for the command_sequence to be finished
-                browser.command_thread.join()
             browser.shutdown_browser(during_init, force=not relaxed)
 
+        # Spares that are still launching shut themselves down once they
+        # see `closing`
+        for thread in list(self.spare_threads):
+            thread.join()
+        for spare in self.spare_browsers:
+            spare.shutdown_browser(during_init=True, force=not relaxed)
+
         self.sock.close()  # close socket to storage controller
         self.storage_controller_handle.shutdown(relaxed=relaxed)
         self.logging_server.close()
+        if self.socket_directory is not None:
+            shutil.rmtree(self.socket_directory, ignore_errors=True)
         if hasattr(self, "callback_thread"):
             self.callback_thread.join()
+        if hasattr(self, "pending_futures"):
+            for future in list(self.pending_futures):
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("TaskManager closed before the visit was saved")
+                    )
 
     def _check_failure_status(self) -> None:
         """Check the status of command failures. Raise exceptions as necessary
@@ -345,28 +542,78 @@ class TaskManager:
 
     # CRAWLER COMMAND CODE
 
-    def _start_thread(
-        self, browser: BrowserManagerHandle, command_sequence: CommandSequence
-    ) -> threading.Thread:
-        """starts the command execution thread"""
+    def _start_sequence(
+        self, index: int, command_sequence: CommandSequence
+    ) -> threading.Event:
+        """hands the command sequence to the worker of an idle browser and
+        returns an event that is set once it has been executed"""
 
-        # Check status flags before starting thread
+        # Check status flags before handing over the sequence
         if self.closing:
             self.logger.error("Attempted to execute command on a closed TaskManager")
             raise RuntimeError("Attempted to execute command on a closed TaskManager")
         self._check_failure_status()
+        browser = self.browsers[index]
+        browser.current_timeout = command_sequence.total_timeout
         visit_id = self.storage_controller_handle.get_next_visit_id()
         browser.set_visit_id(visit_id)
+        command_sequence.visit_id = visit_id
         if command_sequence.callback:
             self.unsaved_command_sequences[visit_id] = command_sequence
 
-        # Start command execution thread
-        args = (self, command_sequence)
-        thread = threading.Thread(target=browser.execute_command_sequence, args=args)
-        browser.command_thread = thread
-        thread.daemon = True
-        thread.start()
-        return thread
+        done = threading.Event()
+        command_sequence.dispatched_at = time.time()
+        self.browser_queues[index].put((command_sequence, done))
+        return done
+
+    def _browser_worker(self, index: int) -> None:
+        """runs the command sequences of one browser slot until shutdown"""
+        while True:
+            item = self.browser_queues[index].get()
+            if item is None:
+                return
+            command_sequence, done = item
+            browser = self.browsers[index]
+            browser.command_thread = threading.current_thread()
+            browser.idle.clear()
+            try:
+                browser.execute_command_sequence(self, command_sequence)
+            except Exception:
+                self.logger.error(
+                    "BROWSER %i: Exception while executing CommandSequence"
+                    % browser.browser_id,
+                    exc_info=True,
+                )
+            finally:
+                browser.idle.set()
+                done.set()
+                self._mark_browser_idle(index)
+
+    def _mark_browser_idle(self, index: int) -> None:
+        with self.idle_condition:
+            self.idle_browsers[index] = None
+            if self._index_waiters:
+                # a waiter for a specific browser may be the one to wake up
+                self.idle_condition.notify_all()
+            else:
+                self.idle_condition.notify()
+
+    def _acquire_idle_browser(self, index: Optional[int]) -> int:
+        """blocks until a browser (or the browser `index`) is idle and
+        reserves it"""
+        with self.idle_condition:
+            if index is None:
+                while not self.idle_browsers:
+                    self.idle_condition.wait()
+                return self.idle_browsers.popitem(last=False)[0]
+            self._index_waiters += 1
+            try:
+                while index not in self.idle_browsers:
+                    self.idle_condition.wait()
+            finally:
+                self._index_waiters -= 1
+            del self.idle_browsers[index]
+            return index
 
     def _mark_command_sequences_complete(self) -> None:
         """Polls the storage controller for saved records
@@ -405,42 +652,157 @@ class TaskManager:
                 self.logger.info(
                     "Blocking command submission until the storage controller "
                     "is below the max queue size of %d. Current queue "
-                    "length %d. " % (STORAGE_CONTROLLER_JOB_LIMIT, agg_queue_size)
+                    "length %d. Structured storage status: %s"
+                    % (
+                        STORAGE_CONTROLLER_JOB_LIMIT,
+                        agg_queue_size,
+                        self.storage_controller_handle.provider_status,
+                    )
                 )
                 agg_queue_size = self.storage_controller_handle.get_status()
 
         # Distribute command
-        if index is None:
-            # send to first browser available
-            command_executed = False
-            while True:
-                for browser in self.browsers:
-                    if browser.ready():
-                        browser.current_timeout = command_sequence.total_timeout
-                        thread = self._start_thread(browser, command_sequence)
-                        command_executed = True
-                        break
-                if command_executed:
-                    break
-                time.sleep(SLEEP_CONS)
-        elif 0 <= index < len(self.browsers):
-            # send the command to this specific browser
-            while True:
-                if self.browsers[index].ready():
-                    self.browsers[
-                        index
-                    ].current_timeout = command_sequence.total_timeout
-                    thread = self._start_thread(self.browsers[index], command_sequence)
-                    break
-                time.sleep(SLEEP_CONS)
-        else:
+        if index is not None and not 0 <= index < len(self.browsers):
             self.logger.info("Command index type is not supported or out of range")
             return
+        # None -> first browser available, int -> this specific browser
+        index = self._acquire_idle_browser(index)
+        try:
+            done = self._start_sequence(index, command_sequence)
+        except BaseException:
+            self._mark_browser_idle(index)
+            raise
 
         if command_sequence.blocking:
-            thread.join()
+            done.wait()
             self._check_failure_status()
 
+    def requeue_timed_out(
+        self, command_sequence: CommandSequence, visit_id: int
+    ) -> None:
+        """Called by a browser when the sequence timed out under an adaptive
+        timeout. The sequence is queued for the submission dispatcher to run
+        again with its original timeouts. Its callback, and the Future of a
+        submitted sequence, only fire for the retry. The timeout does not
+        count towards `failure_limit`, the retry is the real result."""
+        self.logger.info(
+            "Visit %d to %s timed out under an adaptive timeout, "
+            "queueing it for a retry",
+            visit_id,
+            command_sequence.url,
+        )
+        self.unsaved_command_sequences.pop(visit_id, None)
+        command_sequence.adaptive_timeouts = False
+        command_sequence.retry_number = (command_sequence.retry_number or 0) + 1
+        self.submission_queue.put((command_sequence, None, None, time.time()))
+
+    def _wait_for_retries(self) -> None:
+        """Waits until all queued sequences, including the retries of timed
+        out ones, have been run"""
+        while True:
+            self.submission_queue.join()
+            with self.idle_condition:
+                while len(self.idle_browsers) < self.num_browsers:
+                    self.idle_condition.wait()
+            # a browser may have queued a retry after the join
+            if self.submission_queue.unfinished_tasks == 0:
+                return
+
+    def submit(
+        self, command_sequence: CommandSequence, index: Optional[int] = None
+    ) -> "Future[CommandSequenceResult]":
+        """Queues the command sequence and returns a Future, which resolves
+        with a `CommandSequenceResult` once the StorageController has
+        confirmed that the data of the visit has been saved.
+
+        Blocks only while `ManagerParams.max_in_flight` sequences are in
+        flight. The Future can be cancelled as long as the sequence has not
+        been handed to a browser yet.
+        """
+        if self.closing:
+            raise RuntimeError("Attempted to submit to a closed TaskManager")
+        submitted_at = time.time()
+        if self.in_flight is not None:
+            self.in_flight.acquire()
+        future: "Future[CommandSequenceResult]" = Future()
+        self.pending_futures.add(future)
+        future.add_done_callback(self._release_in_flight)
+        self.submission_queue.put((command_sequence, index, future, submitted_at))
+        return future
+
+    async def submit_async(
+        self, command_sequence: CommandSequence, index: Optional[int] = None
+    ) -> CommandSequenceResult:
+        """asyncio variant of `submit`, waiting for a free in-flight slot
+        without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit, command_sequence, index)
+        return await asyncio.wrap_future(future)
+
+    def _release_in_flight(self, future: "Future[CommandSequenceResult]") -> None:
+        self.pending_futures.discard(future)
+        if self.in_flight is not None:
+            self.in_flight.release()
+
+    def _dispatch_submissions(self) -> None:
+        """Hands the submitted sequences to the browsers in submission order"""
+        while True:
+            item = self.submission_queue.get()
+            try:
+                if item is None:
+                    return
+                self._dispatch_submission(*item)
+            finally:
+                self.submission_queue.task_done()
+
+    def _dispatch_submission(
+        self,
+        command_sequence: CommandSequence,
+        index: Optional[int],
+        future: "Optional[Future[CommandSequenceResult]]",
+        submitted_at: float,
+    ) -> None:
+        if future is None:
+            # retry of a timed out sequence, its callback is already in place
+            try:
+                self.execute_command_sequence(command_sequence, index)
+            except Exception:
+                self.logger.error(
+                    "Failed to retry CommandSequence for %s" % command_sequence.url,
+                    exc_info=True,
+                )
+            return
+        if not future.set_running_or_notify_cancel():
+            return
+        original_callback = command_sequence.callback
+
+        def callback(success: bool) -> None:
+            try:
+                if original_callback is not None:
+                    original_callback(success)
+            finally:
+                assert command_sequence.visit_id is not None
+                future.set_result(
+                    CommandSequenceResult(
+                        visit_id=command_sequence.visit_id,
+                        url=command_sequence.url,
+                        success=success,
+                        submitted_at=submitted_at,
+                        dispatched_at=command_sequence.dispatched_at or submitted_at,
+                        completed_at=time.time(),
+                    )
+                )
+
+        command_sequence.callback = callback
+        try:
+            self.execute_command_sequence(command_sequence, index)
+        except Exception as e:
+            self.logger.error(
+                "Failed to dispatch CommandSequence for %s" % command_sequence.url,
+                exc_info=True,
+            )
+            future.set_exception(e)
+
     # DEFINITIONS OF HIGH LEVEL COMMANDS
     # NOTE: These wrappers are provided for convenience. To issue sequential
     # commands to the same browser in a single 'visit', use the CommandSequence
@@ -483,6 +845,8 @@ class TaskManager:
             self.logger.error("TaskManager already closed")
             return
         start_time = time.time()
+        if relaxed and self.timeout_policy is not None and not self.failure_status:
+            self._wait_for_retries()
         self._shutdown_manager(relaxed=relaxed)
         # We don't have a logging thread at this time anymore
         print("Shutdown took %s seconds" % str(time.time() - start_time))
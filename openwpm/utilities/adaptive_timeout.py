@@ -0,0 +1,111 @@
+"""Per-command timeouts derived from the observed command durations.
+
+Commands are submitted with generous timeouts that cover the slowest sites,
+so a hung visit holds its browser for the whole timeout. The policy here
+tracks a streaming estimate of a high quantile of the successful durations
+of every command type and shortens the timeouts to a multiple of it.
+"""
+import threading
+from bisect import insort
+from typing import Dict, List, Optional
+
+MIN_SAMPLES = 50  # successful runs of a command before its timeout is adapted
+
+
+class P2Quantile:
+    """Streaming estimate of the p-quantile in constant memory, using the
+    P² algorithm of Jain and Chlamtac (1985)"""
+
+    def __init__(self, p: float) -> None:
+        self.p = p
+        self.count = 0
+        self.heights: List[float] = list()
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q = self.heights
+        n = self.positions
+        if self.count <= 5:
+            insort(q, x)
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = self._linear(i, step)
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q = self.heights
+        n = self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        q = self.heights
+        n = self.positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if self.count <= 5:
+            return self.heights[min(int(self.p * self.count), self.count - 1)]
+        return self.heights[2]
+
+
+class AdaptiveTimeoutPolicy:
+    """Timeout of a command = quantile of its successful durations * factor,
+    bounded by `floor` and by the timeout the command was submitted with
+
+    Commands with fewer than `MIN_SAMPLES` successful runs keep their
+    submitted timeout. All durations and timeouts are in seconds.
+    """
+
+    def __init__(
+        self, factor: float = 3.0, floor: float = 30, quantile: float = 0.99
+    ) -> None:
+        self.factor = factor
+        self.floor = floor
+        self.quantile = quantile
+        self.estimates: Dict[str, P2Quantile] = dict()
+        self.lock = threading.Lock()
+
+    def observe(self, command: str, duration: float) -> None:
+        with self.lock:
+            estimate = self.estimates.get(command)
+            if estimate is None:
+                estimate = self.estimates[command] = P2Quantile(self.quantile)
+            estimate.add(duration)
+
+    def timeout(self, command: str, requested: float) -> float:
+        with self.lock:
+            estimate = self.estimates.get(command)
+            if estimate is None or estimate.count < MIN_SAMPLES:
+                return requested
+            value = estimate.value()
+        assert value is not None
+        return min(requested, max(self.floor, value * self.factor))
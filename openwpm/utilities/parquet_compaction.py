@@ -0,0 +1,341 @@
+"""Rewrites the many small Parquet files of a crawl into few large ones.
+
+Every flush of an ArrowProvider adds a file per table, so a large crawl
+leaves tens of thousands of small files behind that are slow to scan. The
+compaction leaves files of at least `target_file_bytes` on disk alone,
+groups the smaller files of a directory into bins of about that size and
+rewrites every bin into one new file, sorted by `sort_by` and in row groups
+of about `row_group_bytes`, with an external merge sort that keeps about
+two row groups in memory.
+
+    python -m openwpm.utilities.parquet_compaction <storage_path> [table ...]
+
+New files are written under a name starting with `_`, which dataset readers
+ignore, and renamed once all of them are written. The original files are
+deleted last. A compaction that is interrupted in between can leave rows in
+both the old and the new files. Files added while a compaction runs are not
+part of its listing and are left for the next one.
+"""
+import argparse
+import logging
+import posixpath
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+
+from openwpm.storage.arrow_storage import ParquetWriteOptions
+
+TARGET_FILE_BYTES = 128 * 2**20  # on disk
+
+logger = logging.getLogger("openwpm")
+
+
+def parquet_files(path: str, filesystem: AbstractFileSystem) -> Dict[str, List[str]]:
+    """Parquet files under `path` by directory, e.g. by partition"""
+    files: Dict[str, List[str]] = defaultdict(list)
+    for file in sorted(filesystem.find(path)):
+        name = posixpath.basename(file)
+        if name.startswith(("_", ".")) or not name.endswith(".parquet"):
+            continue
+        files[posixpath.dirname(file)].append(file)
+    return files
+
+
+def bin_files(
+    files: List[str], sizes: Dict[str, int], target_file_bytes: int
+) -> List[List[str]]:
+    """Groups the files smaller than `target_file_bytes` into bins of at
+    most about that size, in the given order. Bins of a single file are
+    dropped, there is nothing to merge."""
+    bins: List[List[str]] = list()
+    current: List[str] = list()
+    current_bytes = 0
+    for file in files:
+        if sizes[file] >= target_file_bytes:
+            continue
+        if current and current_bytes + sizes[file] > target_file_bytes:
+            bins.append(current)
+            current, current_bytes = list(), 0
+        current.append(file)
+        current_bytes += sizes[file]
+    bins.append(current)
+    return [b for b in bins if len(b) > 1]
+
+
+def _sort_keys(table: pa.Table, sort_by: List[str]) -> List[Tuple[str, str]]:
+    return [(name, "ascending") for name in sort_by if name in table.column_names]
+
+
+class _Run:
+    """The rows of one sorted row group of the run file, loaded a batch at a
+    time"""
+
+    def __init__(self, batches: Iterator[pa.RecordBatch]) -> None:
+        self.batches = batches
+        self.rows: Optional[pa.Table] = None
+        self.exhausted = False
+
+    def load(self) -> None:
+        """Appends the next batch to `rows`"""
+        batch = next(self.batches, None)
+        if batch is None:
+            self.exhausted = True
+            return
+        table = pa.Table.from_batches([batch])
+        self.rows = table if self.rows is None else pa.concat_tables([self.rows, table])
+
+    def take(self, count: int) -> Optional[pa.Table]:
+        """Removes the first `count` rows and returns them"""
+        if self.rows is None or count == 0:
+            return None
+        taken = self.rows.slice(0, count)
+        self.rows = self.rows.slice(count) if count < self.rows.num_rows else None
+        return taken
+
+
+def _merge_runs(runs: List[_Run], keys: List[Tuple[str, str]]) -> Iterator[pa.Table]:
+    """Yields the rows of the sorted `runs` in sort order, a slice at a time.
+
+    Rows whose first key is below the smallest last loaded key of the runs
+    that are not exhausted cannot be preceded by a row still to be loaded.
+    Nulls sort last."""
+    column = keys[0][0]
+    while True:
+        for run in runs:
+            while run.rows is None and not run.exhausted:
+                run.load()
+        if all(run.rows is None for run in runs):
+            return
+        bounds = [
+            run.rows.column(column)[-1].as_py()
+            for run in runs
+            if not run.exhausted and run.rows is not None
+        ]
+        # the remaining rows of a run that ends in a null are all null
+        bounds = [bound for bound in bounds if bound is not None]
+        bound = min(bounds) if bounds else None
+        open_runs = [run for run in runs if not run.exhausted]
+        taken = list()
+        for run in runs:
+            if run.rows is None:
+                continue
+            values = run.rows.column(column)
+            if not open_runs:
+                count = run.rows.num_rows
+            elif bound is None:
+                count = run.rows.num_rows - values.null_count
+            else:
+                below = pc.fill_null(pc.less(values, bound), False)
+                count = pc.sum(below).as_py() or 0
+            table = run.take(count)
+            if table is not None:
+                taken.append(table)
+        if taken:
+            yield pa.concat_tables(taken).sort_by(keys)
+            continue
+        # every loaded row ties with the bound, load further
+        for run in open_runs:
+            last = run.rows.column(column)[-1].as_py() if run.rows else None
+            if bound is None or last == bound:
+                run.load()
+
+
+def _write_bin(
+    files: List[str],
+    path: str,
+    filesystem: AbstractFileSystem,
+    write_options: ParquetWriteOptions,
+) -> None:
+    """Writes the rows of `files` into one new file at `path`, sorted by
+    `write_options.sort_by`, in row groups of about
+    `write_options.row_group_bytes`.
+
+    The files are read one at a time and buffered up to a row group, which
+    is sorted and written to a run file next to `path`. The row groups of
+    the run file are then merged in sort order, a batch of each at a time,
+    so memory stays at about two row groups however large the bin is."""
+    run_path = posixpath.join(
+        posixpath.dirname(path), "_runs" + posixpath.basename(path)
+    )
+    keys: List[Tuple[str, str]] = list()
+    kwargs: Dict[str, Any] = dict()
+    writer: Optional[pq.ParquetWriter] = None
+    buffered: List[pa.Table] = list()
+
+    def write_row_group(writer: pq.ParquetWriter, tables: List[pa.Table]) -> None:
+        table = pa.concat_tables(tables)
+        if keys:
+            table = table.sort_by(keys)
+        writer.write_table(table, row_group_size=max(1, table.num_rows))
+        tables.clear()
+
+    try:
+        try:
+            for file in files:
+                table = pq.read_table(file, filesystem=filesystem)
+                table = table.replace_schema_metadata(None)
+                if writer is None:
+                    keys = _sort_keys(table, write_options.sort_by)
+                    kwargs = write_options.write_kwargs(table)
+                    kwargs.pop("row_group_size")
+                    writer = pq.ParquetWriter(
+                        run_path, table.schema, filesystem=filesystem, **kwargs
+                    )
+                else:
+                    table = table.cast(writer.schema)
+                buffered.append(table)
+                if sum(t.nbytes for t in buffered) >= write_options.row_group_bytes:
+                    write_row_group(writer, buffered)
+            if writer is not None and buffered:
+                write_row_group(writer, buffered)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            return
+
+        with filesystem.open(run_path, "rb") as f:
+            metadata = pq.ParquetFile(f).metadata
+        if not keys or metadata.num_row_groups < 2:
+            filesystem.mv(run_path, path)
+            return
+        run_files = [
+            pq.ParquetFile(filesystem.open(run_path, "rb"))
+            for _ in range(metadata.num_row_groups)
+        ]
+        rows_per_group = max(1, metadata.num_rows // metadata.num_row_groups)
+        batch_size = max(1024, rows_per_group // metadata.num_row_groups)
+        runs = [
+            _Run(run_file.iter_batches(batch_size=batch_size, row_groups=[i]))
+            for i, run_file in enumerate(run_files)
+        ]
+        writer = pq.ParquetWriter(
+            path, run_files[0].schema_arrow, filesystem=filesystem, **kwargs
+        )
+        try:
+            pending: Optional[pa.Table] = None
+            for table in _merge_runs(runs, keys):
+                pending = (
+                    table if pending is None else pa.concat_tables([pending, table])
+                )
+                while pending.nbytes >= write_options.row_group_bytes:
+                    count = max(
+                        1,
+                        pending.num_rows
+                        * write_options.row_group_bytes
+                        // pending.nbytes,
+                    )
+                    writer.write_table(pending.slice(0, count), row_group_size=count)
+                    pending = pending.slice(count)
+            if pending is not None and pending.num_rows:
+                writer.write_table(pending, row_group_size=pending.num_rows)
+        finally:
+            writer.close()
+            for run_file in run_files:
+                run_file.close(force=True)
+    finally:
+        if filesystem.exists(run_path):
+            filesystem.rm(run_path)
+
+
+def compact_directory(
+    directory: str,
+    files: List[str],
+    filesystem: AbstractFileSystem,
+    write_options: ParquetWriteOptions,
+    target_file_bytes: int = TARGET_FILE_BYTES,
+) -> int:
+    """Merges the small `files` of one directory, returns the number of
+    files of the directory afterwards"""
+    sizes = {file: filesystem.size(file) for file in files}
+    small = [file for file in files if sizes[file] < target_file_bytes]
+    if len(small) < 2:
+        return len(files)
+    bins = bin_files(small, sizes, target_file_bytes)
+    if not bins:
+        return len(files)
+
+    prefix = uuid.uuid4().hex
+    written = list()
+    for i, files_of_bin in enumerate(bins):
+        tmp = posixpath.join(directory, "_%s-%d.parquet" % (prefix, i))
+        _write_bin(files_of_bin, tmp, filesystem, write_options)
+        written.append(tmp)
+    for tmp in written:
+        filesystem.mv(tmp, posixpath.join(directory, posixpath.basename(tmp)[1:]))
+    merged = [file for files_of_bin in bins for file in files_of_bin]
+    for file in merged:
+        filesystem.rm(file)
+    logger.info(
+        "Compacted %d files in %s into %d", len(merged), directory, len(written)
+    )
+    return len(files) - len(merged) + len(written)
+
+
+def compact_table(
+    path: str,
+    filesystem: Optional[AbstractFileSystem] = None,
+    write_options: Optional[ParquetWriteOptions] = None,
+    target_file_bytes: int = TARGET_FILE_BYTES,
+) -> int:
+    """Compacts every directory of the table at `path` on its own, so
+    partitions stay intact. Returns the number of files of the table."""
+    filesystem = filesystem or LocalFileSystem()
+    write_options = write_options or ParquetWriteOptions()
+    count = 0
+    for directory, files in parquet_files(path, filesystem).items():
+        count += compact_directory(
+            directory, files, filesystem, write_options, target_file_bytes
+        )
+    return count
+
+
+def compact_dataset(
+    root: str,
+    tables: Optional[List[str]] = None,
+    filesystem: Optional[AbstractFileSystem] = None,
+    **kwargs: Any,
+) -> Dict[str, int]:
+    """Compacts the tables (all by default) stored under `root`, as written
+    by the ArrowProviders. Returns the number of files per table."""
+    filesystem = filesystem or LocalFileSystem()
+    if tables is None:
+        tables = [
+            posixpath.basename(entry.rstrip("/"))
+            for entry in filesystem.ls(root, detail=False)
+            if filesystem.isdir(entry)
+        ]
+    return {
+        table: compact_table(
+            posixpath.join(root, table), filesystem=filesystem, **kwargs
+        )
+        for table in tables
+        if filesystem.exists(posixpath.join(root, table))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("storage_path")
+    parser.add_argument("tables", nargs="*", help="all tables by default")
+    parser.add_argument(
+        "--target-file-mb", type=int, default=TARGET_FILE_BYTES // 2**20
+    )
+    args = parser.parse_args()
+    counts = compact_dataset(
+        args.storage_path,
+        args.tables or None,
+        target_file_bytes=args.target_file_mb * 2**20,
+    )
+    for table, count in counts.items():
+        print("%s: %d files" % (table, count))
+
+
+if __name__ == "__main__":
+    main()
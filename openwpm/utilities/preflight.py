@@ -0,0 +1,256 @@
+"""Reachability pre-flight for the sites of a crawl.
+
+Unreachable sites cost a full browser visit, often the whole page load
+timeout plus a retry on the `www.` variant. This module resolves and
+connects to all sites of an input list concurrently with asyncio before the
+crawl starts and picks the variant of every site that answered, following
+HTTP redirects. Sites without any answering variant can be recorded as
+failed without starting a browser.
+
+The check is kept no stricter than the browser: a site counts as reachable
+once the TCP connection and, for https, the TLS handshake succeed. A
+certificate that fails Python's verification, e.g. a chain without an
+intermediate that Firefox fetches or has preloaded, or a HEAD request that
+gets no response in time, is noted in `PreflightResult.error`.
+"""
+import asyncio
+import socket
+import ssl
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+# host -> list of ip addresses
+Resolver = Callable[[str], Awaitable[List[str]]]
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# everything a dead, slow or broken site can raise while being checked
+CHECK_ERRORS = (
+    OSError,  # DNS, TCP and TLS failures
+    asyncio.TimeoutError,
+    asyncio.IncompleteReadError,
+    asyncio.LimitOverrunError,
+    ValueError,
+    IndexError,
+)
+
+
+@dataclass
+class PreflightResult:
+    site: str
+    reachable: bool = False
+    url: Optional[str] = None
+    """the answering variant of `site` after following its redirects"""
+    status: Optional[int] = None
+    """HTTP status code of the last response, None if there was none"""
+    error: Optional[str] = None
+    """why the last variant tried was not reachable, or for a reachable
+    site why its certificate failed verification or its response is
+    missing"""
+    redirects: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0
+
+
+def variants(site: str) -> List[str]:
+    """The url as given and its `www.` variant"""
+    parts = urlsplit(site)
+    if parts.hostname is None or parts.hostname.startswith("www."):
+        return [site]
+    return [site, site.replace("://", "://www.", 1)]
+
+
+def describe(error: BaseException) -> str:
+    return "%s: %s" % (type(error).__name__, error)
+
+
+def unverified_context() -> ssl.SSLContext:
+    """TLS context that completes the handshake whatever the certificate"""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def system_resolver(host: str) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, None, type=socket.SOCK_STREAM
+    )
+    return [info[4][0] for info in infos]
+
+
+class Preflight:
+    """Checks DNS, TCP, TLS and the HTTP response of many sites concurrently
+
+    Parameters
+    ----------
+    concurrency :
+        Maximum number of sites checked at the same time
+    timeout :
+        Seconds allowed per step (resolving, connecting, handshake, response)
+    max_redirects :
+        Redirects followed per variant
+    resolver :
+        Coroutine returning the addresses of a host, the system resolver by
+        default. Tests use this to stand in for DNS.
+    port :
+        Connect to this port instead of the port of the url scheme
+    ssl_context :
+        Context for https urls, certificates are verified by default. A
+        site whose certificate fails verification is still reachable, the
+        verification error is kept in `PreflightResult.error`.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 500,
+        timeout: float = 10,
+        max_redirects: int = 5,
+        resolver: Resolver = system_resolver,
+        port: Optional[int] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.resolver = resolver
+        self.port = port
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.unverified_context = unverified_context()
+
+    async def open_connection(
+        self,
+        address: str,
+        port: int,
+        hostname: str,
+        context: Optional[ssl.SSLContext],
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(
+            asyncio.open_connection(
+                address,
+                port,
+                ssl=context,
+                server_hostname=hostname if context is not None else None,
+            ),
+            self.timeout,
+        )
+
+    async def connect(
+        self, addresses: List[str], port: int, hostname: str, tls: bool
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, Optional[str]]:
+        """Connects to the addresses in turn, e.g. to the IPv4 address of
+        a host whose IPv6 address is not reachable from here. Raises the
+        error of the last address if none of them connects.
+
+        A certificate that fails verification is accepted on a second
+        handshake without verification, its error is returned with the
+        streams."""
+        error: Optional[BaseException] = None
+        for address in addresses:
+            try:
+                try:
+                    reader, writer = await self.open_connection(
+                        address, port, hostname, self.ssl_context if tls else None
+                    )
+                    return reader, writer, None
+                except ssl.SSLCertVerificationError as e:
+                    reader, writer = await self.open_connection(
+                        address, port, hostname, self.unverified_context
+                    )
+                    return reader, writer, describe(e)
+            except (OSError, asyncio.TimeoutError) as e:
+                error = e
+        assert error is not None
+        raise error
+
+    async def request(
+        self, url: str
+    ) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+        """Sends a HEAD request and returns the status code and the
+        Location header of the response, and a note on the certificate or
+        the missing response. Raises if the site cannot be connected to;
+        once connected, a missing or broken response has no status."""
+        parts = urlsplit(url)
+        if parts.scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise ValueError("unsupported url %s" % url)
+        addresses = await asyncio.wait_for(self.resolver(parts.hostname), self.timeout)
+        if not addresses:
+            raise OSError("no address for %s" % parts.hostname)
+        port = self.port or parts.port or DEFAULT_PORTS[parts.scheme]
+        tls = parts.scheme == "https"
+        reader, writer, note = await self.connect(addresses, port, parts.hostname, tls)
+        try:
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            writer.write(
+                (
+                    "HEAD %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: Mozilla/5.0\r\n"
+                    "Accept: */*\r\nConnection: close\r\n\r\n" % (path, parts.netloc)
+                ).encode("ascii")
+            )
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.timeout)
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split()[1])
+        except CHECK_ERRORS as e:
+            return None, None, note or describe(e)
+        finally:
+            writer.close()
+        location = None
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "location":
+                location = value.strip()
+        return status, location, note
+
+    async def check_variant(self, url: str, result: PreflightResult) -> bool:
+        redirects: List[str] = list()
+        try:
+            status, location, note = await self.request(url)
+            while (
+                status is not None
+                and 300 <= status < 400
+                and location is not None
+                and len(redirects) < self.max_redirects
+            ):
+                target = urljoin(url, location)
+                try:
+                    status, location, note = await self.request(target)
+                except CHECK_ERRORS:
+                    # the browser still gets the redirect from `url`
+                    break
+                redirects.append(target)
+                url = target
+        except CHECK_ERRORS as e:
+            result.error = describe(e)
+            return False
+        result.reachable = True
+        result.url = url
+        result.status = status
+        result.error = note
+        result.redirects = redirects
+        return True
+
+    async def check(self, site: str, semaphore: asyncio.Semaphore) -> PreflightResult:
+        result = PreflightResult(site)
+        async with semaphore:
+            start = time.perf_counter()
+            for url in variants(site):
+                if await self.check_variant(url, result):
+                    break
+            result.elapsed_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    async def check_all(self, sites: Iterable[str]) -> Dict[str, PreflightResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        unique = list(dict.fromkeys(sites))
+        results = await asyncio.gather(
+            *(self.check(site, semaphore) for site in unique)
+        )
+        return {result.site: result for result in results}
+
+    def run(self, sites: Iterable[str]) -> Dict[str, PreflightResult]:
+        """Checks all sites, to be called outside of an event loop"""
+        return asyncio.run(self.check_all(sites))
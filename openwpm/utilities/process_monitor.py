@@ -0,0 +1,187 @@
+"""Cheap memory sampling and orphan detection for the browser processes.
+
+The memory of a browser is read from the cgroup v2 `memory.current` of its
+Firefox process when the browser runs in a cgroup of its own, and from
+`/proc/<pid>/statm` otherwise. Processes launched by the BrowserManagers are
+kept in a pid index, so finding orphaned processes does not need a scan of
+the whole process table.
+"""
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import psutil
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class MemorySample:
+    browser_id: int
+    timestamp: float
+    memory_bytes: int
+    processes: int
+    source: str
+    """`cgroup` or `statm`"""
+
+
+def statm(pid: int) -> Optional[Tuple[int, int]]:
+    """Resident and shared memory of a process in bytes"""
+    try:
+        with open("/proc/%d/statm" % pid, "rb") as f:
+            fields = f.read().split()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return int(fields[1]) * PAGE_SIZE, int(fields[2]) * PAGE_SIZE
+
+
+def cgroup_path(pid: int) -> Optional[str]:
+    """Path of the cgroup v2 directory of a process"""
+    try:
+        with open("/proc/%d/cgroup" % pid, "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return "/sys/fs/cgroup" + line[3:].strip()
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return None
+
+
+def cgroup_memory(path: str) -> Optional[int]:
+    try:
+        with open(os.path.join(path, "memory.current"), "rb") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def ppid_index() -> Dict[int, List[int]]:
+    """parent pid -> child pids of all processes, read once per sample round
+    on kernels without /proc/<pid>/task/<tid>/children"""
+    children: Dict[int, List[int]] = dict()
+    for stat in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        # the command name may contain spaces, the fields start after ')'
+        fields = data[data.rfind(b")") + 2 :].split()
+        children.setdefault(int(fields[1]), list()).append(int(stat.split("/")[2]))
+    return children
+
+
+class BrowserProcessMonitor:
+    """Memory of the browsers and orphaned processes of a TaskManager"""
+
+    def __init__(self) -> None:
+        self.own_cgroup = cgroup_path(os.getpid())
+        self.has_children_file = bool(
+            glob.glob("/proc/%d/task/*/children" % os.getpid())
+        )
+        self._ppids: Optional[Dict[int, List[int]]] = None
+        # Firefox pid -> cgroup of that browser, None if it is shared
+        self.cgroups: Dict[int, Optional[str]] = dict()
+        self._sampled: Set[int] = set()
+        # pid -> handle of every process launched for a browser, filled by
+        # the launching threads and pruned by the watchdog
+        self.index: Dict[int, psutil.Process] = dict()
+        self.index_lock = threading.Lock()
+
+    def start_round(self) -> None:
+        """Drops the state that is only valid for one sample round and the
+        cgroups of browsers that were not sampled in the last one"""
+        self._ppids = None
+        for pid in set(self.cgroups) - self._sampled:
+            del self.cgroups[pid]
+        self._sampled = set()
+
+    def children(self, pid: int) -> List[int]:
+        if self.has_children_file:
+            pids: List[int] = list()
+            for path in glob.glob("/proc/%d/task/*/children" % pid):
+                try:
+                    with open(path, "rb") as f:
+                        pids.extend(int(child) for child in f.read().split())
+                except OSError:
+                    continue
+            return pids
+        if self._ppids is None:
+            self._ppids = ppid_index()
+        return self._ppids.get(pid, list())
+
+    def browser_cgroup(self, firefox_pid: int) -> Optional[str]:
+        if firefox_pid not in self.cgroups:
+            path = cgroup_path(firefox_pid)
+            if path is None or path == self.own_cgroup or cgroup_memory(path) is None:
+                path = None
+            self.cgroups[firefox_pid] = path
+        return self.cgroups[firefox_pid]
+
+    def sample(self, browser_id: int, geckodriver_pid: int) -> Optional[MemorySample]:
+        """Memory of the geckodriver process, the main Firefox process and
+        all its child processes. Child processes are counted without their
+        shared pages, to avoid double-counting memory shared with their
+        parent. Returns None if geckodriver is gone."""
+        geckodriver = statm(geckodriver_pid)
+        if geckodriver is None:
+            return None
+        memory_bytes = geckodriver[0]
+        processes = 1
+        source = "statm"
+        children = self.children(geckodriver_pid)
+        if children:
+            firefox_pid = children[0]
+            self._sampled.add(firefox_pid)
+            cgroup = self.browser_cgroup(firefox_pid)
+            cgroup_bytes = cgroup_memory(cgroup) if cgroup is not None else None
+            if cgroup_bytes is not None:
+                if cgroup_path(geckodriver_pid) == cgroup:
+                    memory_bytes = cgroup_bytes
+                else:
+                    memory_bytes += cgroup_bytes
+                processes += 1
+                source = "cgroup"
+            else:
+                firefox = statm(firefox_pid)
+                if firefox is not None:
+                    memory_bytes += firefox[0]
+                    processes += 1
+                for child in self.children(firefox_pid):
+                    child_memory = statm(child)
+                    if child_memory is not None:
+                        memory_bytes += child_memory[0] - child_memory[1]
+                        processes += 1
+        return MemorySample(browser_id, time.time(), memory_bytes, processes, source)
+
+    def register(self, pid: int) -> None:
+        """Adds a process launched for a browser to the pid index"""
+        try:
+            process = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return
+        with self.index_lock:
+            self.index.setdefault(pid, process)
+
+    def orphans(self, active_pids: Set[int], min_age: float) -> List[psutil.Process]:
+        """Indexed processes that no browser uses anymore and that are older
+        than `min_age` seconds. Exited processes leave the index."""
+        orphans = list()
+        now = time.time()
+        with self.index_lock:
+            indexed = list(self.index.items())
+        for pid, process in indexed:
+            if pid in active_pids:
+                continue
+            # is_running also detects a pid reused by another process
+            if not process.is_running():
+                with self.index_lock:
+                    if self.index.get(pid) is process:
+                        del self.index[pid]
+                continue
+            if process.create_time() + min_age < now:
+                orphans.append(process)
+        return orphans
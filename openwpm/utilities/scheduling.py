@@ -0,0 +1,188 @@
+"""Duration-aware ordering of the sites of a crawl.
+
+A few slow sites that are submitted late keep a whole crawl busy while the
+other browsers are idle. Ordering the submissions longest-expected-first
+(LPT) lets the long visits overlap with the short ones. Expected durations
+come from the `crawl_history` of previous crawls or are learned online from
+the visits of the running crawl.
+"""
+import heapq
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+from .db_utils import query_db
+
+VISIT_DURATIONS_QUERY = """
+SELECT s.site_url AS site_url,
+       SUM(h.duration) AS duration
+FROM crawl_history h JOIN site_visits s ON h.visit_id = s.visit_id
+WHERE h.duration IS NOT NULL
+GROUP BY h.visit_id
+"""
+
+T = TypeVar("T")
+
+
+@dataclass
+class SiteStats:
+    visits: int = 0
+    total_ms: float = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.visits
+
+
+class DurationEstimator:
+    """Expected visit duration per site url, in milliseconds"""
+
+    def __init__(self, alpha: float = 0.3) -> None:
+        """
+        Parameters
+        ----------
+        alpha :
+            Weight of a new observation in `observe`, sites that got slower
+            or faster since the history was recorded are picked up quickly
+        """
+        self.alpha = alpha
+        self.sites: Dict[str, SiteStats] = dict()
+        self.estimates: Dict[str, float] = dict()
+
+    @classmethod
+    def from_databases(cls, dbs: Iterable, alpha: float = 0.3) -> "DurationEstimator":
+        """Reads the visit durations of the `crawl-data.sqlite` files of
+        previous crawls. A visit lasts as long as all of its commands.
+        Databases that don't exist are skipped."""
+        estimator = cls(alpha)
+        for db in dbs:
+            if not Path(db).is_file():
+                continue
+            try:
+                rows = query_db(Path(db), VISIT_DURATIONS_QUERY)
+            except sqlite3.Error:
+                continue
+            for row in rows:
+                assert isinstance(row, sqlite3.Row)
+                stats = estimator.sites.setdefault(row["site_url"], SiteStats())
+                stats.visits += 1
+                stats.total_ms += row["duration"]
+        for url, stats in estimator.sites.items():
+            estimator.estimates[url] = stats.mean_ms
+        return estimator
+
+    def observe(self, url: str, duration_ms: float) -> None:
+        """Online update with a finished visit of the running crawl"""
+        stats = self.sites.setdefault(url, SiteStats())
+        stats.visits += 1
+        stats.total_ms += duration_ms
+        previous = self.estimates.get(url)
+        if previous is None:
+            self.estimates[url] = duration_ms
+        else:
+            self.estimates[url] = previous + self.alpha * (duration_ms - previous)
+
+    def expected(self, url: str) -> Optional[float]:
+        return self.estimates.get(url)
+
+    def default(self) -> float:
+        """Expected duration of a site without history"""
+        if not self.estimates:
+            return 0
+        return median(self.estimates.values())
+
+
+def order_longest_first(
+    sites: Sequence[T],
+    estimator: DurationEstimator,
+    key: Callable[[T], str] = str,
+) -> List[T]:
+    """Orders the sites longest-expected-first and spreads the sites without
+    history evenly over the ordered list, so unknown (possibly slow) sites
+    are not all left for the end of the crawl
+
+    `key` returns the url of an entry of `sites`, e.g. of (rank, url) pairs
+    that keep their rank when they are reordered.
+    """
+    known = [site for site in sites if estimator.expected(key(site)) is not None]
+    unknown = [site for site in sites if estimator.expected(key(site)) is None]
+    known.sort(key=lambda site: estimator.expected(key(site)), reverse=True)  # type: ignore
+    if not known or not unknown:
+        return known + unknown
+
+    step = (len(known) + len(unknown)) / len(unknown)
+    unknown_positions = {int(i * step) for i in range(len(unknown))}
+    known_iter = iter(known)
+    unknown_iter = iter(unknown)
+    ordered = list()
+    for position in range(len(sites)):
+        if position in unknown_positions:
+            ordered.append(next(unknown_iter))
+        else:
+            ordered.append(next(known_iter))
+    return ordered
+
+
+def expected_makespan(
+    sites: Sequence[str], estimator: DurationEstimator, num_browsers: int
+) -> float:
+    """Simulates the first-come, first-serve dispatching of the TaskManager
+    and returns the expected makespan of the crawl in milliseconds"""
+    default = estimator.default()
+    browsers = [0.0] * num_browsers
+    for site in sites:
+        expected = estimator.expected(site)
+        free_at = heapq.heappop(browsers)
+        heapq.heappush(browsers, free_at + (default if expected is None else expected))
+    return max(browsers)
+
+
+def actual_makespan(db: Path) -> Optional[float]:
+    """Makespan of the crawl saved in `db` in milliseconds, from the start
+    of its first command to the end of its last one"""
+    if not db.is_file():
+        # query_db would create an empty database
+        return None
+    rows = query_db(
+        db, "SELECT dtg, duration FROM crawl_history WHERE duration IS NOT NULL"
+    )
+    if not rows:
+        return None
+    start = end = None
+    for row in rows:
+        assert isinstance(row, sqlite3.Row)
+        finished = datetime.fromisoformat(row["dtg"]).timestamp() * 1000
+        started = finished - row["duration"]
+        start = started if start is None else min(start, started)
+        end = finished if end is None else max(end, finished)
+    assert start is not None and end is not None
+    return end - start
+
+
+def makespan_report(
+    sites: Sequence[str],
+    estimator: DurationEstimator,
+    num_browsers: int,
+    db: Optional[Path] = None,
+) -> str:
+    """Expected makespan of the sites in input order and in longest-first
+    order, plus the actual makespan of the crawl saved in `db`"""
+    original = expected_makespan(sites, estimator, num_browsers)
+    ordered = expected_makespan(
+        order_longest_first(sites, estimator), estimator, num_browsers
+    )
+    known = sum(estimator.expected(site) is not None for site in sites)
+    report = (
+        f"sites with history: {known}/{len(sites)}, "
+        f"expected makespan: {ordered / 1000:.0f}s longest-first, "
+        f"{original / 1000:.0f}s in input order"
+    )
+    if db is not None:
+        actual = actual_makespan(db)
+        if actual is not None:
+            report += f", actual makespan: {actual / 1000:.0f}s"
+    return report
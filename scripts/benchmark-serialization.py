@@ -0,0 +1,139 @@
+"""Records/sec through get_message_from_reader -> StorageController.handler
+
+Feeds the same batch of typical instrumentation records, framed with every
+serialization the StorageController understands, through the handler of a
+StorageController whose storage provider drops the records.
+
+    python scripts/benchmark-serialization.py [--records 50000]
+"""
+import argparse
+import asyncio
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from multiprocess import Queue  # noqa: E402
+
+from openwpm import socket_interface  # noqa: E402
+from openwpm.socket_interface import serialize  # noqa: E402
+from openwpm.storage.storage_controller import StorageController  # noqa: E402
+from openwpm.storage.storage_providers import (  # noqa: E402
+    StructuredStorageProvider,
+    TableName,
+)
+from openwpm.types import VisitId  # noqa: E402
+
+
+class NullProvider(StructuredStorageProvider):
+    async def init(self) -> None:
+        pass
+
+    async def flush_cache(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def store_record(
+        self, table: TableName, visit_id: VisitId, record: Dict[str, Any]
+    ) -> None:
+        pass
+
+    async def finalize_visit_id(
+        self, visit_id: VisitId, interrupted: bool = False
+    ) -> None:
+        pass
+
+
+def records(n: int) -> List[Any]:
+    return [
+        (
+            "http_requests",
+            {
+                "incognito": 0,
+                "browser_id": 1234567,
+                "visit_id": 4503599627370496 + i,
+                "extension_session_uuid": "5d3a9b0e-4a3c-4b7e-8d4f-0f4a5b6c7d8e",
+                "event_ordinal": i,
+                "window_id": 1,
+                "tab_id": 2,
+                "frame_id": 0,
+                "url": "https://www.example.com/static/js/app.%d.js" % i,
+                "top_level_url": "https://www.example.com/",
+                "parent_frame_id": -1,
+                "frame_ancestors": "[]",
+                "method": "GET",
+                "referrer": "https://www.example.com/",
+                "headers": '[["Accept","*/*"],["User-Agent","Mozilla/5.0"]]',
+                "request_id": "%d" % i,
+                "is_XHR": 0,
+                "is_third_party_channel": 0,
+                "is_third_party_to_top_window": 0,
+                "triggering_origin": "https://www.example.com",
+                "loading_origin": "https://www.example.com",
+                "loading_href": "https://www.example.com/",
+                "req_call_stack": "",
+                "resource_type": "script",
+                "post_body": None,
+                "post_body_raw": None,
+                "time_stamp": "2022-10-19T12:00:00.000Z",
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def frame(msgs: List[Any], serialization: str) -> bytes:
+    chunks = list()
+    for msg in msgs:
+        kind, payload = serialize(msg, serialization)
+        chunks.append(struct.pack(">Lc", len(payload), kind) + payload)
+    return b"".join(chunks)
+
+
+async def run_handler(data: bytes) -> float:
+    controller = StorageController(NullProvider(), None, Queue(), Queue(), Queue())
+    reader = asyncio.StreamReader(limit=2**30)
+    reader.feed_data(data)
+    reader.feed_eof()
+    start = time.perf_counter()
+    await controller.handler(reader, None)  # type: ignore
+    for tasks in controller.store_record_tasks.values():
+        await asyncio.gather(*tasks)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+    msgs = records(args.records)
+
+    msgpack = socket_interface.msgpack
+    orjson = socket_interface.orjson
+    # name, serialization of the client, msgpack and orjson enabled
+    cases = [("json", "json", False, False), ("dill", "dill", False, False)]
+    if orjson is not None:
+        cases.append(("json (orjson)", "json", False, True))
+    if msgpack is not None:
+        cases.append(("msgpack", "dill", True, False))
+
+    for name, serialization, use_msgpack, use_orjson in cases:
+        socket_interface.msgpack = msgpack if use_msgpack else None
+        socket_interface.orjson = orjson if use_orjson else None
+        data = frame(msgs, serialization)
+        elapsed = asyncio.run(run_handler(data))
+        print(
+            "%-14s %10.0f records/s %8.1f MB"
+            % (name, args.records / elapsed, len(data) / 2**20)
+        )
+    socket_interface.msgpack = msgpack
+    socket_interface.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import random
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from openwpm.storage.arrow_storage import ParquetWriteOptions
+from openwpm.storage.local_storage import LocalArrowProvider
+from openwpm.storage.storage_providers import TableName
+from openwpm.types import VisitId
+from openwpm.utilities.parquet_compaction import compact_dataset
+
+
+async def store_visits(provider: LocalArrowProvider, visit_ids: range) -> None:
+    for visit_id in visit_ids:
+        await provider.store_record(
+            TableName("site_visits"),
+            VisitId(visit_id),
+            {
+                "visit_id": visit_id,
+                "browser_id": 1,
+                "site_url": "https://example.com/%d" % visit_id,
+            },
+        )
+        await provider.store_record(
+            TableName("crawl_history"),
+            VisitId(visit_id),
+            {"visit_id": visit_id, "browser_id": 1, "command": "GetCommand"},
+        )
+        await (await provider.finalize_visit_id(VisitId(visit_id)))
+
+
+def parquet_files(path: Path) -> list:
+    return sorted(path.glob("*.parquet"))
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_and_compaction(tmp_path: Path) -> None:
+    write_options = ParquetWriteOptions(
+        compression={"site_url": "zstd", "visit_id": "snappy"},
+        use_dictionary=["site_url"],
+    )
+    provider = LocalArrowProvider(
+        tmp_path,
+        cache_bytes=1,  # every visit is written out on its own
+        write_options=write_options,
+    )
+    await provider.init()
+    # stored in descending order, so the compaction has to sort
+    await store_visits(provider, range(19, -1, -1))
+    await provider.shutdown()
+    assert len(parquet_files(tmp_path / "site_visits")) == 20
+
+    counts = compact_dataset(
+        str(tmp_path), write_options=write_options, target_file_bytes=2**20
+    )
+    assert counts == {"site_visits": 1, "crawl_history": 1}
+
+    for table in ("site_visits", "crawl_history"):
+        files = parquet_files(tmp_path / table)
+        assert len(files) == 1
+        assert not list((tmp_path / table).glob("_*"))
+        visit_ids = pq.read_table(files[0]).column("visit_id").to_pylist()
+        assert visit_ids == list(range(20))
+
+    metadata = pq.ParquetFile(parquet_files(tmp_path / "site_visits")[0]).metadata
+    row_group = metadata.row_group(0)
+    codecs = {
+        row_group.column(i).path_in_schema: row_group.column(i).compression
+        for i in range(row_group.num_columns)
+    }
+    assert codecs["site_url"] == "ZSTD"
+    assert codecs["visit_id"] == "SNAPPY"
+
+    # A second compaction has nothing left to do
+    assert compact_dataset(str(tmp_path), ["site_visits"]) == {"site_visits": 1}
+
+
+@pytest.mark.asyncio
+async def test_compaction_bins_small_files(tmp_path: Path) -> None:
+    provider = LocalArrowProvider(tmp_path, cache_bytes=1)
+    await provider.init()
+    await store_visits(provider, range(6))
+    await provider.shutdown()
+    files = parquet_files(tmp_path / "site_visits")
+    size = max(file.stat().st_size for file in files)
+
+    # files at or above the target are left alone
+    assert compact_dataset(str(tmp_path), ["site_visits"], target_file_bytes=size) == {
+        "site_visits": 6
+    }
+    assert parquet_files(tmp_path / "site_visits") == files
+
+    # bins of two files each
+    target = size * 5 // 2
+    counts = compact_dataset(str(tmp_path), ["site_visits"], target_file_bytes=target)
+    assert counts == {"site_visits": 3}
+    visit_ids = sorted(
+        visit_id
+        for file in parquet_files(tmp_path / "site_visits")
+        for visit_id in pq.read_table(file).column("visit_id").to_pylist()
+    )
+    assert visit_ids == list(range(6))
+
+
+def test_compaction_sorts_into_large_row_groups(tmp_path: Path) -> None:
+    # like OpenWPM visit_ids, every flushed file spans the whole key range
+    rng = random.Random(3)
+    visit_ids = rng.sample(range(2**53), 2000)
+    table_path = tmp_path / "http_requests"
+    table_path.mkdir()
+    for i in range(20):
+        chunk = visit_ids[i * 100 : (i + 1) * 100]
+        pq.write_table(
+            pa.table(
+                {
+                    "visit_id": pa.array(chunk, type=pa.int64()),
+                    "url": ["https://example.com/%d" % v for v in chunk],
+                }
+            ),
+            table_path / ("%d.parquet" % i),
+        )
+    rows = pq.read_table(table_path / "0.parquet")
+    write_options = ParquetWriteOptions(row_group_bytes=rows.nbytes * 5)
+
+    counts = compact_dataset(
+        str(tmp_path), write_options=write_options, target_file_bytes=2**30
+    )
+    assert counts == {"http_requests": 1}
+    assert not list(table_path.glob("_*"))
+
+    files = parquet_files(table_path)
+    assert pq.read_table(files[0]).column("visit_id").to_pylist() == sorted(visit_ids)
+    metadata = pq.ParquetFile(files[0]).metadata
+    assert 3 <= metadata.num_row_groups <= 5
+    ranges = [
+        (
+            metadata.row_group(i).column(0).statistics.min,
+            metadata.row_group(i).column(0).statistics.max,
+        )
+        for i in range(metadata.num_row_groups)
+    ]
+    # row groups cover disjoint visit_id ranges, so min/max pruning works
+    for (_, previous_max), (next_min, _) in zip(ranges, ranges[1:]):
+        assert previous_max < next_min
+    assert sum(
+        metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)
+    ) == len(visit_ids)
@@ -1,3 +1,6 @@
+import gzip
+from pathlib import Path
+
 import pandas as pd
 from pandas.testing import assert_frame_equal
 
@@ -5,6 +8,7 @@ from openwpm.mp_logger import MPLogger
 from openwpm.storage.in_memory_storage import (
     MemoryArrowProvider,
     MemoryStructuredProvider,
+    MemoryUnstructuredProvider,
 )
 from openwpm.storage.storage_controller import (
     INVALID_VISIT_ID,
@@ -40,6 +44,32 @@ def test_startup_and_shutdown(mp_logger: MPLogger, test_values: dt_test_values)
         assert handle.storage[table] == [data]
 
 
+def test_unix_socket(
+    mp_logger: MPLogger, test_values: dt_test_values, tmp_path: Path
+) -> None:
+    test_table, visit_ids = test_values
+    structured = MemoryStructuredProvider()
+    unix_path = str(tmp_path / "storage.sock")
+    controller_handle = StorageControllerHandle(structured, None, unix_path)
+    controller_handle.launch()
+    assert controller_handle.listener_address == (unix_path, None)
+    assert controller_handle.tcp_listener_address is not None
+    cs = DataSocket(controller_handle.listener_address)
+    for table, data in test_table.items():
+        cs.store_record(table, data["visit_id"], data)
+    for visit_id in visit_ids:
+        cs.finalize_visit_id(visit_id, True)
+    cs.close()
+    controller_handle.shutdown()
+
+    handle = structured.handle
+    handle.poll_queue()
+    for table, data in test_table.items():
+        if data["visit_id"] == INVALID_VISIT_ID:
+            del data["visit_id"]
+        assert handle.storage[table] == [data]
+
+
 def test_arrow_provider(mp_logger: MPLogger, test_values: dt_test_values) -> None:
     test_table, visit_ids = test_values
     structured = MemoryArrowProvider()
@@ -65,5 +95,23 @@ def test_arrow_provider(mp_logger: MPLogger, test_values: dt_test_values) -> Non
         if data["visit_id"] == INVALID_VISIT_ID:
             del data["visit_id"]
         t2 = pd.DataFrame({k: [v] for k, v in data.items()})
-        # Since t2 doesn't get created schema the inferred types are different
-        assert_frame_equal(t1, t2, check_dtype=False)
+        # Since t2 doesn't get created schema the inferred types are different,
+        # dictionary columns are categorical in t1 and plain strings in t2
+        assert_frame_equal(t1, t2, check_dtype=False, check_categorical=False)
+
+
+def test_store_blob(mp_logger: MPLogger) -> None:
+    unstructured = MemoryUnstructuredProvider()
+    controller_handle = StorageControllerHandle(
+        MemoryStructuredProvider(), unstructured
+    )
+    controller_handle.launch()
+    assert controller_handle.listener_address is not None
+    cs = DataSocket(controller_handle.listener_address)
+    cs.store_blob("<div>cookies</div>".encode("utf-8"), "abc")
+    cs.close()
+    controller_handle.shutdown()
+
+    handle = unstructured.handle
+    handle.poll_queue()
+    assert gzip.decompress(handle.storage["abc"][0]) == b"<div>cookies</div>"
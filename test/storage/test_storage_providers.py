@@ -6,6 +6,7 @@ from pandas import DataFrame
 from pyarrow.parquet import ParquetDataset
 
 from openwpm.storage.local_storage import LocalArrowProvider
+from openwpm.storage.sql_provider import SQLiteStorageProvider
 from openwpm.storage.storage_controller import INVALID_VISIT_ID
 from openwpm.storage.storage_providers import (
     StructuredStorageProvider,
@@ -13,6 +14,7 @@ from openwpm.storage.storage_providers import (
     UnstructuredStorageProvider,
 )
 from openwpm.types import VisitId
+from openwpm.utilities.db_utils import query_db
 
 from .fixtures import structured_scenarios, unstructured_scenarios
 from .test_values import dt_test_values
@@ -39,10 +41,11 @@ async def test_local_arrow_storage_provider(
         dataset = ParquetDataset(tmp_path / table_name)
         df: DataFrame = dataset.read().to_pandas()
         assert df.shape[0] == 1
-        for row in df.itertuples(index=False):
+        # itertuples would rename columns starting with an underscore
+        for row in df.to_dict("records"):
             if test_data["visit_id"] == INVALID_VISIT_ID:
                 del test_data["visit_id"]
-            assert row._asdict() == test_data
+            assert row == test_data
 
 
 @pytest.mark.parametrize("structured_provider", structured_scenarios, indirect=True)
@@ -75,3 +78,104 @@ async def test_basic_unstructured_storing(
     await unstructured_provider.store_blob("test", blob)
     await unstructured_provider.flush_cache()
     await unstructured_provider.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_batched_inserts(tmp_path: Path) -> None:
+    db_path = tmp_path / "test_db.sqlite"
+    provider = SQLiteStorageProvider(db_path, batch_size=3, flush_interval=3600)
+    await provider.init()
+    for visit_id in range(2):
+        await provider.store_record(
+            TableName("site_visits"),
+            VisitId(visit_id),
+            {"visit_id": visit_id, "browser_id": 1, "site_url": "https://example.com"},
+        )
+    # a row of an unknown column fails alone, the valid rows of the batch stay
+    await provider.store_record(
+        TableName("site_visits"), VisitId(2), {"visit_id": 2, "no_such_column": 1}
+    )
+    await provider.store_record(
+        TableName("site_visits"),
+        VisitId(3),
+        {"visit_id": 3, "browser_id": 1, "site_url": "https://example.org"},
+    )
+    token = await provider.finalize_visit_id(VisitId(3), interrupted=True)
+    await token
+    # committed records are visible to readers while the writer is open
+    rows = query_db(db_path, "SELECT visit_id FROM site_visits", as_tuple=True)
+    assert sorted(rows) == [(0,), (1,), (3,)]
+    rows = query_db(db_path, "SELECT visit_id FROM incomplete_visits", as_tuple=True)
+    assert rows == [(3,)]
+    assert query_db(db_path, "PRAGMA journal_mode", as_tuple=True) == [("wal",)]
+
+    status = provider.get_status()
+    assert status["queue_depth"] == 0
+    assert status["records_inserted"] == 3
+    assert status["commit_latency_ms"] >= 0
+    await provider.shutdown()
+
+
+@pytest.mark.usefixtures("mp_logger")
+@pytest.mark.asyncio
+async def test_retried_visit_replaces_rows(tmp_path: Path) -> None:
+    db_path = tmp_path / "test_db.sqlite"
+    sqlite = SQLiteStorageProvider(db_path)
+    arrow = LocalArrowProvider(tmp_path / "parquet")
+    for provider in (sqlite, arrow):
+        await provider.init()
+        # a visit that timed out and its retry store the same keys twice
+        for status in (1, 0):
+            await provider.store_record(
+                TableName("visits"),
+                VisitId(7),
+                {"visit_id": 7, "domain": "example.com", "status": status},
+            )
+            await provider.store_record(
+                TableName("banners"),
+                VisitId(7),
+                {"banner_id": 70, "visit_id": 7, "x": status},
+            )
+        token = await provider.finalize_visit_id(VisitId(7))
+        await provider.flush_cache()
+        await token
+
+    rows = query_db(db_path, "SELECT visit_id, status FROM visits", as_tuple=True)
+    assert rows == [(7, 0)]
+    rows = query_db(db_path, "SELECT banner_id, x FROM banners", as_tuple=True)
+    assert rows == [(70, 0)]
+    df = ParquetDataset(tmp_path / "parquet" / "visits").read().to_pandas()
+    assert df[["visit_id", "status"]].values.tolist() == [[7, 0]]
+    df = ParquetDataset(tmp_path / "parquet" / "banners").read().to_pandas()
+    assert df[["banner_id", "x"]].values.tolist() == [[70, 0]]
+    await sqlite.shutdown()
+    await arrow.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_unbindable_row(tmp_path: Path) -> None:
+    db_path = tmp_path / "test_db.sqlite"
+    provider = SQLiteStorageProvider(db_path, batch_size=2, flush_interval=3600)
+    await provider.init()
+    # an int sqlite can't bind raises OverflowError, not a sqlite3.Error
+    for visit_id, rank in ((0, 1), (1, 2**63)):
+        await provider.store_record(
+            TableName("site_visits"),
+            VisitId(visit_id),
+            {
+                "visit_id": visit_id,
+                "browser_id": 1,
+                "site_url": "https://example.com",
+                "site_rank": rank,
+            },
+        )
+    await provider.store_record(
+        TableName("site_visits"),
+        VisitId(2),
+        {"visit_id": 2, "browser_id": 1, "site_url": "https://example.org"},
+    )
+    await (await provider.finalize_visit_id(VisitId(2)))
+    rows = query_db(db_path, "SELECT visit_id FROM site_visits", as_tuple=True)
+    assert sorted(rows) == [(0,), (2,)]
+    assert provider.get_status()["records_inserted"] == 2
+    await provider.shutdown()
@@ -234,6 +234,65 @@ def generate_test_values() -> dt_test_values:
         "time_stamp": random_word(12),
     }
     test_values[TableName("dns_responses")] = fields
+    # visits
+    fields = {
+        "visit_id": random.randint(0, 2**63 - 1),
+        "domain": random_word(12),
+        "url": random_word(12),
+        "run_url": random_word(12),
+        "status": random.randint(0, 3),
+        "lang": random_word(2),
+        "banners": random.randint(0, 2**31 - 1),
+        "btn_status": random.randint(-(2**31), 2**31 - 1),
+        "btn_set_status": random.randint(-(2**31), 2**31 - 1),
+        "interact_time": random.randint(0, 2**63 - 1),
+        "ttw": random.randint(0, 2**31 - 1),
+        "__cmp": random.choice([True, False]),
+        "__tcfapi": random.choice([True, False]),
+        "__tcfapiLocator": random.choice([True, False]),
+        "cmp_id": random.randint(0, 2**31 - 1),
+        "cmp_name": random_word(12),
+        "pv": random.choice([True, False]),
+        "nc_cmp_name": random_word(12),
+        "dnsmpi": random_word(12),
+        "body_html": random_word(12),
+        "body_html_hash": random_word(12),
+        "body_html_size": random.randint(0, 2**31 - 1),
+    }
+    test_values[TableName("visits")] = fields
+    # banners
+    fields = {
+        "banner_id": random.randint(0, 2**53 - 1),
+        "visit_id": random.randint(0, 2**63 - 1),
+        "domain": random_word(12),
+        "lang": random_word(2),
+        "iFrame": random.choice([True, False]),
+        "shadow_dom": random.choice([True, False]),
+        "captured_area": random.random(),
+        "x": random.randint(0, 2**31 - 1),
+        "y": random.randint(0, 2**31 - 1),
+        "w": random.randint(0, 2**31 - 1),
+        "h": random.randint(0, 2**31 - 1),
+    }
+    test_values[TableName("banners")] = fields
+    # htmls
+    fields = {
+        "banner_id": random.randint(0, 2**53 - 1),
+        "visit_id": random.randint(0, 2**63 - 1),
+        "domain": random_word(12),
+        "html": random_word(12),
+        "html_hash": random_word(12),
+        "html_size": random.randint(0, 2**31 - 1),
+    }
+    test_values[TableName("htmls")] = fields
+    # visit_timings
+    fields = {
+        "visit_id": random.randint(0, 2**63 - 1),
+        "phase": random_word(12),
+        "duration": random.randint(0, 2**31 - 1),
+        "calls": random.randint(0, 2**31 - 1),
+    }
+    test_values[TableName("visit_timings")] = fields
     visit_id_set = set(
         d["visit_id"] for d in filter(lambda d: "visit_id" in d, test_values.values())
     )
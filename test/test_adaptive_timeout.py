@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+
+from openwpm.utilities.adaptive_timeout import (
+    MIN_SAMPLES,
+    AdaptiveTimeoutPolicy,
+    P2Quantile,
+)
+
+
+def test_p2_quantile():
+    rng = random.Random(0)
+    samples = [rng.lognormvariate(2, 0.7) for _ in range(20000)]
+    estimate = P2Quantile(0.99)
+    for sample in samples:
+        estimate.add(sample)
+    expected = np.percentile(samples, 99)
+    assert abs(estimate.value() - expected) / expected < 0.05
+
+
+def test_p2_quantile_few_samples():
+    estimate = P2Quantile(0.5)
+    assert estimate.value() is None
+    for sample in (3, 1, 2):
+        estimate.add(sample)
+    assert estimate.value() == 2
+
+
+def test_adaptive_timeout_policy():
+    policy = AdaptiveTimeoutPolicy(factor=2, floor=30)
+    for _ in range(MIN_SAMPLES - 1):
+        policy.observe("GetCommand", 20)
+    # not enough samples yet
+    assert policy.timeout("GetCommand", 660) == 660
+    policy.observe("GetCommand", 20)
+    assert policy.timeout("GetCommand", 660) == 40
+    # bounded by the requested timeout and the floor
+    assert policy.timeout("GetCommand", 35) == 35
+    for _ in range(MIN_SAMPLES):
+        policy.observe("DumpProfileCommand", 1)
+    assert policy.timeout("DumpProfileCommand", 660) == 30
+    assert policy.timeout("BrowseCommand", 60) == 60
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bannerclick.banner_clustering import LSHClusterer, cluster_banners
+
+CONSENT_TEXT = (
+    "We and our partners use cookies and similar technologies to store and access "
+    "information on your device, to measure audiences, to personalise ads and content "
+    "and to develop and improve our products. You can accept all cookies, reject the "
+    "optional ones or change your preferences at any time in the privacy settings."
+)
+
+
+def banner(text, site):
+    return "<div class='%s-cmp'><p>%s</p><button>Accept all</button></div>" % (
+        site,
+        text,
+    )
+
+
+def test_near_duplicates_cluster_together():
+    htmls = [
+        banner(CONSENT_TEXT, "a"),
+        banner(CONSENT_TEXT.replace("partners", "vendors"), "b"),
+        banner(
+            "Dieses Angebot verwendet Tracking, um Inhalte und Werbung zu "
+            "optimieren. Mit Klick auf Zustimmen willigen Sie ein.",
+            "c",
+        ),
+        banner(CONSENT_TEXT, "d"),
+        banner("Subscribe to our newsletter for weekly deals on shoes", "e"),
+    ]
+    # split into chunks, so duplicates meet across chunk boundaries
+    chunks = [([1, 2], htmls[:2]), ([3, 4, 5], htmls[2:])]
+    banner_ids, cluster_ids = cluster_banners(chunks)
+    clusters = dict(zip(banner_ids.tolist(), cluster_ids.tolist()))
+    assert clusters[1] == clusters[2] == clusters[4]
+    assert len({clusters[1], clusters[3], clusters[5]}) == 3
+
+
+def test_empty_input():
+    banner_ids, cluster_ids = cluster_banners([])
+    assert len(banner_ids) == len(cluster_ids) == 0
+    assert banner_ids.dtype == np.int64
+
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        LSHClusterer(num_perm=128, bands=12)
+    assert LSHClusterer(num_perm=128, bands=32).rows == 4
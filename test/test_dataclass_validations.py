@@ -91,6 +91,32 @@ def test_failure_limit():
     validate_manager_params(manager_params)
 
 
+def test_num_spare_browsers():
+    manager_params = ManagerParams()
+
+    manager_params.num_spare_browsers = -1
+    with pytest.raises(ConfigError):
+        validate_manager_params(manager_params)
+
+    manager_params.num_spare_browsers = "2"
+    with pytest.raises(ConfigError):
+        validate_manager_params(manager_params)
+
+    manager_params.num_spare_browsers = 2
+    validate_manager_params(manager_params)
+
+
+def test_fast_reset_max_visits():
+    manager_params = ManagerParams()
+
+    manager_params.fast_reset_max_visits = 0
+    with pytest.raises(ConfigError):
+        validate_manager_params(manager_params)
+
+    manager_params.fast_reset_max_visits = 10
+    validate_manager_params(manager_params)
+
+
 def test_num_browser_crawl_config():
     manager_params = ManagerParams(num_browsers=2)
     browser_params = [BrowserParams()]
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from bannerclick.htmlstore import HtmlStore, get_body_html, html_digest, read_htmls
+from openwpm.storage.leveldb import LevelDbProvider
+from openwpm.storage.local_storage import LocalGzipProvider
+from openwpm.storage.sql_provider import SCHEMA_FILE
+
+BANNER_HTML = "<div id='cookie'>We use cookies <button>Accept</button></div>"
+BODY_HTML = "<body><p>Ünïcödé body</p></body>"
+INLINE_HTML = "<div>stored inline</div>"
+
+
+async def store_blobs(provider, *htmls):
+    await provider.init()
+    for html in htmls:
+        content_hash, content = html_digest(html)
+        await provider.store_blob(content_hash, content)
+    await provider.flush_cache()
+    await provider.shutdown()
+
+
+def make_crawl_db(path):
+    banner_hash, banner_content = html_digest(BANNER_HTML)
+    body_hash, body_content = html_digest(BODY_HTML)
+    with sqlite3.connect(path) as con:
+        with open(SCHEMA_FILE) as f:
+            con.executescript(f.read())
+        con.execute(
+            "INSERT INTO visits (visit_id, domain, body_html_hash, body_html_size) "
+            "VALUES (1, 'hashed.example', ?, ?)",
+            (body_hash, len(body_content)),
+        )
+        con.execute(
+            "INSERT INTO visits (visit_id, domain, body_html) "
+            "VALUES (2, 'inline.example', ?)",
+            (INLINE_HTML,),
+        )
+        con.execute(
+            "INSERT INTO htmls (banner_id, visit_id, domain, html_hash, html_size) "
+            "VALUES (10, 1, 'hashed.example', ?, ?)",
+            (banner_hash, len(banner_content)),
+        )
+        con.execute(
+            "INSERT INTO htmls (banner_id, visit_id, domain, html) "
+            "VALUES (20, 2, 'inline.example', ?)",
+            (INLINE_HTML,),
+        )
+        con.execute(
+            "INSERT INTO htmls (banner_id, visit_id, domain, html_hash) "
+            "VALUES (30, 2, 'inline.example', ?)",
+            ("0" * 64,),
+        )
+    return path
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", ["gzip", "leveldb"])
+async def test_html_store_round_trip(tmp_path, provider):
+    content_path = tmp_path / "content"
+    if provider == "gzip":
+        content_path.mkdir()
+        await store_blobs(LocalGzipProvider(content_path), BANNER_HTML, BODY_HTML)
+    else:
+        await store_blobs(LevelDbProvider(content_path), BANNER_HTML, BODY_HTML)
+    db_path = make_crawl_db(tmp_path / "crawl-data.sqlite")
+
+    with HtmlStore(content_path) as store:
+        assert store.get(html_digest(BANNER_HTML)[0]) == BANNER_HTML
+        assert store.get("0" * 64) is None
+        assert store.get(None) is None
+
+    rows = {row["banner_id"]: row for row in read_htmls(db_path, content_path)}
+    assert rows[10]["html"] == BANNER_HTML
+    assert rows[20]["html"] == INLINE_HTML
+    assert rows[30]["html"] is None
+
+    assert get_body_html(db_path, content_path, 1) == BODY_HTML
+    assert get_body_html(db_path, content_path, 2) == INLINE_HTML
+    assert get_body_html(db_path, content_path, 3) is None
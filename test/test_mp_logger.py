@@ -137,6 +137,28 @@ def test_multiple_instances(tmpdir):
     test_multiprocess(str(tmpdir) + "-2")
 
 
+def test_unix_socket(tmpdir):
+    log_file = get_logfile_path(str(tmpdir))
+    socket_path = os.path.join(str(tmpdir), "logger.sock")
+    openwpm_logger = mp_logger.MPLogger(log_file, unix_socket_path=socket_path)
+    assert openwpm_logger.logger_address == (socket_path, None)
+    assert openwpm_logger.extension_logger_address[1] is not None
+
+    child_process = Process(target=child_proc, args=(0,))
+    child_process.daemon = True
+    child_process.start()
+    logger.info(PARENT_INFO_STR_1)
+    time.sleep(2)  # give some time for logs to be sent
+    child_process.join()
+    openwpm_logger.close()
+
+    log_content = get_logfile_contents(log_file)
+    assert log_content.count(CHILD_INFO_STR_1 % 0) == 1
+    assert log_content.count(CHILD_ERROR_STR % 0) == 1
+    assert log_content.count(PARENT_INFO_STR_1) == 1
+    assert not os.path.exists(socket_path)
+
+
 def test_child_process_with_exception(tmpdir):
     log_file = get_logfile_path(str(tmpdir))
     openwpm_logger = mp_logger.MPLogger(log_file)
@@ -0,0 +1,164 @@
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from openwpm.utilities.preflight import Preflight, variants
+
+HOSTS = {
+    "alive.test": ["127.0.0.1"],
+    "redirect.test": ["127.0.0.1"],
+    "www.wwwonly.test": ["127.0.0.1"],
+    "closed.test": ["127.0.0.2"],
+    # the first address is unreachable, e.g. IPv6 without connectivity
+    "fallback.test": ["127.0.0.2", "127.0.0.1"],
+    "slow.test": ["127.0.0.1"],
+    "tls.test": ["127.0.0.1"],
+}
+
+
+async def fake_resolver(host):
+    if host not in HOSTS:
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    return HOSTS[host]
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        host = self.headers["Host"].split(":")[0]
+        if host == "slow.test":
+            # answers after the pre-flight timeout
+            time.sleep(1.5)
+        if host == "redirect.test" and self.path == "/":
+            self.send_response(301)
+            self.send_header("Location", "http://alive.test/home")
+        else:
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_port
+    server.shutdown()
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=tls.test",
+            "-addext",
+            "subjectAltName=DNS:tls.test",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+@pytest.fixture
+def https_server(certificate):
+    cert, key = certificate
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_port
+    server.shutdown()
+
+
+def test_variants():
+    assert variants("https://example.com") == [
+        "https://example.com",
+        "https://www.example.com",
+    ]
+    assert variants("https://www.example.com") == ["https://www.example.com"]
+
+
+def test_preflight(http_server):
+    preflight = Preflight(timeout=1, resolver=fake_resolver, port=http_server)
+    results = preflight.run(
+        [
+            "http://alive.test",
+            "http://redirect.test",
+            "http://wwwonly.test",
+            "http://dead.test",
+            "http://closed.test",
+            "http://fallback.test",
+            "http://slow.test",
+        ]
+    )
+
+    # connected, but no response within the timeout
+    slow = results["http://slow.test"]
+    assert slow.reachable
+    assert slow.url == "http://slow.test"
+    assert slow.status is None
+    assert "TimeoutError" in slow.error
+
+    assert results["http://fallback.test"].url == "http://fallback.test"
+
+    assert results["http://alive.test"].reachable
+    assert results["http://alive.test"].url == "http://alive.test"
+    assert results["http://alive.test"].status == 200
+    assert results["http://alive.test"].error is None
+
+    redirect = results["http://redirect.test"]
+    assert redirect.url == "http://alive.test/home"
+    assert redirect.redirects == ["http://alive.test/home"]
+
+    assert results["http://wwwonly.test"].url == "http://www.wwwonly.test"
+
+    for site in ("http://dead.test", "http://closed.test"):
+        assert not results[site].reachable
+        assert results[site].url is None
+        assert results[site].error is not None
+
+
+def test_preflight_tls(https_server, certificate):
+    # the self-signed certificate fails verification like an incomplete chain
+    preflight = Preflight(timeout=2, resolver=fake_resolver, port=https_server)
+    result = preflight.run(["https://tls.test"])["https://tls.test"]
+    assert result.reachable
+    assert result.url == "https://tls.test"
+    assert result.status == 200
+    assert "SSLCertVerificationError" in result.error
+
+    trusting = ssl.create_default_context(cafile=str(certificate[0]))
+    preflight = Preflight(
+        timeout=2, resolver=fake_resolver, port=https_server, ssl_context=trusting
+    )
+    result = preflight.run(["https://tls.test"])["https://tls.test"]
+    assert result.reachable
+    assert result.status == 200
+    assert result.error is None
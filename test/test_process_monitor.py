@@ -0,0 +1,43 @@
+import os
+import signal
+import subprocess
+import time
+
+from openwpm.utilities.process_monitor import BrowserProcessMonitor, statm
+
+
+def test_sample_process_tree():
+    # stands in for geckodriver -> firefox -> content process
+    geckodriver = subprocess.Popen(
+        ["sh", "-c", "sh -c 'sleep 30; true'; true"], start_new_session=True
+    )
+    monitor = BrowserProcessMonitor()
+    try:
+        for _ in range(50):
+            monitor.start_round()
+            sample = monitor.sample(1, geckodriver.pid)
+            if sample is not None and sample.processes == 3:
+                break
+            time.sleep(0.1)
+        assert sample is not None
+        assert sample.browser_id == 1
+        assert sample.processes == 3
+        assert sample.memory_bytes >= statm(geckodriver.pid)[0]
+    finally:
+        os.killpg(geckodriver.pid, signal.SIGKILL)
+        geckodriver.wait()
+    monitor.start_round()
+    assert monitor.sample(1, geckodriver.pid) is None
+
+
+def test_orphans():
+    monitor = BrowserProcessMonitor()
+    process = subprocess.Popen(["sleep", "30"])
+    monitor.register(process.pid)
+    assert monitor.orphans({process.pid}, 0) == []
+    assert [p.pid for p in monitor.orphans(set(), 0)] == [process.pid]
+    assert monitor.orphans(set(), 300) == []
+    process.kill()
+    process.wait()
+    assert monitor.orphans(set(), 0) == []
+    assert monitor.index == {}
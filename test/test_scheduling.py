@@ -0,0 +1,97 @@
+import sqlite3
+
+from openwpm.storage.sql_provider import SCHEMA_FILE
+from openwpm.utilities.scheduling import (
+    DurationEstimator,
+    actual_makespan,
+    expected_makespan,
+    order_longest_first,
+)
+
+VISITS = [
+    # visit_id, site_url, command durations
+    (1, "https://slow.example", [1000, 59000]),
+    (2, "https://fast.example", [1000, 1000]),
+    (3, "https://medium.example", [1000, 9000]),
+    (4, "https://fast.example", [1000, 3000]),
+]
+
+
+def make_history(path):
+    with sqlite3.connect(path) as con:
+        with open(SCHEMA_FILE) as f:
+            con.executescript(f.read())
+        for visit_id, url, durations in VISITS:
+            con.execute(
+                "INSERT INTO site_visits (visit_id, browser_id, site_url) "
+                "VALUES (?, 1, ?)",
+                (visit_id, url),
+            )
+            for second, duration in enumerate(durations):
+                con.execute(
+                    "INSERT INTO crawl_history (browser_id, visit_id, command_status, "
+                    "duration, dtg) VALUES (1, ?, 'ok', ?, ?)",
+                    (
+                        visit_id,
+                        duration,
+                        "2023-01-01 00:%02d:%02d" % (visit_id, second),
+                    ),
+                )
+    return path
+
+
+def test_order_longest_first(tmp_path):
+    estimator = DurationEstimator.from_databases([make_history(tmp_path / "a.sqlite")])
+    assert estimator.expected("https://fast.example") == 3000
+    assert estimator.expected("https://slow.example") == 60000
+
+    sites = [
+        "https://fast.example",
+        "https://new1.example",
+        "https://medium.example",
+        "https://new2.example",
+        "https://slow.example",
+    ]
+    ordered = order_longest_first(sites, estimator)
+    assert sorted(ordered) == sorted(sites)
+    known = [site for site in ordered if estimator.expected(site) is not None]
+    assert known == [
+        "https://slow.example",
+        "https://medium.example",
+        "https://fast.example",
+    ]
+    # sites without history are spread over the list, not appended
+    assert ordered[-1] != "https://new2.example"
+    assert expected_makespan(ordered, estimator, 2) <= expected_makespan(
+        sites, estimator, 2
+    )
+
+    # (rank, url) pairs keep their rank
+    ranked = list(enumerate(sites))
+    ordered_ranked = order_longest_first(ranked, estimator, key=lambda r: r[1])
+    assert [site for _, site in ordered_ranked] == ordered
+    assert all(sites[rank] == site for rank, site in ordered_ranked)
+
+
+def test_online_estimate():
+    estimator = DurationEstimator(alpha=0.5)
+    assert estimator.expected("https://a.example") is None
+    estimator.observe("https://a.example", 1000)
+    estimator.observe("https://a.example", 3000)
+    assert estimator.expected("https://a.example") == 2000
+    assert estimator.default() == 2000
+
+
+def test_actual_makespan(tmp_path):
+    db = make_history(tmp_path / "a.sqlite")
+    # the 59s command ending at 00:01:01 starts first, the last one ends at 00:04:01
+    assert actual_makespan(db) == (241 - 2) * 1000
+
+
+def test_missing_history(tmp_path):
+    missing = tmp_path / "missing.sqlite"
+    estimator = DurationEstimator.from_databases([missing])
+    assert estimator.expected("https://slow.example") is None
+    assert actual_makespan(missing) is None
+    # no empty database is left behind
+    assert not missing.exists()
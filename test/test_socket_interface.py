@@ -0,0 +1,105 @@
+import asyncio
+import struct
+
+import pytest
+
+from openwpm import socket_interface
+from openwpm.socket_interface import (
+    ClientSocket,
+    ServerSocket,
+    get_message_from_reader,
+    serialize,
+)
+
+RECORD = (
+    "http_requests",
+    {
+        "visit_id": 2**53 - 1,
+        "url": "https://example.com/",
+        "is_XHR": False,
+        "time_stamp": 1.5,
+        "post_body": None,
+        "post_body_raw": b"\x00\xff",
+        "headers": [["Accept", "*/*"]],
+    },
+)
+
+
+async def read(serialization, payload):
+    reader = asyncio.StreamReader()
+    reader.feed_data(struct.pack(">Lc", len(payload), serialization) + payload)
+    reader.feed_eof()
+    return await get_message_from_reader(reader)
+
+
+@pytest.mark.asyncio
+async def test_plain_records_use_msgpack():
+    pytest.importorskip("msgpack")
+    serialization, payload = serialize(RECORD, "dill")
+    assert serialization == b"m"
+    # tuples arrive as lists
+    assert await read(serialization, payload) == list(RECORD)
+
+
+@pytest.mark.asyncio
+async def test_exotic_records_fall_back_to_dill():
+    for msg in ({"links": {"a", "b"}}, {"visit_id": 2**70}):
+        serialization, payload = serialize(msg, "dill")
+        assert serialization == b"d"
+        assert await read(serialization, payload) == msg
+
+
+@pytest.mark.asyncio
+async def test_dill_without_msgpack(monkeypatch):
+    monkeypatch.setattr(socket_interface, "msgpack", None)
+    serialization, payload = serialize(RECORD, "dill")
+    assert serialization == b"d"
+    assert await read(serialization, payload) == RECORD
+
+
+@pytest.mark.asyncio
+async def test_json():
+    msg = {"visit_id": 1, "value": float("nan"), "big": 2**70}
+    serialization, payload = serialize(msg, "json")
+    assert serialization == b"j"
+    parsed = await read(serialization, payload)
+    assert parsed["big"] == 2**70
+    assert parsed["value"] != parsed["value"]
+    assert await read(*serialize(["a", 1], "json")) == ["a", 1]
+    assert await read(*serialize("text", "json")) == "text"
+    assert await read(*serialize(b"bytes", "json")) == b"bytes"
+
+
+def test_server_socket_large_messages():
+    server = ServerSocket(name="test")
+    server.start_accepting()
+    client = ClientSocket(serialization="dill")
+    client.connect(*server.sock.getsockname())
+    blob = bytes(range(256)) * 2**15  # 8 MiB, more than one recv
+    client.send(blob)
+    client.send(("page_content", {"content": blob, "visit_id": 1}))
+    client.send("done")
+    assert server.queue.get(timeout=10) == blob
+    record = server.queue.get(timeout=10)
+    assert record[1]["content"] == blob
+    assert server.queue.get(timeout=10) == "done"
+    client.close()
+    server.close()
+
+
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / "test.sock")
+    server = ServerSocket(name="test", unix_path=path)
+    server.start_accepting()
+    unix_client = ClientSocket(serialization="dill")
+    unix_client.connect(path)
+    tcp_client = ClientSocket()
+    tcp_client.connect(*server.sock.getsockname())
+    unix_client.send({"visit_id": 1})
+    assert server.queue.get(timeout=10) == {"visit_id": 1}
+    tcp_client.send(["tcp"])
+    assert server.queue.get(timeout=10) == ["tcp"]
+    unix_client.close()
+    tcp_client.close()
+    server.close()
+    assert not (tmp_path / "test.sock").exists()
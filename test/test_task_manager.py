@@ -1,4 +1,5 @@
 """Test TaskManager functionality."""
+import time
 from contextlib import nullcontext as does_not_raise
 
 import pytest
@@ -6,6 +7,7 @@ import pytest
 from openwpm.command_sequence import CommandSequence
 from openwpm.commands.types import BaseCommand
 from openwpm.errors import CommandExecutionError
+from openwpm.utilities import db_utils
 
 from .utilities import BASE_TEST_URL
 
@@ -81,3 +83,135 @@ def test_assertion_error_propagation(
     with expectation:
         with manager:
             manager.execute_command_sequence(cs)
+
+
+def test_spare_browser_swap(task_manager_creator, default_params):
+    """Test that a reset swaps the browser for a warm spare"""
+    manager_params, browser_params = default_params
+    manager_params.num_browsers = 1
+    manager_params.num_spare_browsers = 1
+    manager, db = task_manager_creator((manager_params, browser_params[:1]))
+    for _ in range(600):
+        if manager.spare_browsers:
+            break
+        time.sleep(0.1)
+    spare_id = manager.spare_browsers[0].browser_id
+    first_id = manager.browsers[0].browser_id
+
+    cs = CommandSequence(BASE_TEST_URL, blocking=True, reset=True)
+    cs.get()
+    manager.execute_command_sequence(cs)
+    assert manager.browsers[0].browser_id == spare_id
+
+    cs = CommandSequence(BASE_TEST_URL, blocking=True, reset=True)
+    cs.get()
+    manager.execute_command_sequence(cs)
+    manager.close()
+
+    rows = db_utils.query_db(db, "SELECT browser_id FROM site_visits")
+    assert {row["browser_id"] for row in rows} == {first_id, spare_id}
+    rows = db_utils.query_db(db, "SELECT browser_id FROM crawl")
+    assert {first_id, spare_id} <= {row["browser_id"] for row in rows}
+
+
+def test_fast_reset(task_manager_creator, default_params):
+    """Test that a reset clears the profile without restarting the browser"""
+    manager_params, browser_params = default_params
+    manager_params.num_browsers = 1
+    manager_params.fast_reset = True
+    manager_params.verify_reset = True
+    manager, db = task_manager_creator((manager_params, browser_params[:1]))
+    pid = manager.browsers[0].browser_manager.pid
+
+    for _ in range(2):
+        cs = CommandSequence(
+            BASE_TEST_URL + "/js_cookie.html", blocking=True, reset=True
+        )
+        cs.get(sleep=1)
+        manager.execute_command_sequence(cs)
+        assert manager.browsers[0].browser_manager.pid == pid
+    manager.close()
+
+    rows = db_utils.query_db(db, "SELECT command_status FROM crawl_history")
+    assert {row["command_status"] for row in rows} == {"ok"}
+
+
+def test_submit(task_manager_creator, default_params):
+    """Test that submitted sequences resolve once their data is saved"""
+    manager_params, browser_params = default_params
+    manager_params.num_browsers = 1
+    manager_params.max_in_flight = 2
+    manager, db = task_manager_creator((manager_params, browser_params[:1]))
+
+    futures = list()
+    for _ in range(3):
+        cs = CommandSequence(BASE_TEST_URL)
+        cs.get()
+        futures.append(manager.submit(cs))
+    results = [future.result(timeout=120) for future in futures]
+    manager.close()
+
+    assert all(result.success for result in results)
+    assert all(result.completed_at >= result.dispatched_at for result in results)
+    rows = db_utils.query_db(db, "SELECT visit_id FROM site_visits")
+    assert {row["visit_id"] for row in rows} == {r.visit_id for r in results}
+
+
+class SleepingCommand(BaseCommand):
+    def execute(
+        self,
+        webdriver,
+        browser_params,
+        manager_params,
+        extension_socket,
+    ):
+        time.sleep(3)
+
+    def __repr__(self) -> str:
+        return "SleepingCommand"
+
+
+class ShortTimeouts:
+    """Stands in for AdaptiveTimeoutPolicy, adapts SleepingCommand to 1s"""
+
+    def __init__(self):
+        self.requested = list()
+
+    def observe(self, command, duration):
+        pass
+
+    def timeout(self, command, requested):
+        self.requested.append((command, requested))
+        return 1 if command == "SleepingCommand" else requested
+
+
+def test_adaptive_timeout_retry(task_manager_creator, default_params):
+    """Test that a command exceeding its adapted timeout runs once more with
+    its original timeout, without counting as a failure"""
+    manager_params, browser_params = default_params
+    manager_params.num_browsers = 1
+    manager_params.failure_limit = 0
+    manager_params.adaptive_timeouts = True
+    manager, db = task_manager_creator((manager_params, browser_params[:1]))
+    manager.timeout_policy = policy = ShortTimeouts()
+
+    callbacks = list()
+    cs = CommandSequence(BASE_TEST_URL, callback=callbacks.append)
+    cs.append_command(SleepingCommand(), timeout=30)
+    future = manager.submit(cs)
+    result = future.result(timeout=120)
+    manager.close()
+
+    assert result.success
+    assert callbacks == [True]
+    assert [r for r in policy.requested if r[0] == "SleepingCommand"] == [
+        ("SleepingCommand", 30)
+    ]
+    rows = db_utils.query_db(
+        db,
+        "SELECT command_status, retry_number, duration FROM crawl_history "
+        "WHERE command = 'SleepingCommand' ORDER BY COALESCE(retry_number, 0)",
+    )
+    assert [row["command_status"] for row in rows] == ["timeout", "ok"]
+    assert rows[1]["retry_number"] == 1
+    assert rows[1]["duration"] >= 3000
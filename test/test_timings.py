@@ -0,0 +1,115 @@
+import pandas as pd
+import pytest
+
+import bannerclick.timings as tm
+from bannerclick.timing_report import summarize
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tm.time, "perf_counter", clock)
+    tm.reset()
+    yield clock
+    tm.reset()
+
+
+def test_nested_phases_are_exclusive(clock):
+    start = clock.now
+    with tm.phase("interact"):
+        clock.advance(1)
+        with tm.phase("screenshot"):
+            assert tm.current_phase() == "screenshot"
+            clock.advance(2)
+        clock.advance(0.5)
+        with tm.phase("screenshot"):
+            clock.advance(1)
+            with tm.phase("screenshot"):  # re-entered while open
+                clock.advance(0.25)
+    with tm.phase("detect"):
+        clock.advance(3)
+    wall_ms = (clock.now - start) * 1000
+
+    assert tm.current_phase() is None
+    assert tm.spans == {
+        "interact": [1500.0, 1],
+        "screenshot": [3250.0, 3],
+        "detect": [3000.0, 1],
+    }
+    assert sum(duration for duration, _ in tm.spans.values()) == pytest.approx(wall_ms)
+
+
+def test_phase_that_raises(clock):
+    with pytest.raises(ValueError):
+        with tm.phase("outer"):
+            clock.advance(1)
+            with tm.phase("inner"):
+                clock.advance(2)
+                raise ValueError
+    assert tm.stack == []
+    assert tm.spans == {"outer": [1000.0, 1], "inner": [2000.0, 1]}
+
+    @tm.timed("decorated")
+    def fails():
+        clock.advance(0.5)
+        raise KeyError
+
+    with pytest.raises(KeyError):
+        fails()
+    assert tm.spans["decorated"] == [500.0, 1]
+
+
+def test_records(clock):
+    with tm.phase("page_load"):
+        clock.advance(0.0014)
+    with tm.phase("detect"):
+        clock.advance(0.002)
+    with tm.phase("detect"):
+        clock.advance(0.002)
+    assert sorted(tm.records(7), key=lambda row: row["phase"]) == [
+        {"visit_id": 7, "phase": "detect", "duration": 4, "calls": 2},
+        {"visit_id": 7, "phase": "page_load", "duration": 1, "calls": 1},
+    ]
+
+
+def test_summarize():
+    rows = list()
+    for visit_id in range(1, 101):
+        rows.append((visit_id, "page_load", visit_id, 1))
+        # several rows of a phase in one visit count as one sample
+        rows.append((visit_id, "detect", 50, 1))
+        rows.append((visit_id, "detect", 50, 2))
+    timings = pd.DataFrame(rows, columns=["visit_id", "phase", "duration", "calls"])
+
+    report = summarize(timings)
+    assert list(report.index) == ["(visit)", "detect", "page_load"]
+    assert (report["visits"] == 100).all()
+
+    page_load = report.loc["page_load"]
+    assert page_load["total_s"] == pytest.approx(5.05)
+    assert page_load["p50"] == pytest.approx(50.5)
+    assert page_load["p95"] == pytest.approx(95.05)
+    assert page_load["p99"] == pytest.approx(99.01)
+    assert page_load["max"] == 100
+    assert page_load["share"] == pytest.approx(5050 / 15050)
+
+    detect = report.loc["detect"]
+    assert detect["p50"] == detect["p99"] == 100
+    assert detect["share"] == pytest.approx(10000 / 15050)
+
+    visit = report.loc["(visit)"]
+    assert visit["total_s"] == pytest.approx(15.05)
+    assert visit["p50"] == pytest.approx(150.5)
+    assert visit["p99"] == pytest.approx(199.01)
+    assert visit["share"] == 1.0